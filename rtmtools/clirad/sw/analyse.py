@@ -19,25 +19,22 @@ def sum_OUTPUT_CLIRAD_over_wbands(pnl, wbands = range(1, 9)):
 
 
 
-def lines2bands(pnl, wbands = None):
+def lines2bands(ds, wbands = None):
     '''
-    Cast PNL into wbands which might not be continuous,
+    Cast DS into wbands which might not be continuous,
     monotonic, and non-overlapping, like CLIRAD-SW\'s wavenumber bands
     INPUT:
+    ds --- xarray Dataset (wavenumber, level), as from
+           rtmtools.lblrtm.aerutils.load_OUTPUT_RADSUM()
     wbands -- dictionary of {id: [(V1, V2), ...]}, where ID is a unique
               label for a wavenumber band, and [(V1, V2), ...] is a list
               of one or more wavenumber ranges in the wavenumber band, and
               V1 and V2 are the lower and upper wavenumbers of each range,
               respectively  
+    OUTPUT:
+    ds --- xarray Dataset (band, level), with the IDs along band
     '''
-    dict_pnlout = {}
-    for id, wranges in wbands.items():
-        V1s, V2s = zip(*wranges)
-        pnl_id = aeranalyse.lines2bands(pnl, wbands = wranges)
-        df_id = aeranalyse.sum_OUTPUT_RADSUM_over_wbands(pnl_id,
-                                                         V1 = min(V1s), V2 = max(V2s))
-        dict_pnlout[id] = df_id
-    return pd.Panel(dict_pnlout)
+    return aeranalyse.regroup_wavenumber_bands(ds, wbands = wbands)
 
 
 def dTdt_from_pnl_clirad(pnl_clirad, ib=6, cooling_rate=False):
@@ -58,27 +55,23 @@ def dTdt_from_pnl_clirad(pnl_clirad, ib=6, cooling_rate=False):
         
     hr = df[Trate][1:]
 
-    layer_pressure = .5 * (df['pressure'][:-1].values
-                           + df['pressure'][1:].values)
-    hr.index = layer_pressure
+    hr.index = aeranalyse.layer_pressure(df['pressure'].values)
     return hr
 
 
-def hr_from_pnl_crd(pnl_crd, ib=6):
+def hr_from_pnl_crd(ds_crd, ib=6):
     '''
     Returns heating rate in a CLIRAD-SW spectral band from a CRD-SW calculation.
     INPUT:
-    pnl_crd --- Pandas.Panel loaded from OUTPUT_RADSUM
+    ds_crd --- xarray Dataset loaded from OUTPUT_RADSUM
+                (see rtmtools.lblrtm.aerutils.load_OUTPUT_RADSUM())
     ib --- which spectral band
     OUTPUT:
     hr --- Pandas.Series containing heating rate for spectral ib
     '''
     bands_cliradsw = rtmtools.clirad.sw.info.wavenumber_bands()
-    pnl_crd_bands = lines2bands(pnl_crd, wbands=bands_cliradsw)
-    df = pnl_crd_bands[ib]
-    
-    hr = df['heating_rate'][1:]
-    layer_pressure = .5 * (df['pressure'][:-1].values + df['pressure'][1:].values)
-    hr.index = layer_pressure
+    ds = lines2bands(ds_crd, wbands=bands_cliradsw).sel(band=ib)
     
-    return hr
+    return pd.Series(ds['heating_rate'].values[1:],
+                     index=aeranalyse.layer_pressure(ds['pressure'].values),
+                     name='heating_rate')
@@ -2,7 +2,9 @@ import os
 import sys
 import itertools
 import collections
+import functools
 import io
+import timeit
 
 import numpy as np
 import pandas as pd
@@ -93,7 +95,7 @@ def layer_heating_rate(func):
     def callf(*args, **kwargs):
         ds = func(*args, **kwargs)
         da = ds['heating_rate'].sel(level_pressure=ds.coords['level_pressure'][1:])
-        ds['heating_rate'] = (['spectral_band', 'layer_pressure'], da)
+        ds['heating_rate'] = (['spectral_band', 'layer_pressure'], da.values)
         return ds
     return callf
 
@@ -121,10 +123,11 @@ def signed_fluxes_option(func):
 @signed_fluxes_option
 @layer_heating_rate
 @layer_pressure
-def load_OUTPUT_CLIRAD(readfrom = 'OUTPUT_CLIRAD.dat'):
+def load_OUTPUT_CLIRAD_from_DataFrames(readfrom = 'OUTPUT_CLIRAD.dat'):
     '''
-    Reads output data from CLIRAD into a Pandas Panel of dimensions
-    (wavenumber bands, pressure, [flux up, flux down, net flux, heating rate])
+    Reads output data from CLIRAD into an xarray Dataset, one
+    wavenumber band at a time through Pandas DataFrames.
+    Same output as load_OUTPUT_CLIRAD(), which is faster.
     '''
     with open(readfrom, mode = 'r', encoding = 'utf-8') as f:
 
@@ -152,6 +155,128 @@ def load_OUTPUT_CLIRAD(readfrom = 'OUTPUT_CLIRAD.dat'):
 
     return ds
 
+
+
+@functools.lru_cache(maxsize = 32)
+def _OUTPUT_CLIRAD_to_ndarray(realpath, mtime_ns, size):
+    '''
+    Parses OUTPUT_CLIRAD.dat at REALPATH, as it was when last modified
+    at MTIME_NS with SIZE bytes, into read-only arrays.  MTIME_NS and
+    SIZE are only there to key the cache.
+    (see OUTPUT_CLIRAD_to_ndarray())
+    '''
+    with open(realpath, mode = 'r', encoding = 'utf-8') as file:
+        c = file.read()
+
+    band_numbers = collections.deque([])
+    datatexts = collections.deque([])
+    for content_wb in c.split('WAVENUMBER BAND:'):
+        if not content_wb or content_wb.isspace():
+            continue
+        line_band, _, _, datatext = content_wb.strip().split('\n', maxsplit = 3)
+        band_numbers.append(int(line_band.split(maxsplit = 1)[0]))
+        datatexts.append(datatext)
+    band_numbers = np.array(band_numbers, dtype = np.int64)
+
+    data = np.fromstring('\n'.join(datatexts), dtype = np.float64, sep = ' ')
+
+    # level index, pressure, flux up, flux down, net flux, heating rate
+    Nband, Ncolumn = len(band_numbers), 6
+    if data.size % (Nband * Ncolumn):
+        raise ValueError('{} does not contain the same number of levels '
+                         'in every wavenumber band'.format(realpath))
+    data = data.reshape(Nband, -1, Ncolumn)
+    if not (data[:, :, 1] == data[:1, :, 1]).all():
+        raise ValueError('{} does not have the same pressure levels '
+                         'in every wavenumber band'.format(realpath))
+    level_pressures, data = data[0, :, 1].copy(), np.ascontiguousarray(data[:, :, 2:])
+
+    for array in (band_numbers, level_pressures, data):
+        array.flags.writeable = False
+    return band_numbers, level_pressures, data
+
+
+
+def OUTPUT_CLIRAD_to_ndarray(readfrom = 'OUTPUT_CLIRAD.dat'):
+    '''
+    Reads CLIRAD-SW\'s output in a single pass.  The file is parsed
+    again only if it has changed since it was last read; otherwise
+    the arrays from the last read are returned.
+    OUTPUT:
+    band_numbers --- spectral band numbers, in the order in the file
+    level_pressures --- level pressures [mb], in the order in the file,
+                        from the top down
+    data --- read-only array of shape (band, level, 4), with
+             [flux up, flux down, net flux, heating rate]
+             along the last axis
+    '''
+    realpath = os.path.realpath(readfrom)
+    stat = os.stat(realpath)
+    return _OUTPUT_CLIRAD_to_ndarray(realpath, stat.st_mtime_ns, stat.st_size)
+
+
+
+def load_OUTPUT_CLIRAD(readfrom = 'OUTPUT_CLIRAD.dat',
+                       cooling_rate = False, signed_fluxes = True):
+    '''
+    Reads output data from CLIRAD into an xarray Dataset with
+    fluxes of dimensions (spectral_band, level_pressure) and heating
+    rate of dimensions (spectral_band, layer_pressure).  The heating
+    rate of a layer is that given at its lower level.
+    The arrays are built directly from OUTPUT_CLIRAD_to_ndarray(),
+    with the derived variables computed in place.
+    INPUT:
+    cooling_rate --- if True, cooling rate is added as well
+    signed_fluxes --- if True, upward fluxes are negative, and net
+                      flux is the sum of upward and downward fluxes
+    '''
+    band_numbers, level_pressures, data = OUTPUT_CLIRAD_to_ndarray(readfrom)
+    Nband, Nlevel, _ = data.shape
+
+    fluxes = np.array(data[:, :, : 3].transpose(2, 0, 1))
+    if signed_fluxes:
+        np.negative(fluxes[0], out = fluxes[0])
+        np.add(fluxes[0], fluxes[1], out = fluxes[2])
+
+    rates = np.empty((2 if cooling_rate else 1, Nband, Nlevel - 1))
+    rates[0] = data[:, 1:, 3]
+    if cooling_rate:
+        np.negative(rates[0], out = rates[1])
+
+    data_vars = {name: (['spectral_band', 'level_pressure'], fluxes[k])
+                 for k, name in enumerate(['flux_up', 'flux_down', 'net_flux'])}
+    data_vars['heating_rate'] = (['spectral_band', 'layer_pressure'], rates[0])
+    if cooling_rate:
+        data_vars['cooling_rate'] = (['spectral_band', 'layer_pressure'], rates[1])
+
+    return xr.Dataset(
+        data_vars,
+        coords = {'spectral_band': band_numbers,
+                  'level_pressure': level_pressures,
+                  'layer_pressure': .5 * (level_pressures[: -1]
+                                          + level_pressures[1:])})
+
+
+
+def benchmark_load_OUTPUT_CLIRAD(readfrom = 'OUTPUT_CLIRAD.dat', number = 10):
+    '''
+    Returns the mean time [s] taken to read READFROM by
+    load_OUTPUT_CLIRAD() and by load_OUTPUT_CLIRAD_from_DataFrames(),
+    over NUMBER reads each.  load_OUTPUT_CLIRAD()\'s parsing cache is
+    cleared before each read, so that the file is parsed every time.
+    '''
+    def load():
+        _OUTPUT_CLIRAD_to_ndarray.cache_clear()
+        load_OUTPUT_CLIRAD(readfrom = readfrom, cooling_rate = True)
+
+    def load_from_DataFrames():
+        load_OUTPUT_CLIRAD_from_DataFrames(readfrom = readfrom, cooling_rate = True)
+
+    return {'load_OUTPUT_CLIRAD':
+            timeit.timeit(load, number = number) / number,
+            'load_OUTPUT_CLIRAD_from_DataFrames':
+            timeit.timeit(load_from_DataFrames, number = number) / number}
+
     
 
         
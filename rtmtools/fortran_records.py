@@ -0,0 +1,80 @@
+'''
+Fixed-width Fortran records, as in LBLRTM\'s TAPE5 and RRTMG\'s INPUT_RRTM.
+
+A record is declared, as in the record_* functions, by its notes:
+a sequence of (length, fmtspec, value) for its fields from left
+to right.  FMTSPEC is a str.format() specification for the field,
+e.g. \'{:>10.3e}\'.  A field is left blank when FMTSPEC or VALUE is
+None or \'\'.
+
+The values can also be arrays, one value per record, in which case
+the notes declare the layout of a whole block of records.  The notes
+are compiled into a single format string, so a block of any number of
+records is written with one call to str.format(), rather than one
+call per field.
+'''
+import re
+import itertools
+import collections
+import numpy as np
+
+
+
+def is_blank(fmtspec, value):
+    '''
+    Returns True if a field with FMTSPEC and VALUE is to be left blank
+    '''
+    return (fmtspec is None or fmtspec == ''
+            or value is None or (isinstance(value, str) and value == ''))
+
+
+
+def compile_notes(notes):
+    '''
+    Compiles the notes of a record into a format string.
+    INPUT:
+    notes --- sequence of (length, fmtspec, value), one for each field
+    OUTPUT:
+    template --- format string of the record, with one automatically
+                 numbered replacement field for each non-blank field
+    values --- list of the values of the non-blank fields
+    '''
+    fields, values = collections.deque([]), collections.deque([])
+    for length, fmtspec, value in notes:
+        if is_blank(fmtspec, value):
+            fields.append(length * ' ')
+        else:
+            fields.append(re.sub(r'\{\d*(?=[:}])', '{', fmtspec))
+            values.append(value)
+    return ''.join(fields), list(values)
+
+
+
+def format_records(*notes, sep = '\n'):
+    '''
+    Returns a block of records.  Each of NOTES declares a record
+    (see compile_notes()), with each value either a scalar, common to
+    all records, or an array with one value per record.  For the k\'th
+    value of the arrays, one record of each of NOTES is written, in
+    order, so that format_records(notes_a, notes_b) gives
+    a[0], b[0], a[1], b[1], ...
+    INPUT:
+    notes --- notes of one or more records
+    sep --- separator between the records
+    '''
+    templates, columns = zip(*(compile_notes(nts) for nts in notes))
+    columns = [column for values in columns for column in values]
+
+    Nrecords = set(len(column) for column in columns if np.ndim(column))
+    if len(Nrecords) > 1:
+        raise ValueError('Values for the records have different lengths: '
+                         '{}'.format(sorted(Nrecords)))
+    Nrecord = Nrecords.pop() if Nrecords else 1
+
+    columns = [np.asarray(column).tolist() if np.ndim(column)
+               else itertools.repeat(column.item() if hasattr(column, 'item')
+                                     else column, Nrecord)
+               for column in columns]
+
+    template = sep.join(Nrecord * [sep.join(templates)])
+    return template.format(*itertools.chain.from_iterable(zip(*columns)))
@@ -0,0 +1,186 @@
+'''
+Running AER\'s Fortran executables (LBLRTM, RADSUM, LNFL) as asyncio
+subprocesses, each in its own working directory, so that several
+can be run at the same time.
+
+The executables read and write files with fixed names (TAPE3, TAPE5,
+TAPE6, IN_RADSUM, etc.) in their working directory, so each concurrent
+run needs its own directory.  Input files that live elsewhere, such
+as TAPE3, are symlinked into it.
+'''
+import os
+import time
+import asyncio
+import contextlib
+import collections
+import concurrent.futures
+
+
+
+RunResult = collections.namedtuple(
+    'RunResult',
+    ['executable', 'rundir', 'returncode', 'stdout', 'TAPE6_tail',
+     'elapsed', 'timed_out'])
+RunResult.__doc__ = '''
+Outcome of running an executable.
+executable --- path to the executable
+rundir --- working directory it was run in
+returncode --- exit status, None if it timed out
+stdout --- its standard output and standard error
+TAPE6_tail --- last lines of the TAPE6 (LBLRTM\'s log) in RUNDIR, if any,
+               and \'\' for executables that do not write TAPE6
+elapsed --- wall time [s]
+timed_out --- True if it was killed after running out of time
+'''
+
+
+
+class ExecutionError(Exception):
+    pass
+
+
+
+def succeeded(result):
+    '''
+    Returns True if the run in RESULT (a RunResult) exited normally
+    '''
+    return not result.timed_out and result.returncode == 0
+
+
+
+def check(result):
+    '''
+    Raises ExecutionError if the run in RESULT (a RunResult) failed,
+    otherwise returns RESULT
+    '''
+    if not succeeded(result):
+        raise ExecutionError(
+            '{} in {} {}.\n{}\n{}'.format(
+                result.executable, result.rundir,
+                'timed out' if result.timed_out
+                else 'exited with status {}'.format(result.returncode),
+                result.stdout, result.TAPE6_tail))
+    return result
+
+
+
+def link_inputs(links = None, rundir = '.'):
+    '''
+    Symlinks files into RUNDIR, replacing what is there already.
+    INPUT:
+    links --- dictionary of {name in RUNDIR: path of file}
+    '''
+    for name, target in (links or {}).items():
+        path = os.path.join(rundir, name)
+        if os.path.lexists(path):
+            os.remove(path)
+        os.symlink(os.path.abspath(target), path)
+
+
+
+def TAPE6_tail(rundir = '.', Nline = 20):
+    '''
+    Returns the last NLINE lines of the TAPE6 in RUNDIR,
+    or \'\' if there is none
+    '''
+    path = os.path.join(rundir, 'TAPE6')
+    if not os.path.isfile(path):
+        return ''
+    with open(path, mode = 'r', encoding = 'utf-8', errors = 'replace') as file:
+        return ''.join(collections.deque(file, maxlen = Nline))
+
+
+
+async def run_executable(executable, rundir = '.', links = None,
+                         timeout = None, semaphore = None, writes_TAPE6 = True):
+    '''
+    Runs EXECUTABLE in RUNDIR and returns a RunResult.
+    INPUT:
+    executable --- path to the executable
+    rundir --- working directory to run it in
+    links --- dictionary of {name in RUNDIR: path of file} to symlink
+              into RUNDIR before running, e.g. {\'TAPE3\': ...}
+    timeout --- seconds after which the run is killed, None for no limit
+    semaphore --- asyncio.Semaphore bounding how many executables
+                  run at the same time
+    writes_TAPE6 --- False for executables, such as RADSUM, that do not
+                     write TAPE6, so that one left in RUNDIR by another
+                     executable is not reported as theirs
+    '''
+    async with semaphore or contextlib.nullcontext():
+        link_inputs(links, rundir = rundir)
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            os.path.abspath(executable), cwd = rundir,
+            stdin = asyncio.subprocess.DEVNULL,
+            stdout = asyncio.subprocess.PIPE,
+            stderr = asyncio.subprocess.STDOUT)
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+            timed_out = False
+        except asyncio.TimeoutError:
+            process.kill()
+            stdout, _ = await process.communicate()
+            timed_out = True
+        elapsed = time.perf_counter() - start
+
+    return RunResult(executable = executable, rundir = rundir,
+                     returncode = None if timed_out else process.returncode,
+                     stdout = stdout.decode('utf-8', errors = 'replace'),
+                     TAPE6_tail = TAPE6_tail(rundir) if writes_TAPE6 else '',
+                     elapsed = elapsed, timed_out = timed_out)
+
+
+
+async def run_executables(jobs, Nconcurrent = 1, timeout = None):
+    '''
+    Runs all JOBS, at most NCONCURRENT at the same time, and returns
+    their RunResults in the same order.
+    INPUT:
+    jobs --- iterable of dictionaries of arguments to run_executable(),
+             e.g. {\'executable\': ..., \'rundir\': ..., \'links\': ...}
+    (see run_executable() for the other arguments)
+    '''
+    semaphore = asyncio.Semaphore(Nconcurrent)
+    return await asyncio.gather(
+        *(run_executable(timeout = timeout, semaphore = semaphore, **job)
+          for job in jobs))
+
+
+
+def run_coroutine(coroutine):
+    '''
+    Runs COROUTINE to completion and returns its result, in a new event
+    loop.  If an event loop is already running in this thread, as in
+    a Jupyter notebook, the new loop is run in a worker thread, since
+    asyncio.run() cannot be called from a running event loop.
+    '''
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with concurrent.futures.ThreadPoolExecutor(max_workers = 1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+
+def run(executable, rundir = '.', links = None, timeout = None,
+        writes_TAPE6 = True):
+    '''
+    Runs EXECUTABLE in RUNDIR, waits for it to finish, and returns
+    a RunResult.  (see run_executable() for the arguments)
+    '''
+    return run_coroutine(run_executable(executable, rundir = rundir, links = links,
+                                        timeout = timeout,
+                                        writes_TAPE6 = writes_TAPE6))
+
+
+
+def run_all(jobs, Nconcurrent = 1, timeout = None):
+    '''
+    Runs all JOBS, at most NCONCURRENT at the same time, waits for them
+    to finish, and returns their RunResults.
+    (see run_executables() for the arguments)
+    '''
+    return run_coroutine(run_executables(jobs, Nconcurrent = Nconcurrent,
+                                         timeout = timeout))
@@ -1,10 +1,14 @@
 import os
 import sys
+import shutil
+import asyncio
+import tempfile
 import numpy as np
 import itertools
 import collections
 import fileinput
 import rtmtools.lblrtm.create_LBLRTM_input as lblrtmin
+import rtmtools.lblrtm.aer_execute as aer_execute
 
 
 def filepath_TAPE3():
@@ -26,78 +30,301 @@ def filepath_radsum():
     return '/nuwa_cluster/home/jackyu/line_by_line/aerlbl_v12.2_package/radsum/radsum_v2.6_linux_intel_dbl'
 
 
-def lblrtm(atmpro = 'atmopro.dat',
-           CXID = 'Verify RADSUM run_example',
-           V1 = 8., V2 = 2002.,
-           ICNTNM = 1, JLONG = '', TBOUND = 288.2):
+def lblrtm_job(atmpro = 'atmopro.dat',
+               CXID = 'Verify RADSUM run_example',
+               V1 = 8., V2 = 2002.,
+               ICNTNM = 1, JLONG = '', TBOUND = 288.2,
+               rundir = '.'):
     '''
-    Runs the LBLRTM part of flux calculation
+    Writes the TAPE5 for the LBLRTM part of flux calculation in directory
+    RUNDIR, and returns the job for running LBLRTM there
+    (see aer_execute.run_executables())
     '''
-    [os.remove(file)
-     for file in ('TAPE3', 'TAPE5', 'lblrtm') if os.path.isfile(file)]
     lblrtmin.write_fluxcalc_TAPE5(atmpro = atmpro,
                                   CXID = CXID, 
                                   V1 = V1, V2 = V2,
                                   ICNTNM = ICNTNM,
                                   JLONG = JLONG,
-                                  TBOUND = TBOUND)
-    os.symlink(filepath_TAPE3(), 'TAPE3')
-    os.symlink(filepath_lblrtm(), 'lblrtm')
+                                  TBOUND = TBOUND,
+                                  TAPE5name = os.path.join(rundir, 'TAPE5'))
+    return {'executable': filepath_lblrtm(), 'rundir': rundir,
+            'links': {'TAPE3': filepath_TAPE3()}}
+
+
+def lblrtm(atmpro = 'atmopro.dat',
+           CXID = 'Verify RADSUM run_example',
+           V1 = 8., V2 = 2002.,
+           ICNTNM = 1, JLONG = '', TBOUND = 288.2,
+           rundir = '.', timeout = None):
+    '''
+    Runs the LBLRTM part of flux calculation in directory RUNDIR.
+    Returns an aer_execute.RunResult.
+    '''
+    job = lblrtm_job(atmpro = atmpro, CXID = CXID, V1 = V1, V2 = V2,
+                     ICNTNM = ICNTNM, JLONG = JLONG, TBOUND = TBOUND,
+                     rundir = rundir)
     print('Running LBLRTM')
-    os.system('./lblrtm')
+    return aer_execute.run(timeout = timeout, **job)
 
 
-def radsum(atmpro = 'atmopro.dat', V1 = 10., V2 = 2000.,
-           OUTINRAT = 3980, NANG = 3):
+def radsum_job(atmpro = 'atmopro.dat', V1 = 10., V2 = 2000.,
+               OUTINRAT = 3980, NANG = 3,
+               rundir = '.'):
     '''
-    Runs the RADSUM part of the flux calculation: radiance to flux
+    Writes the IN_RADSUM for the RADSUM part of flux calculation in
+    directory RUNDIR, and returns the job for running RADSUM there
+    (see aer_execute.run_executables())
     '''
-    [os.remove(file)
-     for file in ('IN_RADSUM', 'radsum') if os.path.isfile(file)]
     lblrtmin.write_IN_RADSUM(atmpro = atmpro,
                              V1 = V1, V2 = V2,
-                             OUTINRAT = OUTINRAT, NANG = NANG)
-    os.symlink(filepath_radsum(), 'radsum')
+                             OUTINRAT = OUTINRAT, NANG = NANG,
+                             saveas = os.path.join(rundir, 'IN_RADSUM'))
+    return {'executable': filepath_radsum(), 'rundir': rundir,
+            'writes_TAPE6': False}
+
+
+def radsum(atmpro = 'atmopro.dat', V1 = 10., V2 = 2000.,
+           OUTINRAT = 3980, NANG = 3,
+           rundir = '.', timeout = None):
+    '''
+    Runs the RADSUM part of the flux calculation in directory RUNDIR:
+    radiance to flux.  Returns an aer_execute.RunResult.
+    '''
+    job = radsum_job(atmpro = atmpro, V1 = V1, V2 = V2,
+                     OUTINRAT = OUTINRAT, NANG = NANG, rundir = rundir)
     print('Running RADSUM')
-    os.system('./radsum')
+    return aer_execute.run(timeout = timeout, **job)
+
+
+
+def wavenumber_sections(V1 = 8., V2 = 2002., DeltaV = 2000.):
+    '''
+    Returns a list of (v1, v2) sections of length DELTAV
+    covering the wavenumber range between V1 and V2, with an
+    additional section if there are any wavenumber left.
+    DELTAV is limited by AER to be 2020 cm-1.
+    '''
+    if DeltaV > 2020:
+        raise ValueError('DeltaV must be <= 2020 cm -1')
+    boundary_Vs = np.append(np.arange(V1, V2, DeltaV), V2)
+    return list(zip(boundary_Vs[:-1], boundary_Vs[1:]))
+
+
+def section_dirname(v1, v2):
+    '''
+    Returns the name of the scratch directory for section (v1, v2)
+    '''
+    return 'V1_{}_V2_{}'.format(v1, v2)
+
+
+def run_section(v1, v2, rundir = '.',
+                atmpro = 'atmopro.dat', CXID = 'Verify RADSUM run_example',
+                TBOUND = 288.20, ICNTNM = 0, JLONG = '', timeout = None):
+    '''
+    Runs LBLRTM and RADSUM for the wavenumber section between V1 and V2
+    in directory RUNDIR, which holds this section\'s TAPE3, TAPE5 and
+    IN_RADSUM.  Returns the path to the section\'s OUTPUT_RADSUM, and the
+    aer_execute.RunResults of LBLRTM and RADSUM.  Raises
+    aer_execute.ExecutionError if either fails.
+    '''
+    os.makedirs(rundir, exist_ok = True)
+    print('V1 = {}, V2 = {}'.format(v1, v2))
+    results = [
+        aer_execute.check(
+            lblrtm(atmpro = atmpro,
+                   CXID = CXID,
+                   V1 = v1, V2 = v2,
+                   ICNTNM = ICNTNM, JLONG = JLONG, TBOUND = TBOUND,
+                   rundir = rundir, timeout = timeout)),
+        aer_execute.check(
+            radsum(atmpro = atmpro,
+                   V1 = v1, V2 = v2,
+                   OUTINRAT = 2,
+                   rundir = rundir, timeout = timeout))]
+    return os.path.join(rundir, 'OUTPUT_RADSUM'), results
+
+
+async def run_section_async(v1, v2, rundir = '.', semaphore = None,
+                            atmpro = 'atmopro.dat', CXID = 'Verify RADSUM run_example',
+                            TBOUND = 288.20, ICNTNM = 0, JLONG = '', timeout = None):
+    '''
+    Same as run_section(), but as a coroutine, with SEMAPHORE
+    (an asyncio.Semaphore) bounding the number of executables running
+    at the same time over all sections
+    '''
+    os.makedirs(rundir, exist_ok = True)
+    jobs = (lblrtm_job(atmpro = atmpro, CXID = CXID, V1 = v1, V2 = v2,
+                       ICNTNM = ICNTNM, JLONG = JLONG, TBOUND = TBOUND,
+                       rundir = rundir),
+            radsum_job(atmpro = atmpro, V1 = v1, V2 = v2,
+                       OUTINRAT = 2, rundir = rundir))
+    results = collections.deque([])
+    for job in jobs:
+        result = await aer_execute.run_executable(semaphore = semaphore,
+                                                  timeout = timeout, **job)
+        results.append(aer_execute.check(result))
+    return os.path.join(rundir, 'OUTPUT_RADSUM'), list(results)
+
+
+async def run_sections(V1V2s, rundirs, Nconcurrent = 1, **run_kwargs):
+    '''
+    Runs the wavenumber sections V1V2S, each in its directory in RUNDIRS,
+    with at most NCONCURRENT executables running at the same time.
+    Returns the output of run_section() for each section.
+    '''
+    semaphore = asyncio.Semaphore(Nconcurrent)
+    return await asyncio.gather(
+        *(run_section_async(v1, v2, rundir = rundir, semaphore = semaphore,
+                            **run_kwargs)
+          for (v1, v2), rundir in zip(V1V2s, rundirs)))
+
+
+def section_cache_key(cache, v1, v2, rundir = '.',
+                      atmpro = 'atmopro.dat', CXID = 'Verify RADSUM run_example',
+                      TBOUND = 288.20, ICNTNM = 0, JLONG = ''):
+    '''
+    Writes the TAPE5 and IN_RADSUM for the wavenumber section between
+    V1 and V2 in directory RUNDIR, and returns their key in CACHE
+    (a rtmtools.lblrtm.runcache.RunCache).
+    '''
+    os.makedirs(rundir, exist_ok = True)
+    path_TAPE5 = os.path.join(rundir, 'TAPE5')
+    path_IN_RADSUM = os.path.join(rundir, 'IN_RADSUM')
+    lblrtmin.write_fluxcalc_TAPE5(atmpro = atmpro,
+                                  CXID = CXID,
+                                  V1 = v1, V2 = v2,
+                                  ICNTNM = ICNTNM,
+                                  JLONG = JLONG,
+                                  TBOUND = TBOUND,
+                                  TAPE5name = path_TAPE5)
+    lblrtmin.write_IN_RADSUM(atmpro = atmpro,
+                             V1 = v1, V2 = v2,
+                             OUTINRAT = 2,
+                             saveas = path_IN_RADSUM)
+    with open(path_TAPE5, mode = 'r', encoding = 'utf-8') as file:
+        TAPE5 = file.read()
+    with open(path_IN_RADSUM, mode = 'r', encoding = 'utf-8') as file:
+        IN_RADSUM = file.read()
+    return cache.key(TAPE5 = TAPE5, IN_RADSUM = IN_RADSUM,
+                     TAPE3 = filepath_TAPE3())
+
+
+def merge_OUTPUT_RADSUMs(readfroms, saveas = 'OUTPUT_RADSUM'):
+    '''
+    Concatenates the OUTPUT_RADSUM files in READFROMS, in the given
+    order, into SAVEAS.
+    '''
+    with open(saveas, mode = 'w', encoding = 'utf-8') as fout:
+        for line in fileinput.input(readfroms):
+            fout.write(line)
 
 
 def run(atmpro = 'atmopro.dat', CXID = 'Verify RADSUM run_example',
         V1 = 8., V2 = 2002., TBOUND = 288.20, ICNTNM = 0, JLONG = '',
-        DeltaV = 2000.):
+        DeltaV = 2000., Nworkers = 1, scratchdir = None,
+        keep_scratch = False, cache = None, timeout = None,
+        sections = None):
     '''
     Runs LBLRTM and RADSUM given their inputs.  The wavenumber range
     between V1 and V2 is split into sections of length DELTAV
     , with an additional section if there are any wavenumber left.
     DELTAV is limited by AER to be 2020 cm-1.  For each section
     LBLRTM and RADSUM are run.  
+
+    With NWORKERS > 1, or if SCRATCHDIR is given, each section is
+    run in its own directory under SCRATCHDIR (by default a new
+    directory \'sections_*\' in the current directory), with up to
+    NWORKERS executables running at the same time.
+    The sections\' OUTPUT_RADSUM are merged in wavenumber order into
+    OUTPUT_RADSUM in the current directory.
+
+    If CACHE is given, sections whose TAPE5, IN_RADSUM and TAPE3 are
+    found in it reuse the cached OUTPUT_RADSUM instead of running
+    LBLRTM and RADSUM, and the results of the other sections are
+    added to it.
+    INPUT:
+    Nworkers --- maximum number of sections run at the same time
+    scratchdir --- directory in which the sections\' directories are made
+    keep_scratch --- False to remove the sections\' directories after
+                     merging, and SCRATCHDIR too if it was made by run()
+    cache --- rtmtools.lblrtm.runcache.RunCache, or None for no caching
+    timeout --- seconds after which a run of LBLRTM or RADSUM is killed
+    sections --- list of (v1, v2) to run instead of the sections of
+                 length DELTAV, e.g. from section_planner.plan_sections()
+    OUTPUT:
+    results --- dictionary of {(v1, v2): [aer_execute.RunResult of LBLRTM
+                and RADSUM]}, for the sections that were run
     '''
-    if DeltaV > 2020:
-        raise ValueError('DeltaV must be <= 2020 cm -1')
-    
-    boundary_Vs = np.append(np.arange(V1, V2, DeltaV), V2)
-    V1V2s = itertools.zip_longest(boundary_Vs[:-1], boundary_Vs[1:])
+    if sections is None:
+        V1V2s = wavenumber_sections(V1 = V1, V2 = V2, DeltaV = DeltaV)
+    else:
+        V1V2s = [tuple(section) for section in sections]
+        if any(v2 - v1 > 2020 for v1, v2 in V1V2s):
+            raise ValueError('Sections must be <= 2020 cm -1 long')
     
-    output_radsum_names = collections.deque([])
-    for v1, v2 in V1V2s:
-        print('V1 = {}, V2 = {}'.format(v1, v2))
-        OUTINRAT = int(2 * (v2 - v1))
-        lblrtm(atmpro = atmpro,
-               CXID = CXID,
-               V1 = v1, V2 = v2,
-               ICNTNM = ICNTNM, JLONG = JLONG, TBOUND = TBOUND)
-        radsum(atmpro = atmpro,
-               V1 = v1, V2 = v2,
-               OUTINRAT = 2)
-        output_radsum_name = ''.join(['OUTPUT_RADSUM', '_V1_{}_V2_{}'.format(v1, v2)])
-        os.rename('OUTPUT_RADSUM', output_radsum_name)
-        output_radsum_names.append(output_radsum_name)
-
-    with open('OUTPUT_RADSUM', mode = 'w', encoding = 'utf-8') as fout:
-        for line in fileinput.input(output_radsum_names):
-            fout.write(line)
+    run_kwargs = dict(atmpro = atmpro, CXID = CXID,
+                      TBOUND = TBOUND, ICNTNM = ICNTNM, JLONG = JLONG,
+                      timeout = timeout)
+    results = {}
+
+    if Nworkers == 1 and scratchdir is None:
+        output_radsum_names = collections.deque([])
+        for v1, v2 in V1V2s:
+            key = None
+            if cache is not None:
+                key = section_cache_key(cache, v1, v2, rundir = '.', **run_kwargs)
+            if key is None or not cache.get(key, saveas = 'OUTPUT_RADSUM'):
+                _, results[(v1, v2)] = run_section(v1, v2, rundir = '.', **run_kwargs)
+                if key is not None:
+                    cache.put(key, readfrom = 'OUTPUT_RADSUM')
+            output_radsum_name = '_'.join(['OUTPUT_RADSUM', section_dirname(v1, v2)])
+            os.rename('OUTPUT_RADSUM', output_radsum_name)
+            output_radsum_names.append(output_radsum_name)
+
+        merge_OUTPUT_RADSUMs(output_radsum_names, saveas = 'OUTPUT_RADSUM')
+        [os.remove(file) for file in output_radsum_names]
+        return results
+
+    made_scratchdir = scratchdir is None
+    if made_scratchdir:
+        scratchdir = tempfile.mkdtemp(prefix = 'sections_', dir = '.')
+    rundirs = [os.path.join(scratchdir, section_dirname(v1, v2))
+               for v1, v2 in V1V2s]
+    output_radsum_names = [os.path.join(rundir, 'OUTPUT_RADSUM')
+                           for rundir in rundirs]
 
-    [os.remove(file) for file in output_radsum_names]
+    # look up all sections in the cache here, so that only
+    # the missing ones are sent to the process pool
+    if cache is not None:
+        keys = [section_cache_key(cache, v1, v2, rundir = rundir, **run_kwargs)
+                for (v1, v2), rundir in zip(V1V2s, rundirs)]
+        todos = [(v1, v2, rundir, key)
+                 for (v1, v2), rundir, key, output_radsum_name
+                 in zip(V1V2s, rundirs, keys, output_radsum_names)
+                 if not cache.get(key, saveas = output_radsum_name)]
+    else:
+        todos = [(v1, v2, rundir, None)
+                 for (v1, v2), rundir in zip(V1V2s, rundirs)]
+
+    if todos:
+        v1s, v2s, todo_rundirs, todo_keys = zip(*todos)
+        todo_outputs, todo_results = zip(
+            *aer_execute.run_coroutine(
+                run_sections(list(zip(v1s, v2s)), todo_rundirs,
+                             Nconcurrent = Nworkers, **run_kwargs)))
+        results.update(zip(zip(v1s, v2s), todo_results))
+        if cache is not None:
+            [cache.put(key, readfrom = output)
+             for key, output in zip(todo_keys, todo_outputs)]
+
+    merge_OUTPUT_RADSUMs(output_radsum_names, saveas = 'OUTPUT_RADSUM')
+
+    if not keep_scratch:
+        if made_scratchdir:
+            shutil.rmtree(scratchdir)
+        else:
+            [shutil.rmtree(rundir) for rundir in rundirs]
+    return results
         
     
         
@@ -106,6 +333,18 @@ def run(atmpro = 'atmopro.dat', CXID = 'Verify RADSUM run_example',
 
 
 
+def section_timings(results):
+    '''
+    Returns the wall time [s] taken by LBLRTM and RADSUM in each section
+    INPUT:
+    results --- dictionary of {(v1, v2): [aer_execute.RunResult, ...]},
+                as returned by run()
+    '''
+    return {section: sum(result.elapsed for result in section_results)
+            for section, section_results in results.items()}
+
+
+
 if __name__ == '__main__':
     pass
 
@@ -1,9 +1,20 @@
 import os
 import sys
-import create_LBLRTM_input as lblrtmin
+import shutil
+import hashlib
+import argparse
+import tempfile
+import collections
+import rtmtools.lblrtm.create_LBLRTM_input as lblrtmin
+import rtmtools.lblrtm.aer_execute as aer_execute
 
 
 
+# LNFL\'s molecule mask, one flag for each of its 39 molecules
+NMOLECULE = 39
+MIND1_DEFAULT = NMOLECULE * '0'
+
+
 
 def filepath_aerlinefile():
     return '/nuwa_cluster/home/jackyu/line_by_line/aerlbl_v12.2_package/aer_v_3.2/line_file/aer_v_3.2'
@@ -15,27 +26,249 @@ def filepath_lnfl():
 
 def lnfl(XID = '',
          VMIN = 0., VMAX = 3000.,
-         MIND1 = 39 * '0', HOLIND1 = '',
-         saveas = 'TAPE3'):
+         MIND1 = MIND1_DEFAULT, HOLIND1 = '',
+         saveas = 'TAPE3', rundir = '.', timeout = None):
     '''
-    Writes TAPE5 for LNFL, runs it and write TAPE3 to disk
+    Writes TAPE5 for LNFL, runs it in directory RUNDIR and moves
+    the TAPE3 it writes to SAVEAS.  Returns an aer_execute.RunResult.
+    Raises aer_execute.ExecutionError if LNFL fails.
     '''
-    [os.remove(file)
-     for file in ('TAPE1', 'TAPE3', 'TAPE5', 'lnfl') if os.path.isfile(file)]
+    os.makedirs(rundir, exist_ok = True)
+    [os.remove(os.path.join(rundir, file))
+     for file in ('TAPE3', 'TAPE5') if os.path.isfile(os.path.join(rundir, file))]
 
     lblrtmin.write_LNFL_TAPE5(XID = XID,
                               VMIN = VMIN, VMAX = VMAX,
-                              MIND1 = MIND1, HOLIND1 = HOLIND1)
-    
-    os.symlink(filepath_aerlinefile(), 'TAPE1')
-    os.symlink(filepath_lnfl(), 'lnfl')
+                              MIND1 = MIND1, HOLIND1 = HOLIND1,
+                              saveas = os.path.join(rundir, 'TAPE5'))
     
     print('Running LNFL')
-    os.system('lnfl')
+    result = aer_execute.check(
+        aer_execute.run(filepath_lnfl(), rundir = rundir,
+                        links = {'TAPE1': filepath_aerlinefile()},
+                        timeout = timeout))
 
-    os.rename('TAPE3', saveas)
-    
-    
+    os.replace(os.path.join(rundir, 'TAPE3'), saveas)
+    return result
+
+
+
+def normalise_MIND1(MIND1 = MIND1_DEFAULT):
+    '''
+    Returns the molecule mask MIND1 with a flag for each of LNFL\'s
+    molecules, blanks and missing trailing flags being \'0\', which
+    is how LNFL reads them
+    '''
+    MIND1 = MIND1.strip().replace(' ', '0')
+    if len(MIND1) > NMOLECULE:
+        raise ValueError('MIND1 has more than {} flags: {}'.format(NMOLECULE, MIND1))
+    return MIND1.ljust(NMOLECULE, '0')
+
+
+def TAPE3_mask_key(MIND1 = MIND1_DEFAULT, HOLIND1 = ''):
+    '''
+    Returns a string identifying the molecule mask MIND1 and the
+    options HOLIND1 of an LNFL run, with MIND1 normalised
+    (see normalise_MIND1()) and HOLIND1's words in a canonical order
+    '''
+    sha = hashlib.sha1()
+    sha.update(normalise_MIND1(MIND1).encode('utf-8'))
+    sha.update(b'\0')
+    sha.update(' '.join(sorted(HOLIND1.split())).encode('utf-8'))
+    return sha.hexdigest()[:16]
+
+
+
+TAPE3Entry = collections.namedtuple('TAPE3Entry', ['path', 'VMIN', 'VMAX', 'size'])
+
+
+
+class TAPE3Store(object):
+    '''
+    Directory of the TAPE3s written by LNFL, one sub-directory for each
+    molecule mask and HOLIND1, with each TAPE3 named by its VMIN and
+    VMAX.  A request for a TAPE3 is served by any stored TAPE3 with
+    the same mask and HOLIND1 whose wavenumber range covers that
+    requested, the narrowest such one being chosen, so that LNFL is
+    only run when none does.
+    INPUT:
+    storedir --- directory in which the TAPE3s are saved
+    '''
+    def __init__(self, storedir = 'TAPE3_store'):
+        self.storedir = storedir
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.storedir, exist_ok = True)
+
+    def path(self, VMIN = 0., VMAX = 3000., MIND1 = MIND1_DEFAULT, HOLIND1 = ''):
+        '''
+        Returns the path at which the TAPE3 for exactly these
+        arguments is saved
+        '''
+        return os.path.join(self.storedir, TAPE3_mask_key(MIND1, HOLIND1),
+                            '{!r}_{!r}'.format(float(VMIN), float(VMAX)))
+
+    def entries(self, MIND1 = None, HOLIND1 = ''):
+        '''
+        Returns a list of TAPE3Entry for the stored TAPE3s, either all
+        of them or, if MIND1 is given, only those for MIND1 and HOLIND1.
+        '''
+        if MIND1 is None:
+            keys = [name for name in os.listdir(self.storedir)
+                    if os.path.isdir(os.path.join(self.storedir, name))]
+        else:
+            keys = [TAPE3_mask_key(MIND1, HOLIND1)]
+
+        entries = collections.deque([])
+        for key in keys:
+            keydir = os.path.join(self.storedir, key)
+            if not os.path.isdir(keydir):
+                continue
+            for name in os.listdir(keydir):
+                if name.startswith('.'):
+                    continue
+                vmin, _, vmax = name.partition('_')
+                path = os.path.join(keydir, name)
+                entries.append(TAPE3Entry(path = path,
+                                          VMIN = float(vmin), VMAX = float(vmax),
+                                          size = os.path.getsize(path)))
+        return list(entries)
+
+    def find(self, VMIN = 0., VMAX = 3000., MIND1 = MIND1_DEFAULT, HOLIND1 = ''):
+        '''
+        Returns the path of the narrowest stored TAPE3 for MIND1 and
+        HOLIND1 covering VMIN to VMAX, or None if there is none.
+        Does not count towards the hit/miss counts.
+        '''
+        covering = [entry for entry in self.entries(MIND1, HOLIND1)
+                    if entry.VMIN <= VMIN and entry.VMAX >= VMAX]
+        if not covering:
+            return None
+        return min(covering, key = lambda entry: entry.VMAX - entry.VMIN).path
+
+    def get(self, XID = '', VMIN = 0., VMAX = 3000.,
+            MIND1 = MIND1_DEFAULT, HOLIND1 = '',
+            rundir = None, timeout = None):
+        '''
+        Returns the path of a TAPE3 for MIND1 and HOLIND1 covering VMIN
+        to VMAX, running LNFL and saving its TAPE3 in the store if none
+        is stored already.  (see lnfl() for the arguments)
+        rundir --- directory to run LNFL in.  A temporary one is used
+                   and removed afterwards if None.
+        '''
+        path = self.find(VMIN = VMIN, VMAX = VMAX, MIND1 = MIND1, HOLIND1 = HOLIND1)
+        if path is not None:
+            os.utime(path)
+            self.hits += 1
+            return path
+
+        self.misses += 1
+        path = self.path(VMIN = VMIN, VMAX = VMAX, MIND1 = MIND1, HOLIND1 = HOLIND1)
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        tmpdir = tempfile.mkdtemp(dir = os.path.dirname(path), prefix = '.run')
+        fd, tmppath = tempfile.mkstemp(dir = os.path.dirname(path), prefix = '.tmp')
+        os.close(fd)
+        try:
+            lnfl(XID = XID, VMIN = VMIN, VMAX = VMAX,
+                 MIND1 = MIND1, HOLIND1 = HOLIND1,
+                 saveas = tmppath, rundir = rundir or tmpdir, timeout = timeout)
+            os.replace(tmppath, path)
+        finally:
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
+            shutil.rmtree(tmpdir, ignore_errors = True)
+        return path
+
+    def prune(self, max_bytes = None):
+        '''
+        Removes the stored TAPE3s whose wavenumber range is covered by
+        another one with the same mask and HOLIND1, and then, if
+        MAX_BYTES is given, the least recently used TAPE3s until the
+        store is not larger than MAX_BYTES.  Returns the paths removed.
+        '''
+        removed = collections.deque([])
+
+        bykey = collections.defaultdict(list)
+        for entry in self.entries():
+            bykey[os.path.dirname(entry.path)].append(entry)
+        for entries in bykey.values():
+            for entry in entries:
+                if any(other.path != entry.path
+                       and other.VMIN <= entry.VMIN and other.VMAX >= entry.VMAX
+                       for other in entries):
+                    os.remove(entry.path)
+                    removed.append(entry.path)
+
+        if max_bytes is not None:
+            entries = sorted(self.entries(),
+                             key = lambda entry: os.stat(entry.path).st_mtime_ns)
+            total = sum(entry.size for entry in entries)
+            for entry in entries:
+                if total <= max_bytes:
+                    break
+                os.remove(entry.path)
+                removed.append(entry.path)
+                total -= entry.size
+
+        [os.rmdir(os.path.join(self.storedir, name))
+         for name in os.listdir(self.storedir)
+         if os.path.isdir(os.path.join(self.storedir, name))
+         and not os.listdir(os.path.join(self.storedir, name))]
+        return list(removed)
+
+    def stats(self):
+        '''
+        Returns a dictionary of hit/miss counts and the store's size
+        '''
+        entries = self.entries()
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': len(entries),
+                'bytes': sum(entry.size for entry in entries)}
+
+
+
+def main(argv = None):
+    '''
+    Command line interface to TAPE3Store
+    '''
+    parser = argparse.ArgumentParser(description = 'Manage a store of LNFL TAPE3s.')
+    parser.add_argument('--storedir', default = 'TAPE3_store',
+                        help = 'directory of the TAPE3 store')
+    commands = parser.add_subparsers(dest = 'command')
+    commands.required = True
+
+    get = commands.add_parser('get', help = 'print the path of a TAPE3, '
+                                            'running LNFL if needed')
+    get.add_argument('--XID', default = '')
+    get.add_argument('--VMIN', type = float, default = 0.)
+    get.add_argument('--VMAX', type = float, default = 3000.)
+    get.add_argument('--MIND1', default = MIND1_DEFAULT, help = 'molecule mask')
+    get.add_argument('--HOLIND1', default = '')
+    get.add_argument('--timeout', type = float, default = None)
+
+    prune = commands.add_parser('prune', help = 'remove redundant TAPE3s')
+    prune.add_argument('--max-bytes', type = int, default = None,
+                       help = 'also remove least recently used TAPE3s '
+                              'until the store is no larger than this')
+
+    commands.add_parser('list', help = 'list the stored TAPE3s')
+    args = parser.parse_args(argv)
+
+    store = TAPE3Store(storedir = args.storedir)
+    if args.command == 'get':
+        print(store.get(XID = args.XID, VMIN = args.VMIN, VMAX = args.VMAX,
+                        MIND1 = args.MIND1, HOLIND1 = args.HOLIND1,
+                        timeout = args.timeout))
+        print(store.stats())
+    elif args.command == 'prune':
+        for path in store.prune(max_bytes = args.max_bytes):
+            print('removed {}'.format(path))
+        print(store.stats())
+    elif args.command == 'list':
+        for entry in store.entries():
+            print('{} {} {} {}'.format(entry.path, entry.VMIN, entry.VMAX, entry.size))
 
 
 
+if __name__ == '__main__':
+    main()
@@ -4,10 +4,12 @@ import collections
 import sys
 import numpy as np
 import pandas as pd
+import xarray as xr
 import io
 
 import rtmtools.lblrtm.aerutils as aerutils
 import rtmtools.lblrtm.create_LBLRTM_input as lblrtmin
+import rtmtools.result_store as result_store
 
 
 
@@ -93,17 +95,102 @@ def sum_OUTPUT_RADSUM_over_wbands(pnl, V1 = 820., V2 = 50000.):
 
 
 
-def lines2bands(pnl, wbands = None):
+def nearest_indices(values, targets):
+    '''
+    Returns the indices of the elements of VALUES, sorted in ascending
+    order, that are closest to each of TARGETS.  Ties go to the lower
+    index, as with np.abs(values - target).argmin().
+    Raises ValueError if VALUES are not in ascending order.
+    '''
+    values, targets = np.asarray(values), np.asarray(targets)
+    if np.any(np.diff(values) < 0):
+        raise ValueError('The values are not in ascending order')
+    if len(values) == 1:
+        return np.zeros(targets.shape, dtype = int)
+    upper = np.clip(np.searchsorted(values, targets), 1, len(values) - 1)
+    lower = upper - 1
+    return np.where(np.abs(values[upper] - targets) < np.abs(values[lower] - targets),
+                    upper, lower)
+
+
+
+def regroup_wavenumber_bands(ds, wbands = None):
+    '''
+    Sums the fine wavenumber intervals of DS into wavenumber bands
+    (except pressure).  The fluxes and rates are summed over the fine
+    intervals once, cumulatively, so that the sum over any band is the
+    difference between two cumulative sums.  As in
+    sum_OUTPUT_RADSUM_over_wbands(), the bands' limits are rounded to
+    the closest limits of the fine intervals.
+    INPUT:
+    ds --- xarray Dataset (band, level), with V1 and V2 along band
+           (see aerutils.load_OUTPUT_RADSUM()).  The fine intervals
+           are sorted by V1 first if they are not in that order.
+    wbands --- wavenumber bands, either a list of (V1, V2),
+               e.g. [(10., 2000), (4000, 10000)], or a dictionary of
+               {id: [(V1, V2), ...]} for bands of one or more
+               wavenumber ranges, like CLIRAD-SW\'s
+               (see rtmtools.clirad.sw.info.wavenumber_bands())
+    OUTPUT:
+    ds --- xarray Dataset (band, level), with V1 and V2 the lowest and
+           highest wavenumbers of each band, and, for a dictionary
+           WBANDS, the ids as coordinate along band
+    Raises ValueError if, once sorted by V1, the fine intervals\' V2
+    are not in ascending order too, as when they overlap.
+    '''
+    order = np.argsort(ds['V1'].values, kind = 'stable')
+    if np.any(order != np.arange(len(order))):
+        ds = ds.isel(band = order)
+
+    if isinstance(wbands, dict):
+        ids, wranges = list(wbands.keys()), list(wbands.values())
+    else:
+        ids, wranges = None, [[wband] for wband in wbands]
+
+    # bands of each range, and its limits
+    range_bands = np.repeat(np.arange(len(wranges)),
+                            [len(ranges) for ranges in wranges])
+    range_V1s, range_V2s = np.array([wrange for ranges in wranges
+                                     for wrange in ranges],
+                                    dtype = np.float64).reshape(-1, 2).T
+    item1s = nearest_indices(ds['V1'].values, range_V1s)
+    item2s = nearest_indices(ds['V2'].values, range_V2s)
+
+    names = [name for name in ds.data_vars if name != 'pressure']
+    data = np.stack([ds[name].transpose('band', 'level').values
+                     for name in names], axis = -1)
+    cumsums = np.concatenate([np.zeros((1,) + data.shape[1:]),
+                              np.cumsum(data, axis = 0)])
+
+    sums = np.zeros((len(wranges),) + data.shape[1:])
+    np.add.at(sums, range_bands, cumsums[item2s + 1] - cumsums[item1s])
+
+    V1s = np.array([min(V1 for V1, _ in ranges) for ranges in wranges], dtype = np.float64)
+    V2s = np.array([max(V2 for _, V2 in ranges) for ranges in wranges], dtype = np.float64)
+    pressure = ds['pressure'].transpose('band', 'level').values[0]
+
+    variables = {name: (['band', 'level'], sums[:, :, k])
+                 for k, name in enumerate(names)}
+    variables['pressure'] = (['band', 'level'],
+                             np.broadcast_to(pressure, sums.shape[: 2]).copy())
+    coords = {'V1': ('band', V1s), 'V2': ('band', V2s),
+              'level': ds['level'].values}
+    if ids is not None:
+        coords['band'] = ids
+    return xr.Dataset(variables, coords = coords)[['pressure'] + names]
+
+
+
+def lines2bands(ds, wbands = None):
     '''
     Group fine wavenumber intervals into bands (except pressure)
     INPUT:
-    pnl --- Pandas Panel
-            (wavenumber, level, attributes)
+    ds --- xarray Dataset
+           (wavenumber, level), as from aerutils.load_OUTPUT_RADSUM()
     wbands --- wavenumber bands. e.g. [(10., 2000), (4000, 10000)]
+    (see regroup_wavenumber_bands())
     '''
-    return pd.Panel({(V1, V2):
-                     sum_OUTPUT_RADSUM_over_wbands(pnl, V1 = V1, V2 = V2)
-                     for V1, V2 in wbands}) 
+    return regroup_wavenumber_bands(ds, wbands = wbands)
 
 
 def normalise_by_TOA_flux_down(pnl, normalise_to = None):
@@ -126,15 +213,81 @@ def normalise_by_TOA_flux_down(pnl, normalise_to = None):
 
 
 
+# heating rate [K/day] per unit net flux divergence [W m-2 mb-1],
+# g / cp in K day-1 (W m-2)-1 mb
+HEATING_RATE_FACTOR = 8.4410
+
+
+
+def layer_pressure(pressure, dtype = None, out = None):
+    '''
+    Returns the pressures at the middle of the layers between
+    adjacent levels.
+    INPUT:
+    pressure --- level pressures of shape (..., level)
+    dtype --- data type of the output, e.g. np.float32
+              (default = that of PRESSURE)
+    out --- array of shape (..., level - 1) to write the output in
+    '''
+    pressure = np.asarray(pressure)
+    if out is None:
+        out = np.empty(pressure.shape[: -1] + (pressure.shape[-1] - 1,),
+                       dtype = dtype or pressure.dtype)
+    np.add(pressure[..., : -1], pressure[..., 1:], out = out)
+    return np.multiply(out, .5, out = out)
+
+
+
+def heating_rate(pressure, net_flux, cooling_rate = False,
+                 dtype = None, out = None):
+    '''
+    Computes heating rates of the layers between adjacent levels
+    from level pressures and net fluxes, for any number of bands,
+    runs, columns, etc. at once.
+    INPUT:
+    pressure --- level pressures [mb] of shape (..., level),
+                 broadcastable to the shape of NET_FLUX, e.g. (level,)
+                 if all columns have the same levels
+    net_flux --- net fluxes [W m-2] of shape (..., level),
+                 e.g. (run, column, band, level)
+    cooling_rate --- if True, returns cooling rates instead
+    dtype --- data type of the output, e.g. np.float32
+              (default = that of NET_FLUX)
+    out --- array of shape (..., level - 1) to write the output in,
+            so that no array of that size is allocated
+    OUTPUT:
+    rate --- heating (or cooling) rates [K/day] of shape (..., level - 1),
+             with the rate of the layer between levels k and k + 1
+             at k
+    '''
+    pressure, net_flux = np.asarray(pressure), np.asarray(net_flux)
+    shape = np.broadcast_shapes(pressure.shape, net_flux.shape)
+    if out is None:
+        out = np.empty(shape[: -1] + (shape[-1] - 1,),
+                       dtype = dtype or net_flux.dtype)
+
+    np.subtract(net_flux[..., : -1], net_flux[..., 1:], out = out)
+    np.divide(out, np.diff(pressure, axis = -1), out = out)
+    return np.multiply(out,
+                       - HEATING_RATE_FACTOR if cooling_rate else HEATING_RATE_FACTOR,
+                       out = out)
+
+
+
 def netflux_to_heating_rate(df):
     '''
     Computes heating rate from level pressures and net fluxes
+    (see heating_rate())
+    INPUT:
+    df --- DataFrame of net fluxes, indexed by level pressure, with
+           a column for each band, run, etc.
+    OUTPUT:
+    DataFrame of heating rates, the rate of the layer between
+    two levels being at the lower of the two, and zero at the first
     '''
     pres, netflux = df.index.values, df.values
-    hr_data = (netflux[: -1] - netflux[1:]) / \
-              (pres[1:] - pres[: -1])[:, np.newaxis] * 8.4410
-    hr_data = np.concatenate([np.zeros(hr_data[0, :][np.newaxis, :].shape), \
-                              hr_data], axis = 0)
+    hr_data = np.zeros(netflux.shape)
+    heating_rate(pres, netflux.T, out = hr_data[1:].T)
     return pd.DataFrame(hr_data, index = df.index, columns = df.columns)
         
 
@@ -152,7 +305,10 @@ def save_OUTPUT_RADSUM_summary(path_OUTPUT_RADSUM = '',
     
     '''
     Summarises and writes results of a line-by-line calculation to
-    an Excel file
+    an Excel file (SAVEAS ending in .xlsx) or an HDF5 store.  If SAVEAS
+    ends in .zarr, the fluxes in all bands are instead appended to
+    the \'lblrtm\' group of that result store
+    (see rtmtools.result_store.ResultStore).
     '''
     # wave number bands
     band_labels = ['{} ~ {} cm-1'.format(v1, v2) for v1, v2 in wavenumber_bands]
@@ -202,9 +358,12 @@ def save_OUTPUT_RADSUM_summary(path_OUTPUT_RADSUM = '',
             cor_df.to_excel(writer, sheet_name = 'cor plotdata')
             three_levels_summary.to_excel(writer,
                                           sheet_name = '3 levels summary')
+    elif saveas.endswith('.zarr'):
+        result_store.ResultStore(saveas).append_output('lblrtm', path_OUTPUT_RADSUM,
+                                                       signed_fluxes = True)
     else:
         waveband_keys = ['V1_{}_V2_{}'.format(v1, v2) for v1, v2 in wavenumber_bands]
-        with pd.get_store(saveas, mode = 'w') as store:
+        with pd.HDFStore(saveas, mode = 'w') as store:
             store.append('atmpro', atmpro)
             [store.append('/'.join(['wavebands', label]), outrad)
              for label, outrad in zip(waveband_keys, outrads)]
@@ -1,6 +1,7 @@
 import os
 import sys
 import io
+import re
 import numpy as np
 import itertools
 import collections
@@ -8,6 +9,8 @@ import unicodedata
 import pandas
 import pandas as pd
 import scipy.io as spio
+import xarray as xr
+import rtmtools.lblrtm.atmosphere_profile as atmosphere_profile
 
 dict_JCHARP = {'A': 'mb', 'B': 'atm', 'C': 'torr'}
 dict_JCHART = {'A': 'K', 'B': 'C'}
@@ -253,10 +256,8 @@ def read_atmpro_txtfile(filepath, translate_unit_tag = True):
     properties = ('altitude', 'pressure', 'temperature',
                   'H2O', 'CO2', 'O3', 'N2O', 'CO', 'CH4', 'O2')
 
-    with open(filepath, mode = 'r', encoding = 'utf-8') as forg:
-        units = ['km'] + forg.readline().split()
-        datas = np.array([[float(n) for n in line.split()]
-                          for line in forg.read().split('\n') if line])
+    units, datas = atmosphere_profile.load_atmpro_txtfile(filepath)
+    units = ['km'] + units
 
     if translate_unit_tag:
         units = [unit if property in ('altitude',)
@@ -324,15 +325,8 @@ def atmpro_PROfile_to_pandasDataFrames(readfrom = 'mls75.pro',
     Reads atmosphere profile from a formatted FORTRAN file
     and returns a Pandas DataFrame. 
     '''
-    with open(readfrom, mode = 'r', encoding = 'utf-8') as file:
-        c = file.read()
-        
-    profiles = (
-        np.array([float(n.rstrip(',/'))
-                  for n in v.split()[1:]
-                  if n.endswith(',') or n.endswith('/')])[::-1]
-    for v in c.split('data')[1:]
-    )
+    _, profiles = atmosphere_profile.load_atmpro_PROfile(readfrom)
+    profiles = (profile[::-1] for profile in profiles)
 
     profiles = (pandas.Series(profile,
                               index = range(profile.shape[0]),
@@ -460,6 +454,87 @@ for very small numbers like 1.11111e-123 in the ASCII file, so it becomes 1.1111
 
 
 
+def OUTPUT_RADSUM_to_ndarray(readfrom = '', cooling_rate = False,
+                             signed_fluxes = False):
+    '''
+    Reads OUTPUT_RADSUM in a single pass into one contiguous array.
+    Malformed exponents written by Fortran compiled with -r8, such as
+    1.11111-123 for 1.11111e-123, are repaired before parsing.
+    INPUT:
+    readfrom --- path to OUTPUT_RADSUM
+    cooling_rate --- True to flip the sign of the heating rate
+    signed_fluxes --- True for upward fluxes to be negative, in which
+                      case net flux is recomputed
+    OUTPUT:
+    V1s, V2s --- (nband,) lower and upper wavenumbers of the bands
+    levels --- (nlevel,) level indices
+    data --- (nband, nlevel, 5) float64 array of
+             [pressure, flux_up, flux_down, net_flux, rate]
+    '''
+    with open(readfrom, mode = 'r', encoding = 'utf-8') as file:
+        c = file.read()
+
+    content_wbs = [s.strip() for s in c.split('WAVENUMBER BAND:')
+                   if s and not s.isspace()]
+
+    V1V2s = collections.deque([])
+    datatexts = collections.deque([])
+    for content_wb in content_wbs:
+        l1, _, _, _, datatext = content_wb.split('\n', maxsplit = 4)
+        V1V2s.append(l1.split('CM')[0].split('-'))
+        datatexts.append(datatext)
+    V1s, V2s = np.array(V1V2s, dtype = np.float64).T
+
+    datatext = re.sub(r'(?<=[0-9])([+-])(?=[0-9])', r'E\1',
+                      '\n'.join(datatexts))
+    data = np.fromstring(datatext, dtype = np.float64, sep = ' ')
+
+    Nband, Ncolumn = len(V1s), 6
+    if data.size % (Nband * Ncolumn):
+        raise ValueError('{} does not contain the same number of levels '
+                         'in every wavenumber band'.format(readfrom))
+    data = data.reshape(Nband, -1, Ncolumn)
+    levels, data = data[0, :, 0].astype(int), np.ascontiguousarray(data[:, :, 1:])
+
+    if cooling_rate:
+        data[:, :, -1] *= -1
+
+    if signed_fluxes:
+        data[:, :, 1] *= -1
+        data[:, :, 3] = data[:, :, 1] + data[:, :, 2]
+
+    return V1s, V2s, levels, data
+
+
+
+def load_OUTPUT_RADSUM(readfrom = '', cooling_rate = False,
+                       signed_fluxes = False):
+    '''
+    Reads OUTPUT_RADSUM into an xarray Dataset of dimensions
+    (band, level), with V1 and V2 as coordinates along band.
+    The variables are views into the single array returned by
+    OUTPUT_RADSUM_to_ndarray().
+    '''
+    V1s, V2s, levels, data = OUTPUT_RADSUM_to_ndarray(
+        readfrom = readfrom,
+        cooling_rate = cooling_rate,
+        signed_fluxes = signed_fluxes)
+
+    rate_label = 'cooling_rate' if cooling_rate else 'heating_rate'
+    names = ['pressure', 'flux_up', 'flux_down', 'net_flux', rate_label]
+    return xr.Dataset(
+        {name: (['band', 'level'], data[:, :, k])
+         for k, name in enumerate(names)},
+        coords = {'V1': ('band', V1s), 'V2': ('band', V2s),
+                  'level': levels})
+
+
+
+
+
+
+
+
 def save_figures_by_property(figures, properties, savein, fmt):
     '''
     Save FIGURES corresponding to PROPERTIES in directory SAVEIN
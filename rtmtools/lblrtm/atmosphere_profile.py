@@ -2,17 +2,306 @@
 Most things to do with atmospheric profiles 
 '''
 import os
+import re
 import sys
+import tempfile
 import itertools
 import collections
 import numpy as np
 import scipy as sp
 import scipy.io as spio
 import pandas as pd
+import xarray as xr
 
 
 
 
+# parsed profiles, by real path: (file\'s stat key, parsed arrays)
+_loaded_profiles = {}
+
+
+
+def profile_file_key(readfrom):
+    '''
+    Returns the modification time [ns] and size [bytes] of a profile file,
+    which identify its content for caching
+    '''
+    stat = os.stat(readfrom)
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype = np.int64)
+
+
+
+def profile_cache_path(readfrom):
+    '''
+    Returns the path of the binary cache kept next to a profile file
+    '''
+    dirname, basename = os.path.split(os.path.abspath(readfrom))
+    return os.path.join(dirname, '.' + basename + '.npz')
+
+
+
+def save_cached_profile(readfrom, key, arrays):
+    '''
+    Writes the binary cache file of a profile file, through a temporary
+    file in the same directory that then replaces it, so that readers
+    never see a partly written cache file.  The cache is skipped if
+    the directory is not writable.
+    '''
+    saveas = profile_cache_path(readfrom)
+    try:
+        fd, tmppath = tempfile.mkstemp(dir = os.path.dirname(saveas),
+                                       prefix = os.path.basename(saveas),
+                                       suffix = '.tmp')
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, mode = 'wb') as file:
+            np.savez(file, __key__ = key, **arrays)
+        os.replace(tmppath, saveas)
+    except OSError:
+        os.remove(tmppath)
+
+
+
+def load_cached_profile(readfrom, parse, use_cache = True):
+    '''
+    Returns the arrays parsed from a profile file by PARSE, from the
+    first of: this process\'s memo, the binary cache file next to the
+    profile file, or by parsing the file, in which case the memo and
+    the cache file are updated.  Entries are keyed by the profile
+    file\'s modification time and size.  The arrays returned are
+    shared between callers, so they are read-only.
+    INPUT:
+    readfrom --- path to the profile file
+    parse --- function taking the file\'s text and returning a dictionary
+              of arrays
+    use_cache --- False to parse the file regardless
+    '''
+    realpath = os.path.realpath(readfrom)
+    key = profile_file_key(realpath)
+
+    if use_cache:
+        if realpath in _loaded_profiles:
+            loaded_key, arrays = _loaded_profiles[realpath]
+            if np.array_equal(loaded_key, key):
+                return arrays
+
+        try:
+            with np.load(profile_cache_path(realpath)) as npz:
+                if np.array_equal(npz['__key__'], key):
+                    arrays = {name: npz[name] for name in npz.files
+                              if name != '__key__'}
+                else:
+                    arrays = None
+        except Exception:
+            # missing, or left truncated by an interrupted write
+            arrays = None
+    else:
+        arrays = None
+
+    if arrays is None:
+        with open(realpath, mode = 'r', encoding = 'utf-8') as file:
+            arrays = parse(file.read())
+        if use_cache:
+            save_cached_profile(realpath, key, arrays)
+
+    for array in arrays.values():
+        array.flags.writeable = False
+    if use_cache:
+        _loaded_profiles[realpath] = key, arrays
+    return arrays
+
+
+
+def parse_atmpro_txtfile(content):
+    '''
+    Parses the text of an atmosphere profile text file (e.g. mls75pro.dat),
+    whose first line has the units tags of pressure, temperature
+    and the molecules, followed by one row per level with columns:
+    altitude, pressure, temperature, [concentration of molecules]
+    '''
+    line_units, _, content = content.partition('\n')
+    Ncolumn = len(content.lstrip().partition('\n')[0].split())
+    return {'units': np.array(line_units.split()),
+            'data': np.fromstring(content, sep = ' ').reshape(-1, Ncolumn)}
+
+
+
+def load_atmpro_txtfile(readfrom = 'mls75pro.dat', use_cache = True):
+    '''
+    Loads an atmosphere profile text file (e.g. mls75pro.dat).
+    OUTPUT:
+    units --- list of the units tags for pressure, temperature and
+              the molecules, as in the file\'s first line
+    data --- (nlevel, nvariable) read-only array, with columns from left
+             to right: altitude, pressure, temperature, [concentration of
+             molecules], and rows in the same order as in the file
+    '''
+    arrays = load_cached_profile(readfrom, parse_atmpro_txtfile,
+                                 use_cache = use_cache)
+    return arrays['units'].tolist(), arrays['data']
+
+
+
+def parse_atmpro_PROfile(content):
+    '''
+    Parses the text of an atmosphere profile in formatted FORTRAN (e.g.
+    mls75.pro), in which each profile is in a DATA statement, e.g.
+    data (plevel(i),i=1,nlayer+1)/ 0.0001, 0.0002, ...,
+   &  1013.0/
+    '''
+    statements = content.split('data')[1:]
+    names = [re.match(r'\s*\(\s*(\w+)', statement) for statement in statements]
+    arrays = {'names': np.array([name.group(1) if name else ''
+                                 for name in names])}
+    for k, statement in enumerate(statements):
+        header_and_values = statement.split(None, 1)
+        values = header_and_values[1] if len(header_and_values) > 1 else ''
+        arrays['values_{}'.format(k)] = np.array(
+            re.findall(r'(\S+?)[,/](?=\s|$)', values), dtype = np.float64)
+    return arrays
+
+
+
+def load_atmpro_PROfile(readfrom = 'mls75.pro', use_cache = True):
+    '''
+    Loads an atmosphere profile in formatted FORTRAN (e.g. mls75.pro).
+    OUTPUT:
+    names --- list of the names of the profiles, e.g. [\'plevel\', \'tlayer\', ...]
+    profiles --- list of read-only arrays, one for each of NAMES, with
+                 values in the same order as in the file
+    '''
+    arrays = load_cached_profile(readfrom, parse_atmpro_PROfile,
+                                 use_cache = use_cache)
+    names = arrays['names'].tolist()
+    return names, [arrays['values_{}'.format(k)] for k in range(len(names))]
+
+
+
+class AtmosphereProfile(object):
+    '''
+    An atmosphere profile, held as one contiguous (nlevel, nvariable)
+    array, with rows from the surface up, as in atmosphere profile text
+    files, and columns in the order of NAMES.  A variable is accessed
+    as a view into the array, without copying, e.g. profile[\'pressure\'].
+    ATTRIBUTES:
+    data --- (nlevel, nvariable) array
+    names --- names of the variables, for the columns of DATA
+    units --- LBLRTM\'s units tags (see Table I) for all variables but
+              the first (altitude, always in km)
+    '''
+    __slots__ = ('data', 'names', 'units')
+
+    properties = ('altitude', 'pressure', 'temperature',
+                  'H2O', 'CO2', 'O3', 'N2O', 'CO', 'CH4', 'O2')
+
+    def __init__(self, data, units = None, names = properties):
+        self.data = np.ascontiguousarray(data, dtype = np.float64)
+        self.names = tuple(names)
+        self.units = (list(units) if units is not None
+                      else (len(self.names) - 1) * ['A'])
+        if self.data.ndim != 2 or self.data.shape[1] != len(self.names):
+            raise ValueError('Profile data of shape {} does not match '
+                             'variables {}'.format(self.data.shape, self.names))
+
+    def __getitem__(self, name):
+        return self.data[:, self.names.index(name)]
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __repr__(self):
+        return 'AtmosphereProfile({} levels, {})'.format(len(self), ', '.join(self.names))
+
+    @property
+    def molecules(self):
+        return self.names[3:]
+
+    @classmethod
+    def from_txtfile(cls, readfrom = 'mls75pro.dat'):
+        '''
+        Loads an atmosphere profile text file (see load_atmpro_txtfile())
+        '''
+        units, data = load_atmpro_txtfile(readfrom)
+        return cls(data, units = units)
+
+    @classmethod
+    def from_dict(cls, atmpro):
+        '''
+        Converts from the dictionary returned by aerutils.read_atmpro_txtfile(),
+        with units either as tags or translated.
+        '''
+        # imported here, as aerutils imports this module
+        import rtmtools.lblrtm.aerutils as aerutils
+        names = tuple(name for name in cls.properties if name in atmpro)
+        units = [atmpro[name]['units'] for name in names[1:]]
+        units = ([aerutils.atmpro_units_tags_translate(property = name,
+                                                       units = unit,
+                                                       unitsin = 'tags')
+                  for name, unit in zip(names[1: 3], units[: 2])]
+                 + list(aerutils.atmpro_units_tags_translate(property = 'molecule',
+                                                             units = units[2:],
+                                                             unitsin = 'tags')))
+        return cls(np.stack([atmpro[name]['data'] for name in names], axis = 1),
+                   units = units, names = names)
+
+    def to_dict(self, translate_unit_tag = True):
+        '''
+        Converts to the dictionary returned by aerutils.read_atmpro_txtfile().
+        The data are views into this profile\'s array.
+        '''
+        import rtmtools.lblrtm.aerutils as aerutils
+        units = ['km'] + self.units
+        if translate_unit_tag:
+            units = [unit if name in ('altitude',)
+                     else aerutils.units_tags_dict[name][unit]
+                     if name in ('pressure', 'temperature')
+                     else aerutils.units_tags_dict['molecule'][unit]
+                     for name, unit in zip(self.names, units)]
+        return {name: {'name': name, 'units': unit, 'data': self[name]}
+                for name, unit in zip(self.names, units)}
+
+    @classmethod
+    def from_DataFrame(cls, atmpro, units = None):
+        '''
+        Converts from a DataFrame like that returned by
+        aerutils.atmpro_txtfile_to_pandasDataFrame(), with the surface at
+        the bottom (largest index first)
+        '''
+        atmpro = atmpro.sort_index(ascending = True)
+        return cls(atmpro.values, units = units, names = atmpro.columns)
+
+    def to_DataFrame(self):
+        '''
+        Converts to a DataFrame like that returned by
+        aerutils.atmpro_txtfile_to_pandasDataFrame()
+        '''
+        return pd.DataFrame(self.data, columns = self.names).sort_index(ascending = False)
+
+
+
+def as_AtmosphereProfile(atmpro):
+    '''
+    Returns ATMPRO as an AtmosphereProfile.
+    INPUT:
+    atmpro --- AtmosphereProfile, path to an atmosphere profile text file,
+               dictionary from aerutils.read_atmpro_txtfile(), or DataFrame
+               from aerutils.atmpro_txtfile_to_pandasDataFrame()
+    '''
+    if isinstance(atmpro, AtmosphereProfile):
+        return atmpro
+    elif isinstance(atmpro, (str, bytes, os.PathLike)):
+        return AtmosphereProfile.from_txtfile(atmpro)
+    elif isinstance(atmpro, dict):
+        return AtmosphereProfile.from_dict(atmpro)
+    elif isinstance(atmpro, pd.DataFrame):
+        return AtmosphereProfile.from_DataFrame(atmpro)
+    else:
+        raise TypeError('Cannot make an atmosphere profile '
+                        'from {}'.format(type(atmpro)))
+
+
+
 
 def ERAIN_to_DataFrame(readfrom = 'erain.nc'):
     '''
@@ -83,6 +372,97 @@ def ERAIN_to_DataFrame(readfrom = 'erain.nc'):
 
 
 
+
+def ERAIN_to_Dataset(readfrom = 'erain.nc'):
+    '''
+    Gets the atmosphere profiles in all the (time, lat, lon) columns of
+    an ERAIN netcdf file, in one vectorised pass over the memory-mapped
+    file.  As in ERAIN_to_DataFrame(), each column is truncated at its
+    surface pressure: only the layers whose pressure is less than the
+    surface pressure are kept, and the surface pressure is the lowest
+    level.
+    OUTPUT:
+    ds --- xarray Dataset with dimensions column, level and layer, in
+           which level 0 and layer 0 are at the surface.  Levels and
+           layers below the surface are NaN.  Coordinates along column
+           are the time, lat and lon of each column.  Variables are
+           plevel [hPa], tlayer, wlayer, clayer, olayer, qlayer, rlayer
+           (as in ERAIN_to_DataFrame()), nlayer (number of layers above
+           the surface) and tsfc (skin temperature).
+    '''
+    with spio.netcdf_file(readfrom, mode = 'r', mmap = True) as file:
+        # (time, level, lat, lon) variables as (column, level),
+        # and (time, lat, lon) variables as (column,)
+        dims = file.variables['t'].dimensions
+        column_dims = dims[:1] + dims[2:]
+
+        def columns(name):
+            variable = file.variables[name]
+            data = variable.data.astype(np.float64)
+            data = (data * getattr(variable, 'scale_factor', 1.)
+                    + getattr(variable, 'add_offset', 0.))
+            if data.ndim == 4:
+                return np.moveaxis(data, 1, -1).reshape(-1, data.shape[1])
+            else:
+                return data.reshape(-1)
+
+        plev = columns('plev')
+        play = columns('play')
+        t, q, o3 = columns('t'), columns('q'), columns('o3')
+        sp_local = 1e-2 * columns('sp')   # convert Pa to hPa
+        tsfc = columns('skt')
+
+        shape = file.variables['sp'].shape
+        coords = {name: ('column',
+                         file.variables[name].data[index].ravel().astype(
+                             file.variables[name].data.dtype.newbyteorder('='))
+                         if name in file.variables else index.ravel())
+                  for name, index in zip(column_dims,
+                                         np.indices(shape, sparse = False))}
+
+    Ncolumn, Nlay = t.shape
+
+    # layers above the surface, counted from the top
+    nlayer = np.sum(play < sp_local[:, np.newaxis], axis = 1)
+
+    # reverse each column\'s layers above the surface, so that
+    # layer 0 is the lowest one
+    layers = np.arange(Nlay)
+    above_surface = layers < nlayer[:, np.newaxis]
+    reverse = np.where(above_surface, nlayer[:, np.newaxis] - 1 - layers, 0)
+
+    def surface_up(data):
+        data = np.take_along_axis(data, reverse, axis = 1)
+        return np.where(above_surface, data, np.nan).astype('f4')
+
+    tlayer, wlayer, olayer = surface_up(t), surface_up(q), surface_up(o3)
+    clayer = np.where(above_surface, 370e-6, np.nan).astype('f4')
+    qlayer = np.where(above_surface, .32e-6, np.nan).astype('f4')
+    rlayer = np.where(above_surface, 1.75e-6, np.nan).astype('f4')
+
+    # convert units of N2O and CH4 from [l/l] to [g/g]
+    qlayer *= 44 / 28.97
+    rlayer *= 16 / 28.97
+
+    # level 0 is the surface, level k is the top of layer k - 1
+    levels = np.arange(Nlay + 1)
+    plevel = np.concatenate(
+        (sp_local[:, np.newaxis],
+         np.take_along_axis(plev, reverse, axis = 1)),
+        axis = 1)
+    plevel = np.where(levels <= nlayer[:, np.newaxis], plevel, np.nan).astype('f4')
+
+    layer_variables = {'tlayer': tlayer, 'wlayer': wlayer, 'clayer': clayer,
+                       'olayer': olayer, 'qlayer': qlayer, 'rlayer': rlayer}
+    data_vars = {'plevel': (('column', 'level'), plevel)}
+    data_vars.update((name, (('column', 'layer'), data))
+                     for name, data in layer_variables.items())
+    data_vars['nlayer'] = ('column', nlayer)
+    data_vars['tsfc'] = ('column', tsfc)
+    return xr.Dataset(data_vars, coords = coords)
+
+
+
         
 
         
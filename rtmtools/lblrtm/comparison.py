@@ -0,0 +1,156 @@
+'''
+Comparing the results of many runs, e.g. of different model
+configurations, against each other.
+
+The runs are stacked into one array of shape (run, level, field), and
+the differences between all pairs of runs are computed by broadcasting
+over batches of pairs, so that only one batch of differences is in
+memory at a time.  The differences themselves are yielded one pair at
+a time by iter_pairwise_differences(), and summary statistics of all
+of them are given by pairwise_statistics().
+'''
+import collections
+import numpy as np
+import pandas as pd
+
+
+
+Runs = collections.namedtuple('Runs', ['names', 'index', 'columns', 'data'])
+Runs.__doc__ = '''
+Runs stacked for comparison (see stack_runs()).
+names --- names of the runs
+index --- levels, the index shared by the runs\' DataFrames
+columns --- fields, the columns shared by the runs\' DataFrames
+data --- array of shape (run, level, field)
+'''
+
+
+
+def stack_runs(dfs, names = None):
+    '''
+    Stacks the DataFrames of runs into a Runs.
+    INPUT:
+    dfs --- list of pandas.DataFrame, one for each run, indexed by level
+            and with a column for each field.  If they do not all have
+            the same index and columns, they are aligned on the union of
+            them, with NaN where a run has no value.
+    names --- names of the runs (default = 0, 1, 2, ...)
+    '''
+    names = list(range(len(dfs))) if names is None else list(names)
+    if len(names) != len(dfs):
+        raise ValueError('There are {} names for {} runs'.format(len(names), len(dfs)))
+
+    index, columns = dfs[0].index, dfs[0].columns
+    if not all(df.index.equals(index) and df.columns.equals(columns)
+               for df in dfs[1:]):
+        for df in dfs[1:]:
+            index, columns = index.union(df.index), columns.union(df.columns)
+        dfs = [df.reindex(index = index, columns = columns) for df in dfs]
+
+    data = np.empty((len(dfs), len(index), len(columns)), dtype = np.float64)
+    for k, df in enumerate(dfs):
+        data[k] = df.values
+    return Runs(names = names, index = index, columns = columns, data = data)
+
+
+
+def pair_indices(Nrun):
+    '''
+    Returns the indices (i, j) of all pairs of NRUN runs, with i < j,
+    in the order of itertools.combinations()
+    '''
+    return np.triu_indices(Nrun, k = 1)
+
+
+
+def iter_pair_batches(runs, batch_size = 64):
+    '''
+    Yields the differences between all pairs of RUNS (a Runs) in
+    batches of at most BATCH_SIZE pairs, each as (i, j, differences),
+    with differences = runs.data[i] - runs.data[j] of shape
+    (pair, level, field)
+    '''
+    i, j = pair_indices(len(runs.names))
+    for start in range(0, len(i), batch_size):
+        i_batch, j_batch = i[start: start + batch_size], j[start: start + batch_size]
+        yield i_batch, j_batch, runs.data[i_batch] - runs.data[j_batch]
+
+
+
+def iter_pairwise_differences(runs, batch_size = 64):
+    '''
+    Yields (name1, name2, difference) for all pairs of RUNS (a Runs),
+    with difference = run name1 - run name2 as a pandas.DataFrame of
+    the runs\' index and columns.  Differences are computed in batches
+    of BATCH_SIZE pairs as they are needed.
+    '''
+    for i_batch, j_batch, differences in iter_pair_batches(runs, batch_size):
+        for i, j, difference in zip(i_batch, j_batch, differences):
+            yield (runs.names[i], runs.names[j],
+                   pd.DataFrame(difference, index = runs.index,
+                                columns = runs.columns))
+
+
+
+def column_integral(values, pressure = None):
+    '''
+    Integrates VALUES, of shape (..., level, field), over level by the
+    trapezoidal rule, with respect to the absolute pressure
+    differences between the levels if PRESSURE (level,) is given,
+    otherwise with unit spacing
+    '''
+    spacing = (np.ones(values.shape[-2] - 1) if pressure is None
+               else np.abs(np.diff(pressure)))
+    midpoints = .5 * (values[..., 1:, :] + values[..., : -1, :])
+    return np.einsum('...lf,l->...f', midpoints, spacing)
+
+
+
+def pairwise_statistics(runs, pressure = 'pressure', batch_size = 64):
+    '''
+    Returns summary statistics of the differences between all pairs
+    of RUNS (a Runs).
+    INPUT:
+    pressure --- name of the field with the pressure at each level,
+                 used, from the first run, as the coordinate for
+                 the column integrals, and left out of the statistics.
+                 If None or not a field, the integrals are over the
+                 level positions.
+    batch_size --- number of pairs whose differences are held
+                   in memory at a time
+    OUTPUT:
+    stats --- pandas.DataFrame indexed by (run1, run2), with columns
+              (statistic, field) for statistics
+              \'rms\' --- root mean square of the difference over levels
+              \'max_abs\' --- largest absolute difference
+              \'integrated\' --- column integral of the difference
+    '''
+    fields = np.ones(len(runs.columns), dtype = bool)
+    pressure_values = None
+    if pressure is not None and pressure in runs.columns:
+        k = runs.columns.get_loc(pressure)
+        fields[k] = False
+        pressure_values = runs.data[0, :, k]
+    data = runs.data[:, :, fields]
+
+    # the column integral is linear, so the integral of each
+    # difference is the difference of the integrals
+    integrals = column_integral(data, pressure = pressure_values)
+
+    i, j = pair_indices(len(runs.names))
+    rms = np.empty((len(i), data.shape[-1]))
+    max_abs = np.empty((len(i), data.shape[-1]))
+    for start in range(0, len(i), batch_size):
+        stop = start + batch_size
+        differences = data[i[start: stop]] - data[j[start: stop]]
+        rms[start: stop] = np.sqrt(np.mean(differences ** 2, axis = 1))
+        max_abs[start: stop] = np.max(np.abs(differences), axis = 1)
+
+    names = np.array(runs.names, dtype = object)
+    return pd.DataFrame(
+        np.concatenate([rms, max_abs, integrals[i] - integrals[j]], axis = 1),
+        index = pd.MultiIndex.from_arrays([names[i], names[j]],
+                                          names = ['run1', 'run2']),
+        columns = pd.MultiIndex.from_product(
+            [['rms', 'max_abs', 'integrated'], runs.columns[fields]],
+            names = ['statistic', 'field']))
@@ -1,9 +1,11 @@
+import os
 import itertools
 import collections
 import timeit
 import numpy as np
-import io
 import rtmtools.lblrtm.aerutils as aerutils
+import rtmtools.lblrtm.atmosphere_profile as atmosphere_profile
+import rtmtools.fortran_records as fortran_records
 
 
 
@@ -481,6 +483,25 @@ def record_3_4(IMMAX = '', HMOD = ''):
                    for length, fmtspec, value in notes)
 
 
+def record_3_5_notes(ZM = '', PM = '', TM = '', JCHARP = '',
+                     JCHART = '', JLONG = '', JCHAR = ''):
+    '''
+    Returns the notes of Record 3.5 (see record_3_5()).  ZM, PM and TM
+    can be arrays, to declare one record for each level.
+    '''
+    return ((10, '{0:10.3f}', ZM),
+            (10, '{0:10.3f}', PM),
+            (10, '{0:10.3f}', TM),
+            (5, '', ''),
+            (1, '{0:1s}', JCHARP),
+            (1, '{0:1s}', JCHART),
+            (1, '', ''),
+            (1, '{0:1s}', JLONG),
+            (1, '', ''),
+            (39, '{0:<39s}', JCHAR)
+            )
+
+
 def record_3_5(ZM = '', PM = '', TM = '', JCHARP = '',
                JCHART = '', JLONG = '', JCHAR = ''):
     '''
@@ -493,19 +514,18 @@ def record_3_5(ZM = '', PM = '', TM = '', JCHARP = '',
                  (= L  read VMOL(M) in 8E15.8 format)
     JCHAR(K) --- flag for units and input options for the K\'th molecule (see Table I)
     '''
-    notes = ((10, '{0:10.3f}', ZM),
-             (10, '{0:10.3f}', PM),
-             (10, '{0:10.3f}', TM),
-             (5, '', ''),
-             (1, '{0:1s}', JCHARP),
-             (1, '{0:1s}', JCHART),
-             (1, '', ''),
-             (1, '{0:1s}', JLONG),
-             (1, '', ''),
-             (39, '{0:<39s}', JCHAR)
-             )
-    return ''.join(fmtspec.format(value) if value != '' else length*' '
-                   for length, fmtspec, value in notes)
+    return fortran_records.format_records(
+        record_3_5_notes(ZM = ZM, PM = PM, TM = TM, JCHARP = JCHARP,
+                         JCHART = JCHART, JLONG = JLONG, JCHAR = JCHAR))
+
+
+def record_3_6_notes(JLONG, *vmols):
+    '''
+    Returns the notes of Record 3.6 (see record_3_6()).  VMOLS can be
+    arrays, to declare one record for each level.
+    '''
+    return tuple((15, '{0:15.8e}', vmol) if JLONG == 'L' else (10, '{0:10.4e}', vmol)
+                 for vmol in vmols)
 
 
 def record_3_6(JLONG, *vmols):
@@ -514,9 +534,7 @@ def record_3_6(JLONG, *vmols):
     VMOL(M) -- density of the M\'th molecule in units set by JCHAR(K)
                **NOTE** If JLONG=L, then VMOL(M) is in 8E15.8 format
     '''
-    return ''.join('{0:15.8e}'.format(vmol)
-                   if JLONG is 'L' else '{0:10.4e}'.format(vmol)
-for vmol in vmols)
+    return fortran_records.format_records(record_3_6_notes(JLONG, *vmols))
 
 
 def record_6(HWHM = '', V1 = '', V2 = '', JEMIT = '',
@@ -639,7 +657,8 @@ def write_fluxcalc_TAPE5(atmpro = 'atmopro.dat',
     Writes a TAPE5 for \'flux calcuations\' with LBLRTM, like the one in
     aerlbl_v12.2_package/radsum/run_examples.
     INPUT:
-    atmpro     --- path to file containing atmosphere profile
+    atmpro     --- path to file containing atmosphere profile, or
+                   atmosphere profile (see atmosphere_profile.as_AtmosphereProfile())
     TAPE5name  --- name of output TAPE5 (default = \'TAPE5\')
     V1         --- beginning wavenumber value for the calculation
     V2         --- ending wavenumber value for the calculation
@@ -657,23 +676,65 @@ def write_fluxcalc_TAPE5(atmpro = 'atmopro.dat',
                    = 6  Individual continuum scale factors input (Requires Record 1.2a)
     CXID       --- 80 characters of user identification
     '''
-    with open(atmpro, mode = 'r', encoding = 'utf-8') as fatmpro:
-        line_units = fatmpro.readline()
-        content = fatmpro.read()
+    atmpro = atmosphere_profile.as_AtmosphereProfile(atmpro)
+    units = ''.join(atmpro.units)
+    JCHARP, JCHART, JCHAR = units[0], units[1], units[2:]
+
+    with open(TAPE5name, mode = 'w', encoding = 'utf-8') as ftape:
+        ftape.write(
+            fluxcalc_TAPE5_text(atmpro.data,
+                                JCHARP = JCHARP, JCHART = JCHART, JCHAR = JCHAR,
+                                V1 = V1, V2 = V2, JLONG = JLONG, TBOUND = TBOUND,
+                                CXID = CXID, ICNTNM = ICNTNM))
 
-    atmpro_units = io.StringIO(line_units.rstrip().replace(' ', ''))
-    JCHARP, JCHART, JCHAR = atmpro_units.read(1), atmpro_units.read(1), atmpro_units.read()
 
-    atmpro_lvls = (map(float, line.split()) for line in content.split('\n') if line)
-    atmpro_vars = itertools.zip_longest(*atmpro_lvls)
-    atmpro_altitudes = next(atmpro_vars)
-    atmpro_pressures = next(atmpro_vars)
-    atmpro_levels = ((next(p), next(p), next(p), tuple(p)) for p in
-                     (iter(level)
-                      for level in itertools.zip_longest(atmpro_altitudes,
-                                                         atmpro_pressures, *atmpro_vars)))
 
-    IMMAX = IBMAX = len(atmpro_altitudes)
+def record_3_3B_block(altitudes):
+    '''
+    Same as record_3_3B(*altitudes), but formatted in one go
+    '''
+    Nrow, Naltitudes = 8, len(altitudes)
+    notes = tuple((10, '{0:10.3f}', altitude) for altitude in altitudes)
+    return '\n'.join(fortran_records.compile_notes(notes[k: k + Nrow])[0]
+                     for k in range(0, Naltitudes, Nrow)).format(*altitudes)
+
+
+def record_3_5_to_3_6_block(atmpro, JCHARP = '', JCHART = '',
+                            JLONG = '', JCHAR = ''):
+    '''
+    Returns Records 3.5 and 3.6 for all levels of an atmosphere profile,
+    the same as joining record_3_5() and record_3_6() level by level,
+    but formatted in one go.
+    INPUT:
+    atmpro --- (nlevel, nvariable) array, with columns from left to right:
+               altitude, pressure, temperature, [concentration of molecules]
+    '''
+    return fortran_records.format_records(
+        record_3_5_notes(ZM = atmpro[:, 0], PM = atmpro[:, 1], TM = atmpro[:, 2],
+                         JCHARP = JCHARP, JCHART = JCHART,
+                         JLONG = JLONG, JCHAR = JCHAR),
+        record_3_6_notes(JLONG, *atmpro[:, 3:].T))
+
+
+
+def fluxcalc_TAPE5_text(atmpro,
+                        JCHARP = 'A', JCHART = 'A', JCHAR = 'AAAAAAA',
+                        V1 = 8., V2 = 2002.,
+                        JLONG = '',
+                        TBOUND = 288.2,
+                        CXID = 'GARANDProfile(CanadianStudy):6 ',
+                        ICNTNM = 1):
+    '''
+    Returns the text of a TAPE5 for \'flux calculations\' with LBLRTM
+    (see write_fluxcalc_TAPE5()) for an atmosphere profile given as an array.
+    INPUT:
+    atmpro --- (nlevel, nvariable) array, with columns from left to right:
+               altitude, pressure, temperature, [concentration of molecules]
+    JCHARP, JCHART, JCHAR --- units tags of pressure, temperature and molecules
+    '''
+    atmpro_pressures = atmpro[:, 1].tolist()
+
+    IMMAX = IBMAX = atmpro.shape[0]
     LAYTOT = IMMAX - 1
     
     lblrtm_lines = [record_1_1(CXID),
@@ -689,14 +750,12 @@ def write_fluxcalc_TAPE5(atmpro = 'atmopro.dat',
                                HSPACE = 100., VBAR = .5 * (V1 + V2), REF_LAT = 30.),
                     record_3_2(H1 = atmpro_pressures[-1], H2 = atmpro_pressures[0],
                                ANGLE = 180.0000),
-                    record_3_3B(*atmpro_pressures),
+                    record_3_3B_block(atmpro_pressures),
                     record_3_4(IMMAX = - IMMAX)]
     
-    user_profile_lines = itertools.chain.from_iterable(
-        (record_3_5(ZM = altitude, PM = pressure, TM = temperature,
-                    JCHARP = JCHARP, JCHART = JCHART, JLONG = JLONG, JCHAR = JCHAR),
-         record_3_6(JLONG, *vmols))
-        for altitude, pressure, temperature, vmols in atmpro_levels)
+    user_profile_lines = [record_3_5_to_3_6_block(atmpro,
+                                                  JCHARP = JCHARP, JCHART = JCHART,
+                                                  JLONG = JLONG, JCHAR = JCHAR)]
 
     output_lines = itertools.chain.from_iterable(
         ('$',
@@ -720,9 +779,88 @@ def write_fluxcalc_TAPE5(atmpro = 'atmopro.dat',
     lines_to_write.extend(user_profile_lines)
     lines_to_write.extend(output_lines)
     lines_to_write.append('%%%%%')
-        
-    with open(TAPE5name, mode = 'w', encoding = 'utf-8') as ftape:
-        ftape.writelines('\n'.join(lines_to_write))
+    return '\n'.join(lines_to_write)
+
+
+
+def profiles_to_ndarray(atmpros):
+    '''
+    Returns atmosphere profiles as a (column, level, variable) array.
+    INPUT:
+    atmpros --- (level, variable) or (column, level, variable) array, or
+                xarray Dataset with variables altitude, pressure, temperature,
+                H2O, CO2, O3, N2O, CO, CH4 and O2, each of dimensions
+                (column, level)
+    '''
+    if hasattr(atmpros, 'data_vars'):
+        names = ('altitude', 'pressure', 'temperature',
+                 'H2O', 'CO2', 'O3', 'N2O', 'CO', 'CH4', 'O2')
+        atmpros = np.stack([atmpros[name].transpose('column', 'level').values
+                            for name in names], axis = -1)
+    atmpros = np.asarray(atmpros, dtype = np.float64)
+    return atmpros[np.newaxis] if atmpros.ndim == 2 else atmpros
+
+
+
+def fluxcalc_TAPE5s(atmpros, units = 'AAAAAAAAA',
+                    V1 = 8., V2 = 2002.,
+                    JLONG = '',
+                    TBOUND = 288.2,
+                    CXID = 'GARANDProfile(CanadianStudy):6 ',
+                    ICNTNM = 1):
+    '''
+    Yields the TAPE5 text for \'flux calculations\' with LBLRTM for each
+    column of a batch of atmosphere profiles.  Levels whose pressure
+    is NaN are left out, so columns can have different numbers of levels.
+    INPUT:
+    atmpros --- atmosphere profiles (see profiles_to_ndarray())
+    units --- units tags for pressure, temperature and the molecules,
+              as in the first line of an atmosphere profile text file
+    TBOUND --- temperature of boundary [K], one value for all columns
+               or one value per column
+    (see write_fluxcalc_TAPE5() for the other arguments)
+    '''
+    atmpros = profiles_to_ndarray(atmpros)
+    units = ''.join(units.split())
+    JCHARP, JCHART, JCHAR = units[0], units[1], units[2:]
+    TBOUNDs = np.broadcast_to(TBOUND, atmpros.shape[:1]).tolist()
+
+    for atmpro, tbound in zip(atmpros, TBOUNDs):
+        yield fluxcalc_TAPE5_text(atmpro[~ np.isnan(atmpro[:, 1])],
+                                  JCHARP = JCHARP, JCHART = JCHART, JCHAR = JCHAR,
+                                  V1 = V1, V2 = V2, JLONG = JLONG, TBOUND = tbound,
+                                  CXID = CXID, ICNTNM = ICNTNM)
+
+
+
+def write_fluxcalc_TAPE5s(atmpros, savein = 'TAPE5s', units = 'AAAAAAAAA',
+                          V1 = 8., V2 = 2002.,
+                          JLONG = '',
+                          TBOUND = 288.2,
+                          CXID = 'GARANDProfile(CanadianStudy):6 ',
+                          ICNTNM = 1,
+                          TAPE5name = 'TAPE5'):
+    '''
+    Writes a TAPE5 for \'flux calculations\' for each column of a batch of
+    atmosphere profiles, each in its own directory under SAVEIN, named
+    after the column\'s index.  Returns the paths of the TAPE5s written.
+    (see fluxcalc_TAPE5s() for the arguments)
+    '''
+    atmpros = profiles_to_ndarray(atmpros)
+    width = len(str(atmpros.shape[0] - 1))
+
+    paths = collections.deque([])
+    for k, tape5 in enumerate(fluxcalc_TAPE5s(atmpros, units = units,
+                                              V1 = V1, V2 = V2, JLONG = JLONG,
+                                              TBOUND = TBOUND, CXID = CXID,
+                                              ICNTNM = ICNTNM)):
+        rundir = os.path.join(savein, '{:0{}d}'.format(k, width))
+        os.makedirs(rundir, exist_ok = True)
+        path = os.path.join(rundir, TAPE5name)
+        with open(path, mode = 'w', encoding = 'utf-8') as ftape:
+            ftape.write(tape5)
+        paths.append(path)
+    return list(paths)
 
 
 
@@ -736,10 +874,13 @@ def write_solar_downwelling_TAPE5(CXID = 'solar downwelling',
     '''
     Returns a long string of TAPE5 in the solar downwelling
     example that came with LBLRTM
+    atmpro --- atmosphere profile for MODEL = 0
+               (see atmosphere_profile.as_AtmosphereProfile())
     '''
     if MODEL == 0:
-        IBMAX = IMMAX = - len(atmpro.index)
-        bound_zp = atmpro['pressure'][:: -1]
+        atmpro = atmosphere_profile.as_AtmosphereProfile(atmpro)
+        IBMAX = IMMAX = - len(atmpro)
+        bound_zp = atmpro['pressure']
     elif MODEL == 2:
         print('Using internal mid-latitude summer model')
         IBMAX = IMMAX = 19
@@ -778,18 +919,17 @@ def write_solar_downwelling_TAPE5(CXID = 'solar downwelling',
         
     if MODEL == 0:
             lines.append(record_3_4(IMMAX = IMMAX))
-            for i in atmpro.index[:: -1]:
-                lines.append(
-                    record_3_5(ZM = atmpro.loc[i, 'altitude'],
-                               PM = atmpro.loc[i, 'pressure'],
-                               TM = atmpro.loc[i, 'temperature'],
-                               JCHARP = 'A',
-                               JCHART = 'A', JLONG = 'L', JCHAR = 'AAAAAAA'))
-                lines.append(
-                    record_3_6('L',
-                               *[atmpro.loc[i, molecule] \
-                                 for molecule in ['H2O', 'CO2', 'O3',\
-                                                  'N2O', 'CO', 'CH4', 'O2']]))
+            lines.append(
+                fortran_records.format_records(
+                    record_3_5_notes(ZM = atmpro['altitude'],
+                                     PM = atmpro['pressure'],
+                                     TM = atmpro['temperature'],
+                                     JCHARP = 'A',
+                                     JCHART = 'A', JLONG = 'L', JCHAR = 'AAAAAAA'),
+                    record_3_6_notes('L',
+                                     *[atmpro[molecule] \
+                                       for molecule in ['H2O', 'CO2', 'O3',\
+                                                        'N2O', 'CO', 'CH4', 'O2']])))
             
     lines.append('-1.')
         
@@ -849,25 +989,25 @@ def IN_RADSUM_record_1(V1 = 10.0, V2 = 2000.,
 
 def write_IN_RADSUM(atmpro = 'atmopro.dat',
                     V1 = 10.0, V2 = 2000.,
-                    OUTINRAT = 3980, NANG = 3, IQUAD = 0):
+                    OUTINRAT = 3980, NANG = 3, IQUAD = 0,
+                    saveas = 'IN_RADSUM'):
     '''
     TBND in IN_RADSUM is set to the temperatuer of the lowest level
     in the user-provided atmospheric profile
     NLEV is the number of levels in the user-provided atmospheric profile
+    atmpro --- path to file containing atmosphere profile, or
+               atmosphere profile (see atmosphere_profile.as_AtmosphereProfile())
+    saveas --- path of the IN_RADSUM to write (default = \'IN_RADSUM\')
     '''
-    with open(atmpro, mode = 'r', encoding = 'utf-8') as file:
-        file.readline()
-        content = file.read()
-
-    atmpro_data = np.array([line.split() for line in content.split('\n') if line], dtype = np.float64)
-    NLEV, TBND = atmpro_data.shape[0], atmpro_data[0, 2]
+    atmpro = atmosphere_profile.as_AtmosphereProfile(atmpro)
+    NLEV, TBND = len(atmpro), atmpro['temperature'][0]
 
     lines_to_write = [
         IN_RADSUM_record_1(V1 = V1, V2 = V2,
                            OUTINRAT = OUTINRAT, NANG = NANG, NLEV = NLEV,
                            TBND = TBND, IQUAD = IQUAD)
         ]
-    with open('IN_RADSUM', mode = 'w', encoding = 'utf-8') as file:
+    with open(saveas, mode = 'w', encoding = 'utf-8') as file:
         file.write('\n'.join(lines_to_write))
         
 
@@ -939,9 +1079,11 @@ def LNFL_TAPE5_record_3(MIND1 = 39 * '0',
 def write_LNFL_TAPE5(XID = '',
                      VMIN = 0., VMAX = 3000.,
                      MIND1 = 39 * '0',
-                     HOLIND1 = 'LNOUT'):
+                     HOLIND1 = 'LNOUT',
+                     saveas = 'TAPE5'):
     '''
     Writes out TAPE5 for LNFL
+    saveas --- path of the TAPE5 to write (default = \'TAPE5\')
     '''
     lines_to_write = [
         LNFL_TAPE5_record_1(XID = XID),
@@ -950,7 +1092,7 @@ def write_LNFL_TAPE5(XID = '',
                             HOLIND1 = HOLIND1)
         ]
     lines_to_write.append('%%%%%')
-    with open('TAPE5', mode = 'w', encoding = 'utf-8') as file:
+    with open(saveas, mode = 'w', encoding = 'utf-8') as file:
         file.write('\n'.join(lines_to_write))
 
 
@@ -1,6 +1,20 @@
 
 import os
+import re
+import argparse
+import tempfile
+import functools
 import collections
+import concurrent.futures
+import numpy as np
+
+
+
+def dir_linesbymolecule():
+    '''
+    Returns the directory of AER\'s line files by molecule
+    '''
+    return '/nuwa_cluster/home/jackyu/line_by_line/aerlbl_v12.2_package/aer_v_3.2/line_files_By_Molecule'
 
 
 
@@ -8,23 +22,381 @@ def line_count(path_molecule):
     '''
     Counts the number of lines in the line files used by LBLRTM
     '''
-    dir_linesbymolecule = '/nuwa_cluster/home/jackyu/line_by_line/aerlbl_v12.2_package/aer_v_3.2/line_files_By_Molecule'
-    
-    linecount = collections.Counter()
-    
-    if path_molecule in linecount:
-        return linecount[path_molecule]
-    else:
-        with open(os.path.join(dir_linesbymolecule, \
-                               path_molecule, path_molecule), \
-                  mode = 'r', encoding = 'utf-8') as file:
-            lines = file.readlines()
-            for line in lines:
-                if line.startswith('{:>2d}'\
-                                   .format(int(path_molecule.split('_')[0]))):
-                    linecount[path_molecule] += 1
-        return linecount[path_molecule]
-
-    
-    
+    index = load_line_index(os.path.join(dir_linesbymolecule(),
+                                         path_molecule, path_molecule))
+    return int(np.count_nonzero(index['molecule']
+                                == int(path_molecule.split('_')[0])))
+
+
+
+# line catalogue, one row per line, sorted by wavenumber
+LINE_INDEX_DTYPE = np.dtype([('molecule', 'u1'), ('isotope', 'S1'),
+                             ('wavenumber', 'f8'), ('strength', 'f8'),
+                             ('offset', 'i8')])
+
+# line indexes loaded in this process, by real path: (source\'s key, index)
+_line_indexes = {}
+
+
+
+def line_file_key(readfrom):
+    '''
+    Returns a string identifying the content of a line file,
+    from its modification time and size
+    '''
+    stat = os.stat(readfrom)
+    return '{}_{}'.format(stat.st_mtime_ns, stat.st_size)
+
+
+
+def line_index_path(readfrom, key, indexdir = None):
+    '''
+    Returns the path of the index of the line file READFROM, whose
+    content is identified by KEY, in INDEXDIR (default: next to READFROM)
+    '''
+    dirname, basename = os.path.split(os.path.realpath(readfrom))
+    return os.path.join(indexdir or dirname,
+                        '.{}.{}.lines.npy'.format(basename, key))
+
+
+
+def parse_line_records(records):
+    '''
+    Returns a table (see LINE_INDEX_DTYPE) of the molecule, isotope,
+    wavenumber and strength of line records (see is_line_record()),
+    given as strings or bytes.  Offsets are left as 0.
+    '''
+    table = np.zeros(len(records), dtype = LINE_INDEX_DTYPE)
+    if records:
+        table['molecule'] = np.array([record[: 2] for record in records]).astype(np.int64)
+        table['isotope'] = np.array([record[2: 3] for record in records]).astype('S1')
+        table['wavenumber'] = np.array([record[3: 15] for record in records]).astype(np.float64)
+        table['strength'] = np.array([record[15: 25] for record in records]).astype(np.float64)
+    return table
+
+
+
+def build_line_index(readfrom, chunk_size = 2 ** 22):
+    '''
+    Scans a line file, CHUNK_SIZE bytes at a time, and returns its index:
+    a structured array (see LINE_INDEX_DTYPE) with one row for each line
+    record (see is_line_record()), giving the molecule, isotope,
+    wavenumber [cm-1], strength and the record\'s byte offset in the
+    file, sorted by wavenumber.
+    '''
+    chunks = collections.deque([])
+    with open(readfrom, mode = 'rb') as file:
+        position, remainder = 0, b''
+        while True:
+            chunk = file.read(chunk_size)
+            if chunk:
+                # complete lines only, the rest goes with the next chunk
+                head, newline, remainder = (remainder + chunk).rpartition(b'\n')
+                lines = head.split(b'\n') if newline else []
+            else:
+                lines = [remainder] if remainder else []
+
+            lengths = np.array([len(line) + 1 for line in lines], dtype = np.int64)
+            offsets = position + np.cumsum(lengths) - lengths
+            position += lengths.sum()
+
+            isrecords = np.array([is_line_record(line) for line in lines], dtype = bool)
+            records = [line for line, isrecord in zip(lines, isrecords) if isrecord]
+            if records:
+                index = parse_line_records(records)
+                index['offset'] = offsets[isrecords]
+                chunks.append(index)
+            if not chunk:
+                break
+
+    index = np.concatenate(list(chunks)) if chunks else np.zeros(0, dtype = LINE_INDEX_DTYPE)
+    return index[np.argsort(index['wavenumber'], kind = 'stable')]
+
+
+
+def remove_stale_line_indexes(readfrom, path):
+    '''
+    Removes the indexes of the line file READFROM\'s previous content
+    from the directory of PATH, the path of its current index
+    '''
+    dirname = os.path.dirname(path)
+    stale = re.compile(r'\.{}\.\d+_\d+\.lines\.npy$'.format(
+        re.escape(os.path.basename(os.path.realpath(readfrom)))))
+    [os.remove(os.path.join(dirname, name)) for name in os.listdir(dirname)
+     if stale.match(name) and name != os.path.basename(path)]
+
+
+
+def save_line_index(saveas, index):
+    '''
+    Saves a line index as a .npy file, through a temporary file in the
+    same directory that then replaces SAVEAS, so that readers never
+    see a partly written index
+    '''
+    fd, tmppath = tempfile.mkstemp(dir = os.path.dirname(saveas),
+                                   prefix = os.path.basename(saveas),
+                                   suffix = '.tmp')
+    try:
+        with os.fdopen(fd, mode = 'wb') as file:
+            np.save(file, index)
+        os.replace(tmppath, saveas)
+    except OSError:
+        os.remove(tmppath)
+        raise
+
+
+
+def load_line_index(readfrom, indexdir = None):
+    '''
+    Returns the index of a line file (see build_line_index()).  It is
+    built once and saved as a .npy file in INDEXDIR (default: next to
+    the line file), and rebuilt only when the line file changes.
+    The saved index is read through a memory map, and is rebuilt if it
+    cannot be read.  If it cannot be saved, it is kept in memory for
+    this process only.
+    '''
+    realpath = os.path.realpath(readfrom)
+    key = line_file_key(realpath)
+    if realpath in _line_indexes and _line_indexes[realpath][0] == key:
+        return _line_indexes[realpath][1]
+
+    path = line_index_path(realpath, key, indexdir = indexdir)
+    try:
+        index = np.load(path, mmap_mode = 'r')
+    except Exception:
+        # missing, or left truncated by an interrupted write
+        index = None
+    if index is None or index.dtype != LINE_INDEX_DTYPE:
+        index = build_line_index(realpath)
+        try:
+            remove_stale_line_indexes(realpath, path)
+            save_line_index(path, index)
+            index = np.load(path, mmap_mode = 'r')
+        except OSError:
+            pass
+    _line_indexes[realpath] = key, index
+    return index
+
+
+
+def line_index_window(index, V1 = - np.inf, V2 = np.inf):
+    '''
+    Returns the rows of a line index (see load_line_index()) with
+    wavenumbers between V1 and V2 (inclusive), as a view, found by
+    binary search
+    '''
+    wavenumbers = index['wavenumber']
+    return index[np.searchsorted(wavenumbers, V1, side = 'left'):
+                 np.searchsorted(wavenumbers, V2, side = 'right')]
+
+
+
+def select_lines(index, V1 = - np.inf, V2 = np.inf, min_strength = None,
+                 molecule = None):
+    '''
+    Returns the rows of a line index (see load_line_index()) with
+    wavenumbers between V1 and V2 (inclusive), strength at least
+    MIN_STRENGTH, and of MOLECULE (molecule number).  The wavenumber
+    window is found by binary search, the other criteria are applied
+    to the window only.
+    '''
+    window = line_index_window(index, V1 = V1, V2 = V2)
+    if min_strength is None and molecule is None:
+        return window
+    selected = np.ones(window.shape[0], dtype = bool)
+    if min_strength is not None:
+        selected &= window['strength'] >= min_strength
+    if molecule is not None:
+        selected &= window['molecule'] == molecule
+    return window[selected]
+
+
+
+def count_lines(index, V1 = - np.inf, V2 = np.inf, min_strength = None,
+                molecule = None):
+    '''
+    Returns the number of lines in a line index (see select_lines())
+    '''
+    if min_strength is None and molecule is None:
+        wavenumbers = index['wavenumber']
+        return int(np.searchsorted(wavenumbers, V2, side = 'right')
+                   - np.searchsorted(wavenumbers, V1, side = 'left'))
+    return int(select_lines(index, V1 = V1, V2 = V2, min_strength = min_strength,
+                            molecule = molecule).shape[0])
+
+
+
+def read_line_records(readfrom, rows):
+    '''
+    Returns the text of the line records at the rows (from select_lines())
+    of the index of line file READFROM
+    '''
+    records = collections.deque([])
+    with open(readfrom, mode = 'rb') as file:
+        for offset in rows['offset'].tolist():
+            file.seek(offset)
+            records.append(file.readline().rstrip(b'\r\n').decode('utf-8', errors = 'replace'))
+    return list(records)
+
+
+
+def is_line_record(line):
+    '''
+    Returns True if LINE is a line\'s record, in HITRAN\'s 100-character
+    format: molecule number (I2), isotope (I1), wavenumber (F12.6),
+    strength (E10.3), ...  Header lines and AER\'s extra records (e.g. for
+    line coupling), which have a blank or \'-\' in place of the isotope,
+    are not.
+    '''
+    return (len(line) >= 25 and line[:2].strip().isdigit()
+            and line[2: 3] not in (' ', '-', b' ', b'-'))
+
+
+
+def iter_line_records(readfrom, chunk_size = 2 ** 22):
+    '''
+    Yields the line records (see is_line_record()) in a line file,
+    CHUNK_SIZE bytes at a time, as lists of strings
+    '''
+    with open(readfrom, mode = 'r', encoding = 'utf-8', errors = 'replace') as file:
+        remainder = ''
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            chunk, _, next_remainder = (remainder + chunk).rpartition('\n')
+            remainder = next_remainder
+            yield [line for line in chunk.split('\n') if is_line_record(line)]
+        if is_line_record(remainder):
+            yield [remainder]
+
+
+
+def line_wavenumber_histogram(readfroms, edges):
+    '''
+    Returns the number of lines, over all the line files in READFROMS,
+    in each wavenumber bin between EDGES (see load_line_index()).
+    INPUT:
+    readfroms --- paths to line files
+    edges --- (nbin + 1,) edges of the wavenumber bins [cm-1]
+    '''
+    counts = np.zeros(len(edges) - 1, dtype = np.int64)
+    for readfrom in readfroms:
+        counts += np.histogram(load_line_index(readfrom)['wavenumber'], bins = edges)[0]
+    return counts
+
+
+
+def extract_lines(readfrom, saveas, molecules = None,
+                  V1 = - np.inf, V2 = np.inf, min_strength = None,
+                  fmt = 'text', chunk_size = 2 ** 22):
+    '''
+    Extracts the line records (see is_line_record()) of a line file that
+    pass all the filters, reading it CHUNK_SIZE bytes at a time, so that
+    files of any size can be processed.  Returns the number of lines
+    extracted.
+    INPUT:
+    readfrom --- path to the line file
+    saveas --- path of the file to write
+    molecules --- molecule numbers to keep, None for all
+    V1, V2 --- wavenumber window to keep (inclusive) [cm-1]
+    min_strength --- least line strength to keep, None for no limit
+    fmt --- \'text\' to write the records as they are, one per line,
+            \'npz\' to write the columns molecule, isotope, wavenumber
+            and strength as arrays in a .npz file
+    '''
+    if fmt not in ('text', 'npz'):
+        raise ValueError('fmt must be \'text\' or \'npz\'')
+
+    Nline = 0
+    tables = collections.deque([])
+    with open(saveas if fmt == 'text' else os.devnull,
+              mode = 'w', encoding = 'utf-8') as file:
+        for records in iter_line_records(readfrom, chunk_size = chunk_size):
+            table = parse_line_records(records)
+            keep = ((table['wavenumber'] >= V1) & (table['wavenumber'] <= V2))
+            if molecules is not None:
+                keep &= np.isin(table['molecule'], molecules)
+            if min_strength is not None:
+                keep &= table['strength'] >= min_strength
+            if not keep.any():
+                continue
+
+            if fmt == 'text':
+                file.write(('\n' if Nline else '')
+                           + '\n'.join(record for record, kept in zip(records, keep)
+                                       if kept))
+            else:
+                tables.append(table[keep])
+            Nline += int(np.count_nonzero(keep))
+
+    if fmt == 'npz':
+        table = (np.concatenate(list(tables)) if tables
+                 else np.zeros(0, dtype = LINE_INDEX_DTYPE))
+        with open(saveas, mode = 'wb') as file:
+            np.savez(file, **{name: table[name]
+                              for name in ('molecule', 'isotope',
+                                           'wavenumber', 'strength')})
+    return Nline
+
+
+
+def extract_lines_parallel(readfroms, savein = '.', suffix = '_extracted',
+                           Nworkers = 1, **filters):
+    '''
+    Extracts lines from several line files (see extract_lines()),
+    up to NWORKERS files at the same time in worker processes.  The
+    output for each file is written in SAVEIN, named after the file,
+    with SUFFIX appended.  Returns a dictionary of
+    {path of line file: number of lines extracted}.
+    INPUT:
+    filters --- keyword arguments to extract_lines(), e.g. V1, V2,
+                min_strength, molecules, fmt
+    '''
+    os.makedirs(savein, exist_ok = True)
+    saveases = [os.path.join(savein, os.path.basename(readfrom) + suffix)
+                for readfrom in readfroms]
+    with concurrent.futures.ProcessPoolExecutor(max_workers = Nworkers) as executor:
+        Nlines = executor.map(functools.partial(extract_lines, **filters),
+                              readfroms, saveases)
+        return dict(zip(readfroms, Nlines))
+
+
+
+def main(argv = None):
+    '''
+    Command line interface to extract_lines_parallel()
+    '''
+    parser = argparse.ArgumentParser(
+        description = 'Extract lines from HITRAN-like line files.')
+    parser.add_argument('readfroms', nargs = '+', help = 'line files')
+    parser.add_argument('--savein', default = '.',
+                        help = 'directory to write the extracted lines in')
+    parser.add_argument('--suffix', default = '_extracted',
+                        help = 'appended to line files\' names for the output')
+    parser.add_argument('--molecules', type = int, nargs = '+', default = None,
+                        help = 'molecule numbers to keep')
+    parser.add_argument('--V1', type = float, default = - np.inf,
+                        help = 'lowest wavenumber to keep [cm-1]')
+    parser.add_argument('--V2', type = float, default = np.inf,
+                        help = 'highest wavenumber to keep [cm-1]')
+    parser.add_argument('--min-strength', type = float, default = None,
+                        help = 'least line strength to keep')
+    parser.add_argument('--fmt', choices = ('text', 'npz'), default = 'text')
+    parser.add_argument('--workers', type = int, default = 1,
+                        help = 'number of files to process at the same time')
+    args = parser.parse_args(argv)
+
+    Nlines = extract_lines_parallel(args.readfroms, savein = args.savein,
+                                    suffix = args.suffix, Nworkers = args.workers,
+                                    molecules = args.molecules,
+                                    V1 = args.V1, V2 = args.V2,
+                                    min_strength = args.min_strength,
+                                    fmt = args.fmt)
+    for readfrom, Nline in Nlines.items():
+        print('{}: {} lines'.format(readfrom, Nline))
+
+
 
+if __name__ == '__main__':
+    main()
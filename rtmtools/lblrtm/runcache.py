@@ -0,0 +1,124 @@
+'''
+On-disk cache of RADSUM results, keyed by the content of the inputs
+that produced them
+'''
+import os
+import shutil
+import hashlib
+import tempfile
+import collections
+
+
+
+def TAPE3_identity(path_TAPE3):
+    '''
+    Returns a string identifying the TAPE3 at PATH_TAPE3 by its
+    real path, size and modification time, so that a TAPE3 does not
+    have to be read in full to be recognised.
+    '''
+    realpath = os.path.realpath(path_TAPE3)
+    stat = os.stat(realpath)
+    return '{} {} {}'.format(realpath, stat.st_size, stat.st_mtime_ns)
+
+
+
+class RunCache(object):
+    '''
+    Directory of OUTPUT_RADSUM files, each saved under the hash of
+    the TAPE5 text, the IN_RADSUM text and the identity of the TAPE3
+    that produced it.  The directory is kept under MAX_BYTES by
+    removing the least recently used files first.
+    INPUT:
+    cachedir --- directory in which cached files are saved
+    max_bytes --- maximum total size of the cached files [bytes]
+    '''
+    def __init__(self, cachedir = 'radsum_cache', max_bytes = 2 * 1024 ** 3):
+        self.cachedir = cachedir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cachedir, exist_ok = True)
+
+    def key(self, TAPE5 = '', IN_RADSUM = '', TAPE3 = None):
+        '''
+        Returns the cache key for the given TAPE5 and IN_RADSUM texts
+        and path to TAPE3
+        '''
+        sha = hashlib.sha1()
+        for text in (TAPE5, IN_RADSUM,
+                     TAPE3_identity(TAPE3) if TAPE3 else ''):
+            sha.update(text.encode('utf-8'))
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    def path(self, key):
+        '''
+        Returns the path of the cached file for KEY
+        '''
+        return os.path.join(self.cachedir, key)
+
+    def get(self, key, saveas = 'OUTPUT_RADSUM'):
+        '''
+        Copies the cached file for KEY to SAVEAS.  Returns True on a hit
+        and False on a miss.
+        '''
+        path = self.path(key)
+        if not os.path.isfile(path):
+            self.misses += 1
+            return False
+        shutil.copyfile(path, saveas)
+        os.utime(path)
+        self.hits += 1
+        return True
+
+    def put(self, key, readfrom = 'OUTPUT_RADSUM'):
+        '''
+        Saves a copy of READFROM in the cache under KEY, then evicts
+        least recently used files if the cache is over size.
+        '''
+        fd, tmppath = tempfile.mkstemp(dir = self.cachedir, prefix = '.tmp')
+        os.close(fd)
+        shutil.copyfile(readfrom, tmppath)
+        os.replace(tmppath, self.path(key))
+        self.evict()
+
+    def entries(self):
+        '''
+        Returns an OrderedDict of {path: size} of the cached files,
+        from the least to the most recently used.
+        '''
+        stats = ((os.path.join(self.cachedir, name),
+                  os.stat(os.path.join(self.cachedir, name)))
+                 for name in os.listdir(self.cachedir)
+                 if not name.startswith('.'))
+        return collections.OrderedDict(
+            (path, stat.st_size)
+            for path, stat in sorted(stats, key = lambda x: x[1].st_mtime_ns))
+
+    def evict(self):
+        '''
+        Removes least recently used files until the total size of
+        the cache is not more than MAX_BYTES
+        '''
+        entries = self.entries()
+        total = sum(entries.values())
+        for path, size in entries.items():
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def stats(self):
+        '''
+        Returns a dictionary of hit/miss counts and the cache\'s size
+        '''
+        entries = self.entries()
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': len(entries), 'bytes': sum(entries.values())}
+
+    def clear(self):
+        '''
+        Removes all cached files and resets the hit/miss counts
+        '''
+        [os.remove(path) for path in self.entries()]
+        self.hits = self.misses = 0
@@ -60,6 +60,7 @@ if __name__ == '__main__':
     import rtmtools.lblrtm.create_LBLRTM_input as lblrtmin
     import rtmtools.lblrtm.aerutils as aerutils
     import rtmtools.lblrtm.aeranalyse as aeranalyse
+    import rtmtools.lblrtm.spectral as spectral
 
     # Get atmpro DataFrame
     lblrtmin.atmopro_mls75pro(outputfilename = 'mls75pro.dat',
@@ -99,14 +100,12 @@ if __name__ == '__main__':
         # run LBLRTM
         os.system('./lblrtm_dbl')
 
-        # read TAPE13 for radiance
-        records = aerutils.read_lblrtm_spectral_output_files(readfrom = 'TAPE13')
+        # read TAPE13 for radiance, one panel at a time
+        panels = spectral.iter_spectral_panels(readfrom = 'TAPE13')
 
         # integrate radiance over each 11 cm-1 band 
-        records = itertools.islice(records, 1, len(records))
-        bands = itertools.zip_longest(*(2 * [records]))
-        bands = ((wvnums[0], wvnums[1], radiance.sum())\
-                 for wvnums, radiance in bands)
+        bands = ((wvnums[0], wvnums[-1], radiance.sum())\
+                 for wvnums, radiance in panels)
         V1s, V2s, rads = itertools.zip_longest(*bands)
         df_rad = pd.DataFrame(data = np.array(rads),
                               index = [np.array(V1s), np.array(V2s)],
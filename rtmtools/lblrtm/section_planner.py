@@ -0,0 +1,174 @@
+'''
+Planning the wavenumber sections of a flux calculation
+(see aer_flux_calculation.run()).
+
+LBLRTM\'s run time for a section depends mostly on the number of
+lines in it, so equal-width sections over dense H2O bands take much
+longer than those over window regions.  Here the cost of a section is
+modelled as
+
+    overhead + per_line * (number of lines) + per_wavenumber * (width)
+
+and sections are cut so that each has about the same cost.  The
+model\'s coefficients can be fitted to the measured run times of
+previous runs with calibrate().
+
+Typical use:
+
+    edges = np.arange(0., 3050., 1.)
+    counts = lines.line_wavenumber_histogram(paths_line_files, edges)
+    sections = plan_sections(V1, V2, edges, counts, Nsection = Nworkers)
+    results = aer_flux_calculation.run(..., sections = sections)
+    measured = aer_flux_calculation.section_timings(results)
+    print(cost_report(sections, predict_costs(sections, edges, counts), measured))
+    model = calibrate(sections, edges, counts, measured)
+'''
+import collections
+import numpy as np
+import pandas as pd
+
+
+
+CostModel = collections.namedtuple('CostModel',
+                                   ['overhead', 'per_line', 'per_wavenumber'])
+CostModel.__new__.__defaults__ = (1., 1e-4, 1e-3)
+
+# LBLRTM includes the lines up to 25 cm-1 beyond the ends of a section
+LINE_MARGIN = 25.
+
+# Section boundaries are written as {:10.4f} in TAPE5 but as {:10.2f}
+# in IN_RADSUM, and RADSUM\'s output bands (OUTINRAT = 2 cm-1 in
+# aer_flux_calculation.run_section()) only line up across sections
+# if the sections start at V1 + multiples of them.  So boundaries
+# are snapped to this grid [cm-1].
+RESOLUTION = 2.
+
+
+
+def cumulative_line_count(wavenumbers, edges, counts):
+    '''
+    Returns the number of lines below each of WAVENUMBERS, interpolating
+    linearly within the bins of the line histogram (EDGES, COUNTS)
+    '''
+    cumcounts = np.concatenate(([0], np.cumsum(counts)))
+    return np.interp(wavenumbers, edges, cumcounts)
+
+
+
+def section_line_counts(sections, edges, counts, margin = LINE_MARGIN):
+    '''
+    Returns the number of lines affecting each section, those between
+    MARGIN below and MARGIN above it.
+    INPUT:
+    sections --- list of (v1, v2)
+    edges, counts --- histogram of the lines\' wavenumbers
+                      (see lines.line_wavenumber_histogram())
+    '''
+    v1s, v2s = np.array(sections, dtype = np.float64).reshape(-1, 2).T
+    return (cumulative_line_count(v2s + margin, edges, counts)
+            - cumulative_line_count(v1s - margin, edges, counts))
+
+
+
+def predict_costs(sections, edges, counts, model = CostModel(),
+                  margin = LINE_MARGIN):
+    '''
+    Returns the predicted cost of each section [s]
+    (see section_line_counts() for the arguments)
+    '''
+    v1s, v2s = np.array(sections, dtype = np.float64).reshape(-1, 2).T
+    return (model.overhead
+            + model.per_line * section_line_counts(sections, edges, counts,
+                                                   margin = margin)
+            + model.per_wavenumber * (v2s - v1s))
+
+
+
+def plan_sections(V1 = 8., V2 = 2002., edges = None, counts = None,
+                  Nsection = 1, DeltaV_max = 2020., model = CostModel(),
+                  resolution = RESOLUTION):
+    '''
+    Cuts the wavenumber range between V1 and V2 into sections of
+    about equal predicted cost, none longer than DELTAV_MAX.
+    INPUT:
+    edges, counts --- histogram of the lines\' wavenumbers
+                      (see lines.line_wavenumber_histogram())
+    Nsection --- least number of sections, e.g. the number of workers.
+                 More are used if needed to keep within DELTAV_MAX.
+    DeltaV_max --- maximum width of a section, limited by AER
+                   to be 2020 cm-1
+    model --- CostModel, whose PER_WAVENUMBER must be positive
+    resolution --- the boundaries between sections are snapped to
+                   V1 + multiples of RESOLUTION [cm-1], None for
+                   no snapping
+    OUTPUT:
+    sections --- list of (v1, v2)
+    '''
+    if DeltaV_max > 2020:
+        raise ValueError('DeltaV_max must be <= 2020 cm -1')
+    if model.per_wavenumber <= 0:
+        raise ValueError('Cost model\'s per_wavenumber must be positive')
+
+    # cumulative cost from V1, which is strictly increasing
+    # and so can be inverted by interpolation
+    inside = (edges > V1) & (edges < V2)
+    wavenumbers = np.concatenate(([V1], edges[inside], [V2]))
+    cumcosts = (model.per_line * (cumulative_line_count(wavenumbers, edges, counts)
+                                  - cumulative_line_count(V1, edges, counts))
+                + model.per_wavenumber * (wavenumbers - V1))
+
+    Nsection = max(Nsection, int(np.ceil((V2 - V1) / DeltaV_max)))
+    while True:
+        targets = np.linspace(0, cumcosts[-1], Nsection + 1)
+        boundaries = np.interp(targets, cumcosts, wavenumbers)
+        if resolution:
+            boundaries = np.minimum(
+                V1 + np.round((boundaries - V1) / resolution) * resolution, V2)
+        boundaries[0], boundaries[-1] = V1, V2
+        boundaries = np.unique(boundaries)
+        if np.all(np.diff(boundaries) <= DeltaV_max):
+            return list(zip(boundaries[:-1].tolist(), boundaries[1:].tolist()))
+        Nsection += 1
+
+
+
+def cost_report(sections, predicted, measured):
+    '''
+    Returns a table of the predicted and measured cost of each section.
+    INPUT:
+    sections --- list of (v1, v2)
+    predicted --- predicted costs, in the same order as SECTIONS
+                  (see predict_costs())
+    measured --- dictionary of {(v1, v2): measured cost}
+                 (see aer_flux_calculation.section_timings()).  Sections
+                 not in it (e.g. found in the cache) are NaN.
+    '''
+    report = pd.DataFrame(
+        {'V1': [v1 for v1, _ in sections],
+         'V2': [v2 for _, v2 in sections],
+         'predicted': np.asarray(predicted, dtype = np.float64),
+         'measured': [measured.get(tuple(section), np.nan) for section in sections]})
+    report['ratio'] = report['measured'] / report['predicted']
+    return report
+
+
+
+def calibrate(sections, edges, counts, measured, margin = LINE_MARGIN):
+    '''
+    Fits the CostModel to measured costs by least squares.
+    Coefficients that come out negative are set to zero,
+    except PER_WAVENUMBER, which is kept positive.
+    (see section_line_counts() and cost_report() for the arguments)
+    '''
+    sections = [tuple(section) for section in sections
+                if tuple(section) in measured]
+    v1s, v2s = np.array(sections, dtype = np.float64).reshape(-1, 2).T
+    design = np.stack([np.ones(len(sections)),
+                       section_line_counts(sections, edges, counts, margin = margin),
+                       v2s - v1s], axis = 1)
+    costs = np.array([measured[section] for section in sections])
+    coefficients = np.linalg.lstsq(design, costs, rcond = None)[0]
+    overhead, per_line, per_wavenumber = np.maximum(coefficients, 0)
+    return CostModel(overhead = overhead, per_line = per_line,
+                     per_wavenumber = max(per_wavenumber,
+                                          CostModel().per_wavenumber * 1e-6))
@@ -0,0 +1,243 @@
+'''
+Reading LBLRTM\'s spectral output files (TAPE12, TAPE13, etc.)
+without loading them into memory.
+
+These are unformatted sequential Fortran files.  After the file header
+record, each panel is a panel header record (V1, V2, DV, NLIM),
+followed by one or more data records of NLIM values each.  V1 and V2
+are REAL*8 whatever the precision LBLRTM was compiled in; only the
+data records are in that precision.
+'''
+import os
+import collections
+import numpy as np
+
+
+
+def index_fortran_records(readfrom = 'TAPE13', byteorder = '<'):
+    '''
+    Returns the byte offsets and lengths of the records in an
+    unformatted sequential Fortran file.  Only the 4-byte record markers
+    are read, so this is cheap even for very large files.
+    INPUT:
+    readfrom --- path to the file
+    byteorder --- \'<\' for little endian, \'>\' for big endian
+    OUTPUT:
+    offsets --- (nrecord,) byte offsets of the start of each record\'s data
+    lengths --- (nrecord,) length of each record\'s data [bytes]
+    '''
+    marker = np.dtype(byteorder + 'i4')
+    filesize = os.path.getsize(readfrom)
+    offsets, lengths = collections.deque([]), collections.deque([])
+    with open(readfrom, mode = 'rb') as file:
+        position = 0
+        while position + marker.itemsize <= filesize:
+            file.seek(position)
+            length = int(np.frombuffer(file.read(marker.itemsize), dtype = marker)[0])
+            offsets.append(position + marker.itemsize)
+            lengths.append(length)
+            position += length + 2 * marker.itemsize
+    return (np.array(offsets, dtype = np.int64),
+            np.array(lengths, dtype = np.int64))
+
+
+
+def index_spectral_panels(readfrom = 'TAPE13', dtype = 'f8', byteorder = '<',
+                          skip_records = 1, records_per_panel = 1):
+    '''
+    Indexes the panels of an LBLRTM spectral output file.
+    INPUT:
+    readfrom --- path to the file
+    dtype --- type of the reals in the data records, \'f8\' for LBLRTM
+              compiled in double precision, \'f4\' for single precision.
+              The panel headers\' V1 and V2 are always read as \'f8\'.
+    byteorder --- \'<\' for little endian, \'>\' for big endian
+    skip_records --- number of file header records before the first panel
+    records_per_panel --- number of data records following each panel
+                          header, e.g. 1 for radiance only, 2 for
+                          radiance and transmittance
+    OUTPUT:
+    index --- structured array with one row per panel, with fields
+              V1, V2 (panel\'s wavenumber limits), npoints (number of values
+              in each data record), and offsets (byte offsets of the data
+              records)
+    '''
+    dtype = np.dtype(dtype).newbyteorder(byteorder)
+    header_dtype = np.dtype('f8').newbyteorder(byteorder)
+    offsets, lengths = index_fortran_records(readfrom, byteorder = byteorder)
+    offsets, lengths = offsets[skip_records:], lengths[skip_records:]
+
+    Npanel = offsets.shape[0] // (1 + records_per_panel)
+    offsets = offsets[: Npanel * (1 + records_per_panel)].reshape(Npanel, -1)
+    lengths = lengths[: Npanel * (1 + records_per_panel)].reshape(Npanel, -1)
+
+    index = np.zeros(Npanel, dtype = [('V1', 'f8'), ('V2', 'f8'),
+                                       ('npoints', 'i8'),
+                                       ('offsets', 'i8', (records_per_panel,))])
+    with open(readfrom, mode = 'rb') as file:
+        for k, offset in enumerate(offsets[:, 0]):
+            file.seek(offset)
+            index['V1'][k], index['V2'][k] = np.fromfile(file, dtype = header_dtype,
+                                                             count = 2)
+    index['npoints'] = lengths[:, 1] // dtype.itemsize
+    index['offsets'] = offsets[:, 1:]
+    return index
+
+
+
+def iter_spectral_panels(readfrom = 'TAPE13', dtype = 'f8', byteorder = '<',
+                         skip_records = 1, records_per_panel = 1,
+                         mmap = False, index = None):
+    '''
+    Yields the panels of an LBLRTM spectral output file one at a time,
+    as (wavenumbers, values) pairs, so that only one panel is in
+    memory at once.  VALUES is a 1-D array if RECORDS_PER_PANEL is 1,
+    otherwise it has shape (records_per_panel, npoints).
+    INPUT:
+    mmap --- True to read through a memory map of the file, in which
+             case VALUES are read-only views into it
+    index --- index from index_spectral_panels(), to avoid re-indexing
+    (see index_spectral_panels() for the other arguments)
+    '''
+    if index is None:
+        index = index_spectral_panels(readfrom, dtype = dtype, byteorder = byteorder,
+                                      skip_records = skip_records,
+                                      records_per_panel = records_per_panel)
+    dtype = np.dtype(dtype).newbyteorder(byteorder)
+
+    if mmap:
+        file = None
+        buffer = np.memmap(readfrom, dtype = np.uint8, mode = 'r')
+        def read(offset, count):
+            return buffer[offset: offset + count * dtype.itemsize].view(dtype)
+    else:
+        file = open(readfrom, mode = 'rb')
+        def read(offset, count):
+            file.seek(offset)
+            return np.fromfile(file, dtype = dtype, count = count)
+
+    try:
+        for panel in index:
+            yield (np.linspace(panel['V1'], panel['V2'], panel['npoints']),
+                   _panel_values([read(offset, panel['npoints'])
+                                  for offset in panel['offsets']]))
+    finally:
+        if file is not None:
+            file.close()
+
+
+def _panel_values(records):
+    return records[0] if len(records) == 1 else np.stack(records)
+
+
+
+def read_spectral_window(readfrom = 'TAPE13', V1 = 0., V2 = 3000.,
+                         dtype = 'f8', byteorder = '<',
+                         skip_records = 1, records_per_panel = 1,
+                         index = None):
+    '''
+    Returns the wavenumbers and values between V1 and V2 in an LBLRTM
+    spectral output file.  Only the panels overlapping [V1, V2] are
+    read, through a memory map of the file.  Pass the same INDEX (from
+    index_spectral_panels()) for repeated windows into one file.
+    (see iter_spectral_panels() for the other arguments)
+    '''
+    if index is None:
+        index = index_spectral_panels(readfrom, dtype = dtype, byteorder = byteorder,
+                                      skip_records = skip_records,
+                                      records_per_panel = records_per_panel)
+    overlaps = index[(index['V2'] >= V1) & (index['V1'] <= V2)]
+
+    panels = list(iter_spectral_panels(readfrom, dtype = dtype, byteorder = byteorder,
+                                       mmap = True, index = overlaps))
+    if not panels:
+        return np.array([]), np.array([])
+
+    wavenumbers = np.concatenate([wvnums for wvnums, _ in panels])
+    values = np.concatenate([vals for _, vals in panels], axis = -1)
+    inwindow = (wavenumbers >= V1) & (wavenumbers <= V2)
+    return wavenumbers[inwindow], values[..., inwindow]
+
+
+
+def wavenumber_band_ranges(wbands):
+    '''
+    Returns band ids and the wavenumber ranges in each band.
+    INPUT:
+    wbands --- dictionary of {id: [(V1, V2), ...]}, like those returned by
+               rrtmg.sw.info.wavenumber_bands() or
+               clirad.sw.info.wavenumber_bands(), or a list of (V1, V2)
+    OUTPUT:
+    ids --- list of band ids (the (V1, V2) themselves if WBANDS is a list)
+    ranges --- list of lists of (V1, V2), one list per band
+    '''
+    if isinstance(wbands, dict):
+        return list(wbands.keys()), [list(wranges) for wranges in wbands.values()]
+    else:
+        return [tuple(wband) for wband in wbands], [[tuple(wband)] for wband in wbands]
+
+
+
+def integrate_bands(panels, wbands):
+    '''
+    Integrates spectral values over wavenumber bands with the trapezoidal
+    rule, accumulating one panel at a time, so that memory use does not
+    depend on the size of the spectral range.
+    Bands can overlap and can consist of several wavenumber ranges.
+    Each trapezoid between two adjacent spectral points is counted in
+    the band range containing its midpoint.
+    INPUT:
+    panels --- iterable of (wavenumbers, values), e.g. from
+               iter_spectral_panels().  VALUES can be 1-D, or 2-D
+               with the spectral axis last.
+    wbands --- bands to integrate over (see wavenumber_band_ranges())
+    OUTPUT:
+    ids --- list of band ids
+    integrals --- (nband,) array, or (nband, nrecord) if VALUES are 2-D
+    '''
+    ids, ranges = wavenumber_band_ranges(wbands)
+
+    # integrate over the elementary intervals between all band edges,
+    # then add these up into bands at the end
+    edges = np.unique(np.array([wrange for wranges in ranges for wrange in wranges],
+                               dtype = np.float64))
+    Nbin = edges.shape[0] - 1
+
+    totals = None
+    previous = None
+    is_1d = True
+    for wavenumbers, values in panels:
+        is_1d = values.ndim == 1
+        values = np.atleast_2d(values)
+        if totals is None:
+            totals = np.zeros((values.shape[0], Nbin))
+
+        # join up with the last point of the previous panel
+        if previous is not None:
+            wvnum_last, values_last = previous
+            spacing = wavenumbers[1] - wavenumbers[0] if wavenumbers.shape[0] > 1 else 0
+            if 0 < wavenumbers[0] - wvnum_last <= 2 * spacing:
+                wavenumbers = np.concatenate(([wvnum_last], wavenumbers))
+                values = np.concatenate((values_last, values), axis = 1)
+        previous = wavenumbers[-1], values[:, -1:]
+
+        midpoints = .5 * (wavenumbers[:-1] + wavenumbers[1:])
+        areas = .5 * (values[:, :-1] + values[:, 1:]) * np.diff(wavenumbers)
+
+        ibins = np.searchsorted(edges, midpoints, side = 'right') - 1
+        inbins = (ibins >= 0) & (ibins < Nbin)
+        for total, area in zip(totals, areas):
+            total += np.bincount(ibins[inbins], weights = area[inbins],
+                                 minlength = Nbin)
+
+    if totals is None:
+        totals = np.zeros((1, Nbin))
+
+    cumtotals = np.concatenate((np.zeros((totals.shape[0], 1)),
+                                np.cumsum(totals, axis = 1)), axis = 1)
+    integrals = np.array(
+        [sum(cumtotals[:, np.searchsorted(edges, V2)]
+             - cumtotals[:, np.searchsorted(edges, V1)]
+             for V1, V2 in wranges)
+         for wranges in ranges])
+    return ids, integrals[:, 0] if is_1d else integrals
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import aerutils
+
+
+
+OUTPUT_RADSUM = '''
+ WAVENUMBER BAND:     10.00 -     10.50 CM-1
+ LEVEL    PRESSURE   UPWARD FLUX   DOWNWARD FLUX    NET FLUX    HEATING RATE
+             (MB)      (W/M2)        (W/M2)          (W/M2)      (DEG/DAY)
+
+    2       0.0200   1.0000E-01     0.0000E+00     1.0000E-01   1.11111-123
+    1     500.0000   2.0000E-01     1.0000E-01     1.0000E-01   -2.0000E-02
+    0    1013.0000   3.0000E-01     2.0000E-01     1.0000E-01   -3.0000E-02
+ WAVENUMBER BAND:     10.50 -     11.00 CM-1
+ LEVEL    PRESSURE   UPWARD FLUX   DOWNWARD FLUX    NET FLUX    HEATING RATE
+             (MB)      (W/M2)        (W/M2)          (W/M2)      (DEG/DAY)
+
+    2       0.0200   4.0000E-01     0.0000E+00     4.0000E-01   0.0000E+00
+    1     500.0000   5.0000E-01     3.0000E-01     2.0000E-01   -5.0000E-02
+    0    1013.0000   6.0000E-01     4.0000E-01     2.0000E-01   -6.0000E-02
+'''
+
+
+
+class OUTPUT_RADSUM_to_ndarray(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.readfrom = os.path.join(self.tmpdir.name, 'OUTPUT_RADSUM')
+        with open(self.readfrom, mode = 'w', encoding = 'utf-8') as file:
+            file.write(OUTPUT_RADSUM)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_shape_and_coordinates(self):
+        V1s, V2s, levels, data = aerutils.OUTPUT_RADSUM_to_ndarray(
+            readfrom = self.readfrom)
+        np.testing.assert_array_equal(V1s, [10., 10.5])
+        np.testing.assert_array_equal(V2s, [10.5, 11.])
+        np.testing.assert_array_equal(levels, [2, 1, 0])
+        self.assertEqual(data.shape, (2, 3, 5))
+        self.assertTrue(data.flags['C_CONTIGUOUS'])
+        np.testing.assert_array_equal(data[1, :, 0], [.02, 500., 1013.])
+
+    def test_malformed_exponent(self):
+        V1s, V2s, levels, data = aerutils.OUTPUT_RADSUM_to_ndarray(
+            readfrom = self.readfrom)
+        self.assertAlmostEqual(data[0, 0, -1], 1.11111e-123)
+        self.assertEqual(data[0, 1, -1], -.02)
+
+    def test_options(self):
+        V1s, V2s, levels, data = aerutils.OUTPUT_RADSUM_to_ndarray(
+            readfrom = self.readfrom,
+            cooling_rate = True, signed_fluxes = True)
+        np.testing.assert_array_almost_equal(data[1, :, 1], [-.4, -.5, -.6])
+        np.testing.assert_array_almost_equal(data[1, :, 3], [-.4, -.2, -.2])
+        np.testing.assert_array_almost_equal(data[1, :, 4], [0., .05, .06])
+
+    def test_load_OUTPUT_RADSUM(self):
+        ds = aerutils.load_OUTPUT_RADSUM(readfrom = self.readfrom,
+                                         cooling_rate = True)
+        self.assertEqual(dict(ds.sizes), {'band': 2, 'level': 3})
+        self.assertIn('cooling_rate', ds)
+        np.testing.assert_array_equal(ds['V1'].values, [10., 10.5])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
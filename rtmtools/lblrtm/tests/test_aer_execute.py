@@ -0,0 +1,96 @@
+import os
+import stat
+import asyncio
+import tempfile
+import unittest
+import aer_execute
+
+
+
+def write_stub(saveas, script):
+    '''
+    Writes an executable shell script to stand in for a Fortran executable
+    '''
+    with open(saveas, mode = 'w', encoding = 'utf-8') as file:
+        file.write('#!/bin/sh\n' + script)
+    os.chmod(saveas, os.stat(saveas).st_mode | stat.S_IXUSR)
+    return saveas
+
+
+
+class run_executable(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.rundir = os.path.join(self.tmpdir.name, 'run')
+        os.makedirs(self.rundir)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def stub(self, script):
+        return write_stub(os.path.join(self.tmpdir.name, 'stub'), script)
+
+    def test_success(self):
+        TAPE3 = os.path.join(self.tmpdir.name, 'TAPE3.lines')
+        with open(TAPE3, mode = 'w', encoding = 'utf-8') as file:
+            file.write('lines')
+        executable = self.stub('cat TAPE3\nseq 1 30 > TAPE6\necho done\n')
+        result = aer_execute.run(executable, rundir = self.rundir,
+                                 links = {'TAPE3': TAPE3})
+        self.assertTrue(aer_execute.succeeded(result))
+        self.assertEqual(result.stdout, 'linesdone\n')
+        self.assertEqual(result.TAPE6_tail.split(), [str(n) for n in range(11, 31)])
+        self.assertIs(aer_execute.check(result), result)
+
+    def test_no_TAPE6(self):
+        with open(os.path.join(self.rundir, 'TAPE6'), mode = 'w') as file:
+            file.write('from another executable\n')
+        result = aer_execute.run(self.stub('echo done\n'), rundir = self.rundir,
+                                 writes_TAPE6 = False)
+        self.assertEqual(result.TAPE6_tail, '')
+
+    def test_inside_event_loop(self):
+        # as in a Jupyter notebook
+        async def main():
+            return aer_execute.run(self.stub('echo done\n'), rundir = self.rundir)
+        self.assertEqual(asyncio.run(main()).stdout, 'done\n')
+
+    def test_failure(self):
+        result = aer_execute.run(self.stub('echo oops\nexit 3\n'), rundir = self.rundir)
+        self.assertEqual(result.returncode, 3)
+        with self.assertRaises(aer_execute.ExecutionError):
+            aer_execute.check(result)
+
+    def test_timeout(self):
+        result = aer_execute.run(self.stub('exec sleep 10\n'), rundir = self.rundir,
+                                 timeout = .2)
+        self.assertTrue(result.timed_out)
+        self.assertIsNone(result.returncode)
+        self.assertLess(result.elapsed, 5)
+
+    def test_concurrency_limit(self):
+        # each job records when it starts and ends [ns]
+        executable = self.stub('date +%s%N > started\nsleep .2\ndate +%s%N > ended\n')
+        rundirs = [os.path.join(self.tmpdir.name, str(k)) for k in range(6)]
+        [os.makedirs(rundir) for rundir in rundirs]
+
+        results = aer_execute.run_all(
+            [{'executable': executable, 'rundir': rundir} for rundir in rundirs],
+            Nconcurrent = 2)
+        self.assertEqual([result.rundir for result in results], rundirs)
+
+        events = []
+        for rundir in rundirs:
+            for name, change in (('started', 1), ('ended', -1)):
+                with open(os.path.join(rundir, name), mode = 'r') as file:
+                    events.append((int(file.read()), change))
+        running = [0]
+        for time, change in sorted(events):
+            running.append(running[-1] + change)
+        self.assertEqual(max(running), 2)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
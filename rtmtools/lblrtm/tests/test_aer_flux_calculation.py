@@ -0,0 +1,143 @@
+import os
+import asyncio
+import tempfile
+import unittest
+import aer_flux_calculation as aerfluxcalc
+from test_aer_execute import write_stub
+
+
+
+class wavenumber_sections(unittest.TestCase):
+
+    known_values = (
+        ({'V1': 8., 'V2': 2002., 'DeltaV': 2000.},
+         [(8., 2002.)]),
+        ({'V1': 10., 'V2': 5000., 'DeltaV': 2000.},
+         [(10., 2010.), (2010., 4010.), (4010., 5000.)]),
+        ({'V1': 10., 'V2': 4010., 'DeltaV': 2000.},
+         [(10., 2010.), (2010., 4010.)]),
+        )
+
+    def test_known_values(self):
+        for kwargs, ans in self.known_values:
+            self.assertEqual(
+                [(float(v1), float(v2))
+                 for v1, v2 in aerfluxcalc.wavenumber_sections(**kwargs)],
+                ans)
+
+    def test_DeltaV_limit(self):
+        with self.assertRaises(ValueError):
+            aerfluxcalc.wavenumber_sections(V1 = 10., V2 = 5000., DeltaV = 2500.)
+
+
+
+class merge_OUTPUT_RADSUMs(unittest.TestCase):
+
+    def test_order(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            readfroms = []
+            for v1, v2 in ((10., 20.), (20., 30.), (30., 40.)):
+                readfrom = os.path.join(tmpdir,
+                                        aerfluxcalc.section_dirname(v1, v2))
+                with open(readfrom, mode = 'w', encoding = 'utf-8') as file:
+                    file.write('band {} {}\n'.format(v1, v2))
+                readfroms.append(readfrom)
+
+            saveas = os.path.join(tmpdir, 'OUTPUT_RADSUM')
+            aerfluxcalc.merge_OUTPUT_RADSUMs(readfroms, saveas = saveas)
+            with open(saveas, mode = 'r', encoding = 'utf-8') as file:
+                self.assertEqual(file.read(),
+                                 'band 10.0 20.0\nband 20.0 30.0\nband 30.0 40.0\n')
+
+
+
+class run(unittest.TestCase):
+    '''
+    Runs flux calculations with stand-ins for LBLRTM and RADSUM:
+    RADSUM\'s stand-in writes the first line of IN_RADSUM,
+    which has the section\'s wavenumbers, to OUTPUT_RADSUM.
+    '''
+    ATMPRO = '''               A A A A A A A A A
+     0.000  1000.000   290.000 1.000e-02 3.550e-04 2.000e-08 3.000e-07 1.500e-07 1.700e-06 2.090e-01
+     1.000   900.000   280.000 8.000e-03 3.550e-04 3.000e-08 3.000e-07 1.500e-07 1.700e-06 2.090e-01
+'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        with open('atmpro.dat', mode = 'w', encoding = 'utf-8') as file:
+            file.write(self.ATMPRO)
+        with open('TAPE3.lines', mode = 'w', encoding = 'utf-8') as file:
+            file.write('lines')
+        os.makedirs('bin')
+        executables = {'lblrtm': write_stub(os.path.join('bin', 'lblrtm'),
+                                            'cat TAPE3 > TAPE6\n'),
+                       'radsum': write_stub(os.path.join('bin', 'radsum'),
+                                            'head -1 IN_RADSUM > OUTPUT_RADSUM\necho >> OUTPUT_RADSUM\n')}
+        self.filepaths = (aerfluxcalc.filepath_lblrtm, aerfluxcalc.filepath_radsum,
+                          aerfluxcalc.filepath_TAPE3)
+        aerfluxcalc.filepath_lblrtm = lambda: os.path.abspath(executables['lblrtm'])
+        aerfluxcalc.filepath_radsum = lambda: os.path.abspath(executables['radsum'])
+        aerfluxcalc.filepath_TAPE3 = lambda: os.path.abspath('TAPE3.lines')
+
+    def tearDown(self):
+        (aerfluxcalc.filepath_lblrtm, aerfluxcalc.filepath_radsum,
+         aerfluxcalc.filepath_TAPE3) = self.filepaths
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def read_OUTPUT_RADSUM(self):
+        with open('OUTPUT_RADSUM', mode = 'r', encoding = 'utf-8') as file:
+            return [line.split()[: 2] for line in file]
+
+    def test_serial_and_concurrent(self):
+        ans = [['10.00', '2010.00'], ['2010.00', '3000.00']]
+        for kwargs in ({}, {'Nworkers': 2}):
+            results = aerfluxcalc.run(atmpro = 'atmpro.dat', V1 = 10., V2 = 3000.,
+                                      **kwargs)
+            self.assertEqual(self.read_OUTPUT_RADSUM(), ans)
+            self.assertEqual(len(results), 2)
+            self.assertTrue(all(aerfluxcalc.aer_execute.succeeded(result)
+                                for section in results.values() for result in section))
+        self.assertFalse([name for name in os.listdir('.')
+                          if name.startswith('sections')])
+
+    def test_scratchdir_kept(self):
+        os.makedirs('scratch')
+        with open(os.path.join('scratch', 'notes'), mode = 'w') as file:
+            file.write('mine')
+        aerfluxcalc.run(atmpro = 'atmpro.dat', V1 = 10., V2 = 3000.,
+                        Nworkers = 2, scratchdir = 'scratch')
+        self.assertEqual(os.listdir('scratch'), ['notes'])
+
+    def test_inside_event_loop(self):
+        async def main():
+            return aerfluxcalc.run(atmpro = 'atmpro.dat', V1 = 10., V2 = 3000.,
+                                   Nworkers = 2)
+        self.assertEqual(len(asyncio.run(main())), 2)
+        self.assertEqual(len(self.read_OUTPUT_RADSUM()), 2)
+
+    def test_explicit_sections(self):
+        sections = [(10., 1500.), (1500., 3000.)]
+        results = aerfluxcalc.run(atmpro = 'atmpro.dat', sections = sections,
+                                  Nworkers = 2)
+        self.assertEqual(self.read_OUTPUT_RADSUM(),
+                         [['10.00', '1500.00'], ['1500.00', '3000.00']])
+        timings = aerfluxcalc.section_timings(results)
+        self.assertEqual(sorted(timings), sections)
+        self.assertTrue(all(timing > 0 for timing in timings.values()))
+        # only LBLRTM writes TAPE6
+        self.assertTrue(all(lblrtm_result.TAPE6_tail == 'lines'
+                            and radsum_result.TAPE6_tail == ''
+                            for lblrtm_result, radsum_result in results.values()))
+
+    def test_failure(self):
+        write_stub(aerfluxcalc.filepath_radsum(), 'exit 1\n')
+        with self.assertRaises(aerfluxcalc.aer_execute.ExecutionError):
+            aerfluxcalc.run(atmpro = 'atmpro.dat', V1 = 10., V2 = 3000., Nworkers = 2)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
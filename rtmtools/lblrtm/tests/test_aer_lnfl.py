@@ -0,0 +1,104 @@
+import io
+import os
+import contextlib
+import tempfile
+import unittest
+import aer_lnfl
+from test_aer_execute import write_stub
+
+
+
+class TAPE3Store(unittest.TestCase):
+    '''
+    Stores TAPE3s written by a stand-in for LNFL, which writes the
+    record of TAPE5 with VMIN and VMAX to TAPE3 and logs each run.
+    '''
+    MIND1 = 7 * '1' + 32 * '0'
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.runlog = os.path.join(self.tmpdir.name, 'runs')
+        executable = write_stub(os.path.join(self.tmpdir.name, 'lnfl'),
+                                'sed -n 2p TAPE5 > TAPE3\n'
+                                'echo run >> {}\n'.format(self.runlog))
+        linefile = os.path.join(self.tmpdir.name, 'line_file')
+        with open(linefile, mode = 'w', encoding = 'utf-8') as file:
+            file.write('lines')
+        self.filepaths = aer_lnfl.filepath_lnfl, aer_lnfl.filepath_aerlinefile
+        aer_lnfl.filepath_lnfl = lambda: executable
+        aer_lnfl.filepath_aerlinefile = lambda: linefile
+        self.store = aer_lnfl.TAPE3Store(
+            storedir = os.path.join(self.tmpdir.name, 'store'))
+
+    def tearDown(self):
+        aer_lnfl.filepath_lnfl, aer_lnfl.filepath_aerlinefile = self.filepaths
+        self.tmpdir.cleanup()
+
+    def Nrun(self):
+        if not os.path.isfile(self.runlog):
+            return 0
+        with open(self.runlog, mode = 'r', encoding = 'utf-8') as file:
+            return len(file.readlines())
+
+    def test_superset_hit(self):
+        wide = self.store.get(VMIN = 0., VMAX = 3000., MIND1 = self.MIND1)
+        with open(wide, mode = 'r', encoding = 'utf-8') as file:
+            self.assertEqual(file.read().split(), ['0.000', '3000.000'])
+
+        self.assertEqual(self.store.get(VMIN = 500., VMAX = 1000.,
+                                        MIND1 = self.MIND1), wide)
+        self.assertEqual(self.Nrun(), 1)
+
+        # other masks, options or ranges are not covered
+        self.store.get(VMIN = 500., VMAX = 1000., MIND1 = 39 * '1')
+        self.store.get(VMIN = 500., VMAX = 1000., MIND1 = self.MIND1,
+                       HOLIND1 = 'EXBRD')
+        self.store.get(VMIN = 2500., VMAX = 3500., MIND1 = self.MIND1)
+        self.assertEqual(self.Nrun(), 4)
+
+        stats = self.store.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']),
+                         (1, 4, 4))
+
+    def test_normalised_mask(self):
+        self.store.get(VMIN = 0., VMAX = 3000., MIND1 = '1111111')
+        self.store.get(VMIN = 500., VMAX = 1000., MIND1 = self.MIND1)
+        self.assertEqual(self.Nrun(), 1)
+        self.assertEqual(aer_lnfl.TAPE3_mask_key('111 111'),
+                         aer_lnfl.TAPE3_mask_key('1110111' + 32 * '0'))
+        with self.assertRaises(ValueError):
+            aer_lnfl.TAPE3_mask_key(40 * '1')
+
+    def test_command_line_default_mask(self):
+        path = self.store.get(VMIN = 0., VMAX = 3000.)
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            aer_lnfl.main(['--storedir', self.store.storedir,
+                           'get', '--VMIN', '500', '--VMAX', '1000'])
+        self.assertEqual(stdout.getvalue().split('\n')[0], path)
+        self.assertEqual(self.Nrun(), 1)
+
+    def test_narrowest_superset(self):
+        self.store.get(VMIN = 0., VMAX = 3000., MIND1 = self.MIND1)
+        narrow = self.store.get(VMIN = 400., VMAX = 1200., MIND1 = self.MIND1)
+        self.assertEqual(self.store.get(VMIN = 500., VMAX = 1000.,
+                                        MIND1 = self.MIND1), narrow)
+
+    def test_prune(self):
+        self.store.get(VMIN = 500., VMAX = 1000., MIND1 = self.MIND1)
+        self.store.get(VMIN = 2500., VMAX = 3500., MIND1 = self.MIND1)
+        wide = self.store.get(VMIN = 0., VMAX = 3000., MIND1 = self.MIND1)
+
+        removed = self.store.prune()
+        self.assertEqual(len(removed), 1)
+        self.assertEqual(sorted((entry.VMIN, entry.VMAX)
+                                for entry in self.store.entries()),
+                         [(0., 3000.), (2500., 3500.)])
+
+        os.utime(wide, ns = (0, 0))
+        self.assertEqual(self.store.prune(max_bytes = 0)[0], wide)
+        self.assertEqual(self.store.stats()['entries'], 0)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
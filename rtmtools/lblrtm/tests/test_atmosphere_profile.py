@@ -0,0 +1,178 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import scipy.io as spio
+import atmosphere_profile
+
+
+
+ATMPRO = '''               A A A A A A A A A
+     0.000  1000.000   290.000 1.000e-02 3.550e-04 2.000e-08 3.000e-07 1.500e-07 1.700e-06 2.090e-01
+     1.000   900.000   280.000 8.000e-03 3.550e-04 3.000e-08 3.000e-07 1.500e-07 1.700e-06 2.090e-01
+'''
+
+PRO = '''c     some atmospheric profile
+      data (plevel(i),i=1,nlayer+1)/
+     &  1.0000e+00,  1.0000e+02,
+     &  1.0130e+03/
+c
+      data (tlayer(i),i=1,nlayer)/
+     &  2.2000e+02,  2.8000e+02/
+c
+'''
+
+
+
+class load_profiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.atmpro = os.path.join(self.tmpdir.name, 'atmpro.dat')
+        self.pro = os.path.join(self.tmpdir.name, 'atmpro.pro')
+        for path, content in ((self.atmpro, ATMPRO), (self.pro, PRO)):
+            with open(path, mode = 'w', encoding = 'utf-8') as file:
+                file.write(content)
+        atmosphere_profile._loaded_profiles.clear()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_load_atmpro_txtfile(self):
+        units, data = atmosphere_profile.load_atmpro_txtfile(self.atmpro)
+        self.assertEqual(units, 9 * ['A'])
+        self.assertEqual(data.shape, (2, 10))
+        np.testing.assert_array_equal(data[:, 1], [1000., 900.])
+        self.assertFalse(data.flags.writeable)
+
+    def test_load_atmpro_PROfile(self):
+        names, profiles = atmosphere_profile.load_atmpro_PROfile(self.pro)
+        self.assertEqual(names, ['plevel', 'tlayer'])
+        np.testing.assert_array_equal(profiles[0], [1., 100., 1013.])
+        np.testing.assert_array_equal(profiles[1], [220., 280.])
+
+    def test_binary_cache(self):
+        atmosphere_profile.load_atmpro_txtfile(self.atmpro)
+        self.assertTrue(os.path.isfile(atmosphere_profile.profile_cache_path(self.atmpro)))
+
+        # the cache file is used, not the text
+        def parse(content):
+            raise AssertionError('profile parsed again')
+        atmosphere_profile._loaded_profiles.clear()
+        arrays = atmosphere_profile.load_cached_profile(self.atmpro, parse)
+        self.assertEqual(arrays['data'].shape, (2, 10))
+
+        # a changed file is parsed again
+        with open(self.atmpro, mode = 'a', encoding = 'utf-8') as file:
+            file.write(ATMPRO.split('\n')[2] + '\n')
+        units, data = atmosphere_profile.load_atmpro_txtfile(self.atmpro)
+        self.assertEqual(data.shape, (3, 10))
+
+    def test_truncated_binary_cache(self):
+        atmosphere_profile.load_atmpro_txtfile(self.atmpro)
+        path = atmosphere_profile.profile_cache_path(self.atmpro)
+        with open(path, mode = 'rb') as file:
+            content = file.read()
+        with open(path, mode = 'wb') as file:
+            file.write(content[: len(content) // 2])
+
+        # the text is parsed instead, and the cache file written again
+        atmosphere_profile._loaded_profiles.clear()
+        units, data = atmosphere_profile.load_atmpro_txtfile(self.atmpro)
+        self.assertEqual(data.shape, (2, 10))
+        with np.load(path) as npz:
+            np.testing.assert_array_equal(npz['data'], data)
+        self.assertFalse([name for name in os.listdir(self.tmpdir.name)
+                          if name.endswith('.tmp')])
+
+
+
+class AtmosphereProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.atmpro = os.path.join(self.tmpdir.name, 'atmpro.dat')
+        with open(self.atmpro, mode = 'w', encoding = 'utf-8') as file:
+            file.write(ATMPRO)
+        self.profile = atmosphere_profile.AtmosphereProfile.from_txtfile(self.atmpro)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_views(self):
+        pressure = self.profile['pressure']
+        np.testing.assert_array_equal(pressure, [1000., 900.])
+        self.assertTrue(np.shares_memory(pressure, self.profile.data))
+        self.assertEqual(len(self.profile), 2)
+        self.assertEqual(self.profile.molecules[0], 'H2O')
+        with self.assertRaises(AttributeError):
+            self.profile.levels = 2
+
+    def test_DataFrame(self):
+        atmpro = self.profile.to_DataFrame()
+        self.assertEqual(list(atmpro.index), [1, 0])
+        self.assertEqual(atmpro.loc[0, 'pressure'], 1000.)
+        profile = atmosphere_profile.as_AtmosphereProfile(atmpro)
+        np.testing.assert_array_equal(profile.data, self.profile.data)
+
+    def test_dict(self):
+        atmpro = self.profile.to_dict()
+        self.assertEqual(atmpro['pressure']['units'], 'mb')
+        profile = atmosphere_profile.as_AtmosphereProfile(atmpro)
+        self.assertEqual(profile.units, 9 * ['A'])
+        np.testing.assert_array_equal(profile.data, self.profile.data)
+
+    def test_shape_mismatch(self):
+        with self.assertRaises(ValueError):
+            atmosphere_profile.AtmosphereProfile(np.zeros((3, 4)))
+
+
+
+class ERAIN_to_Dataset(unittest.TestCase):
+
+    def setUp(self):
+        '''
+        Writes a (time, lat, lon) = (1, 2, 3) grid, with the same layer
+        and level pressures in every column, but different surface pressures
+        '''
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.readfrom = os.path.join(self.tmpdir.name, 'erain.nc')
+        shape4 = (1, 4, 2, 3)
+        with spio.netcdf_file(self.readfrom, mode = 'w') as file:
+            for name, size in (('time', 1), ('lev', 4), ('lat', 2), ('lon', 3)):
+                file.createDimension(name, size)
+            file.createVariable('lat', 'f4', ('lat',))[:] = [10., 20.]
+            file.createVariable('lon', 'f4', ('lon',))[:] = [0., 1., 2.]
+            surface = ('time', 'lat', 'lon')
+            profile = ('time', 'lev', 'lat', 'lon')
+            file.createVariable('sp', 'f4', surface)[:] = \
+                100 * np.array([[[1000., 900., 850.], [700., 1013., 500.]]])
+            file.createVariable('skt', 'f4', surface)[:] = 280.
+            file.createVariable('play', 'f4', profile)[:] = \
+                np.broadcast_to(np.reshape([100., 400., 800., 950.], (1, 4, 1, 1)), shape4)
+            file.createVariable('plev', 'f4', profile)[:] = \
+                np.broadcast_to(np.reshape([50., 200., 600., 900.], (1, 4, 1, 1)), shape4)
+            for name in ('t', 'q', 'o3'):
+                file.createVariable(name, 'f4', profile)[:] = \
+                    (np.arange(4).reshape(1, 4, 1, 1)
+                     + 10 * np.arange(6).reshape(1, 1, 2, 3))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_columns(self):
+        ds = atmosphere_profile.ERAIN_to_Dataset(self.readfrom)
+        self.assertEqual(dict(ds.sizes), {'column': 6, 'level': 5, 'layer': 4})
+        np.testing.assert_array_equal(ds['lat'].values, [10., 10., 10., 20., 20., 20.])
+        np.testing.assert_array_equal(ds['nlayer'].values, [4, 3, 3, 2, 4, 2])
+        np.testing.assert_array_equal(ds['plevel'].values[3],
+                                      [700., 200., 50., np.nan, np.nan])
+        np.testing.assert_array_equal(ds['tlayer'].values[1],
+                                      [12., 11., 10., np.nan])
+        np.testing.assert_array_equal(ds['plevel'].values[4],
+                                      [1013., 900., 600., 200., 50.])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import itertools
+import unittest
+import numpy as np
+import pandas as pd
+import comparison
+
+
+
+class comparison_engine(unittest.TestCase):
+
+    def setUp(self):
+        pressure = [1000., 500., 0.]
+        self.dfs = [pd.DataFrame({'pressure': pressure,
+                                  'flux_up': [1., 2., 3.],
+                                  'cooling_rate': [0., 1., 0.]}),
+                    pd.DataFrame({'pressure': pressure,
+                                  'flux_up': [1., 4., 3.],
+                                  'cooling_rate': [0., 0., 0.]}),
+                    pd.DataFrame({'pressure': pressure,
+                                  'flux_up': [0., 0., 0.],
+                                  'cooling_rate': [1., 1., 1.]})]
+        self.names = ['a', 'b', 'c']
+        self.runs = comparison.stack_runs(self.dfs, names = self.names)
+
+    def test_stack_runs(self):
+        self.assertEqual(self.runs.data.shape, (3, 3, 3))
+        np.testing.assert_array_equal(self.runs.data[1, :, 1], [1., 4., 3.])
+
+        runs = comparison.stack_runs([self.dfs[0], self.dfs[1].iloc[:2]])
+        self.assertTrue(np.isnan(runs.data[1, 2]).all())
+
+    def test_pairwise_differences(self):
+        for batch_size in (1, 2, 64):
+            differences = list(comparison.iter_pairwise_differences(
+                self.runs, batch_size = batch_size))
+            self.assertEqual([(name1, name2) for name1, name2, _ in differences],
+                             list(itertools.combinations(self.names, 2)))
+            for (name1, name2, difference), (df1, df2) in zip(
+                    differences, itertools.combinations(self.dfs, 2)):
+                pd.testing.assert_frame_equal(difference, df1 - df2)
+
+    def test_pairwise_statistics(self):
+        stats = comparison.pairwise_statistics(self.runs, batch_size = 2)
+        self.assertEqual(list(stats.index), list(itertools.combinations(self.names, 2)))
+        self.assertNotIn('pressure', stats.columns.get_level_values('field'))
+
+        ab = stats.loc[('a', 'b')]
+        self.assertAlmostEqual(ab[('rms', 'flux_up')], np.sqrt(4. / 3))
+        self.assertEqual(ab[('max_abs', 'flux_up')], 2.)
+        # trapezoidal rule over 500 mb intervals
+        self.assertEqual(ab[('integrated', 'flux_up')], -1000.)
+        self.assertEqual(ab[('integrated', 'cooling_rate')], 500.)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
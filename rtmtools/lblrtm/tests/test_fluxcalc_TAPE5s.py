@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import create_LBLRTM_input
+
+
+
+ATMPRO = '''               A A A A A A A A A
+     0.000  1000.000   290.000 1.000e-02 3.550e-04 2.000e-08 3.000e-07 1.500e-07 1.700e-06 2.090e-01
+     1.000   900.000   280.000 8.000e-03 3.550e-04 3.000e-08 3.000e-07 1.500e-07 1.700e-06 2.090e-01
+     2.000   800.000   270.000 5.000e-03 3.550e-04 4.000e-08 3.000e-07 1.500e-07 1.700e-06 2.090e-01
+'''
+
+
+
+class fluxcalc_TAPE5s(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.atmpro = os.path.join(self.tmpdir.name, 'atmpro.dat')
+        with open(self.atmpro, mode = 'w', encoding = 'utf-8') as file:
+            file.write(ATMPRO)
+        self.profile = np.loadtxt(self.atmpro, skiprows = 1)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_same_as_baseline_TAPE5(self):
+        '''
+        TAPE5_fluxcalc* were written from ATMPRO by write_fluxcalc_TAPE5()
+        before it was rewritten on top of fluxcalc_TAPE5_text()
+        '''
+        for JLONG, name in (('', 'TAPE5_fluxcalc'), ('L', 'TAPE5_fluxcalc_JLONG')):
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name),
+                      mode = 'r', encoding = 'utf-8') as file:
+                ans = file.read()
+
+            TAPE5name = os.path.join(self.tmpdir.name, 'TAPE5')
+            create_LBLRTM_input.write_fluxcalc_TAPE5(atmpro = self.atmpro,
+                                                     TAPE5name = TAPE5name,
+                                                     JLONG = JLONG)
+            with open(TAPE5name, mode = 'r', encoding = 'utf-8') as file:
+                self.assertEqual(file.read(), ans)
+
+            tape5s = list(create_LBLRTM_input.fluxcalc_TAPE5s(self.profile,
+                                                              units = ATMPRO.split('\n')[0],
+                                                              JLONG = JLONG))
+            self.assertEqual(tape5s, [ans])
+
+    def test_columns_with_missing_levels(self):
+        profiles = np.stack([self.profile, self.profile])
+        profiles[1, -1, 1] = np.nan
+        paths = create_LBLRTM_input.write_fluxcalc_TAPE5s(
+            profiles, savein = os.path.join(self.tmpdir.name, 'TAPE5s'),
+            TBOUND = [290., 280.])
+        self.assertEqual([os.path.relpath(path, self.tmpdir.name) for path in paths],
+                         [os.path.join('TAPE5s', '0', 'TAPE5'),
+                          os.path.join('TAPE5s', '1', 'TAPE5')])
+        with open(paths[1], mode = 'r', encoding = 'utf-8') as file:
+            lines = file.read().split('\n')
+        self.assertEqual(lines[6], '   -2                        ')
+        self.assertIn(create_LBLRTM_input.record_1_4(TBOUND = 280., SREMIS1 = 1),
+                      lines)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
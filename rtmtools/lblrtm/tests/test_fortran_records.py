@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+import rtmtools.fortran_records as fortran_records
+import create_LBLRTM_input
+
+
+
+class format_records(unittest.TestCase):
+
+    def test_blank_fields(self):
+        notes = ((5, '{:>5d}', 3), (4, None, None), (6, '{0:6.2f}', ''), (3, '{:>3s}', 'A'))
+        self.assertEqual(fortran_records.format_records(notes), '    3' + 10 * ' ' + '  A')
+
+    def test_same_as_records_one_by_one(self):
+        atmpro = np.array([[0., 1013., 288.2, 1.5e-2, 3.55e-4],
+                           [1., 900., 281.7, 8.2e-3, 3.55e-4],
+                           [2., 795.5, 275.1, 4.1e-3, 3.55e-4]])
+        for JLONG in ('', 'L'):
+            ans = '\n'.join(
+                line for level in atmpro
+                for line in (create_LBLRTM_input.record_3_5(ZM = level[0], PM = level[1],
+                                                            TM = level[2], JCHARP = 'A',
+                                                            JCHART = 'A', JLONG = JLONG,
+                                                            JCHAR = 'AA'),
+                             create_LBLRTM_input.record_3_6(JLONG, *level[3:])))
+            self.assertEqual(
+                create_LBLRTM_input.record_3_5_to_3_6_block(atmpro, JCHARP = 'A',
+                                                            JCHART = 'A', JLONG = JLONG,
+                                                            JCHAR = 'AA'),
+                ans)
+
+    def test_known_values(self):
+        self.assertEqual(create_LBLRTM_input.record_3_5(ZM = 1., PM = 900., TM = 281.7,
+                                                        JCHARP = 'A', JCHART = 'A',
+                                                        JCHAR = 'AA'),
+                         '     1.000   900.000   281.700     AA   AA' + 37 * ' ')
+        self.assertEqual(create_LBLRTM_input.record_3_6('', 8.2e-3, 3.55e-4),
+                         '8.2000e-033.5500e-04')
+        self.assertEqual(create_LBLRTM_input.record_3_3B_block(list(range(9))),
+                         ''.join('{:10.3f}'.format(k) for k in range(8))
+                         + '\n' + '     8.000')
+
+    def test_mismatched_lengths(self):
+        notes = ((5, '{:5d}', np.arange(3)), (5, '{:5d}', np.arange(4)))
+        with self.assertRaises(ValueError):
+            fortran_records.format_records(notes)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
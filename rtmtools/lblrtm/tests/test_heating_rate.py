@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+import pandas as pd
+import aeranalyse
+
+
+
+class heating_rate(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.pressure = np.array([1., 100., 500., 1000.])
+        # (run, column, band, level)
+        self.net_flux = rng.normal(size = (2, 3, 4, 4))
+
+    def loop(self, net_flux):
+        return ((net_flux[..., : -1] - net_flux[..., 1:])
+                / (self.pressure[1:] - self.pressure[: -1]) * 8.4410)
+
+    def test_broadcast(self):
+        rates = aeranalyse.heating_rate(self.pressure, self.net_flux)
+        self.assertEqual(rates.shape, (2, 3, 4, 3))
+        for index in np.ndindex(*self.net_flux.shape[: -1]):
+            np.testing.assert_array_almost_equal(rates[index],
+                                                 self.loop(self.net_flux[index]))
+        np.testing.assert_array_equal(
+            aeranalyse.heating_rate(self.pressure, self.net_flux, cooling_rate = True),
+            - rates)
+
+    def test_dtype_and_out(self):
+        rates = aeranalyse.heating_rate(self.pressure, self.net_flux,
+                                        dtype = np.float32)
+        self.assertEqual(rates.dtype, np.float32)
+
+        out = np.empty((2, 3, 4, 3), dtype = np.float32)
+        self.assertIs(aeranalyse.heating_rate(self.pressure, self.net_flux, out = out),
+                      out)
+        np.testing.assert_array_equal(out, rates)
+
+    def test_layer_pressure(self):
+        np.testing.assert_array_equal(aeranalyse.layer_pressure(self.pressure),
+                                      [50.5, 300., 750.])
+
+    def test_netflux_to_heating_rate(self):
+        df = pd.DataFrame(self.net_flux[0, 0].T, index = self.pressure)
+        hr = aeranalyse.netflux_to_heating_rate(df)
+        np.testing.assert_array_equal(hr.values[0], 0.)
+        np.testing.assert_array_almost_equal(hr.values[1:].T, self.loop(df.values.T))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
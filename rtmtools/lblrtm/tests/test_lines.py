@@ -0,0 +1,168 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import lines
+
+
+
+LINE_FILE = '''AER line file header
+%%%%%%%%
+ 11  100.123456 1.000E-20
+ 12  150.500000 2.000E-21
+  1- 150.600000 line coupling
+ 11  210.000000 3.000E-22
+ 11 1150.000000 4.000E-23'''
+
+
+
+class line_records(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.readfrom = os.path.join(self.tmpdir.name, '01_H2O')
+        with open(self.readfrom, mode = 'w', encoding = 'utf-8') as file:
+            file.write(LINE_FILE)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_iter_line_records(self):
+        records = [record for chunk in lines.iter_line_records(self.readfrom,
+                                                                chunk_size = 16)
+                   for record in chunk]
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[-1], ' 11 1150.000000 4.000E-23')
+
+    def test_is_line_record(self):
+        known_values = ((' 11  100.123456 1.000E-20', True),
+                        (b' 11  100.123456 1.000E-20', True),
+                        # AER\'s extra records
+                        (' 1- 150.600000 line coupling', False),
+                        ('  1- 150.600000 line coupling', False),
+                        (' 1  150.600000 line coupling', False),
+                        ('AER line file header', False),
+                        ('%%%%%%%%', False))
+        for line, ans in known_values:
+            self.assertEqual(lines.is_line_record(line), ans, line)
+
+    def test_line_wavenumber_histogram(self):
+        counts = lines.line_wavenumber_histogram([self.readfrom, self.readfrom],
+                                                 edges = [0., 200., 1000., 2000.])
+        np.testing.assert_array_equal(counts, [4, 2, 2])
+
+
+
+class line_index(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.readfrom = os.path.join(self.tmpdir.name, '01_H2O')
+        with open(self.readfrom, mode = 'w', encoding = 'utf-8') as file:
+            file.write(LINE_FILE)
+        lines._line_indexes.clear()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_build_line_index(self):
+        for chunk_size in (7, 2 ** 22):
+            index = lines.build_line_index(self.readfrom, chunk_size = chunk_size)
+            np.testing.assert_array_equal(index['wavenumber'],
+                                          [100.123456, 150.5, 210., 1150.])
+            np.testing.assert_array_equal(index['isotope'], [b'1', b'2', b'1', b'1'])
+            self.assertEqual(lines.read_line_records(self.readfrom, index[1: 2]),
+                             [' 12  150.500000 2.000E-21'])
+
+    def test_select_and_count(self):
+        index = lines.load_line_index(self.readfrom)
+        self.assertEqual(lines.count_lines(index, V1 = 100.123456, V2 = 210.), 3)
+        self.assertEqual(lines.count_lines(index, V1 = 100., V2 = 1200.,
+                                           min_strength = 1e-21), 2)
+        rows = lines.select_lines(index, V1 = 150., V2 = 2000., min_strength = 1e-22)
+        np.testing.assert_array_equal(rows['wavenumber'], [150.5, 210.])
+
+    def test_rebuilt_only_when_changed(self):
+        index = lines.load_line_index(self.readfrom)
+        self.assertIsInstance(index, np.memmap)
+        lines._line_indexes.clear()
+        self.assertEqual(lines.load_line_index(self.readfrom).filename, index.filename)
+
+        with open(self.readfrom, mode = 'a', encoding = 'utf-8') as file:
+            file.write('\n 11 2000.000000 5.000E-24')
+        index = lines.load_line_index(self.readfrom)
+        self.assertEqual(index.shape[0], 5)
+        self.assertEqual(len([name for name in os.listdir(self.tmpdir.name)
+                              if name.endswith('.lines.npy')]), 1)
+
+    def test_truncated_index(self):
+        index = lines.load_line_index(self.readfrom)
+        with open(index.filename, mode = 'r+b') as file:
+            file.truncate(os.path.getsize(index.filename) // 2)
+        lines._line_indexes.clear()
+        index = lines.load_line_index(self.readfrom)
+        np.testing.assert_array_equal(index['wavenumber'],
+                                      [100.123456, 150.5, 210., 1150.])
+        self.assertFalse([name for name in os.listdir(self.tmpdir.name)
+                          if name.endswith('.tmp')])
+
+    def test_sibling_indexes_kept(self):
+        sibling = self.readfrom + '.bak'
+        with open(sibling, mode = 'w', encoding = 'utf-8') as file:
+            file.write(LINE_FILE)
+        sibling_index = lines.load_line_index(sibling)
+
+        with open(self.readfrom, mode = 'a', encoding = 'utf-8') as file:
+            file.write('\n 11 2000.000000 5.000E-24')
+        lines.load_line_index(self.readfrom)
+        self.assertTrue(os.path.isfile(sibling_index.filename))
+
+
+
+class extract_lines(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.readfroms = []
+        for name in ('01_H2O', '02_CO2'):
+            readfrom = os.path.join(self.tmpdir.name, name)
+            with open(readfrom, mode = 'w', encoding = 'utf-8') as file:
+                file.write(LINE_FILE)
+            self.readfroms.append(readfrom)
+        self.saveas = os.path.join(self.tmpdir.name, 'extracted')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_text(self):
+        Nline = lines.extract_lines(self.readfroms[0], self.saveas,
+                                    V1 = 120., min_strength = 1e-22,
+                                    chunk_size = 16)
+        self.assertEqual(Nline, 2)
+        with open(self.saveas, mode = 'r', encoding = 'utf-8') as file:
+            self.assertEqual(file.read(),
+                             ' 12  150.500000 2.000E-21\n 11  210.000000 3.000E-22')
+
+    def test_npz(self):
+        Nline = lines.extract_lines(self.readfroms[0], self.saveas,
+                                    molecules = [1], V2 = 1000., fmt = 'npz')
+        self.assertEqual(Nline, 3)
+        with np.load(self.saveas) as npz:
+            np.testing.assert_array_equal(npz['wavenumber'], [100.123456, 150.5, 210.])
+            np.testing.assert_array_equal(npz['isotope'], [b'1', b'2', b'1'])
+
+        self.assertEqual(lines.extract_lines(self.readfroms[0], self.saveas,
+                                             molecules = [2], fmt = 'npz'), 0)
+
+    def test_parallel(self):
+        savein = os.path.join(self.tmpdir.name, 'out')
+        Nlines = lines.extract_lines_parallel(self.readfroms, savein = savein,
+                                              Nworkers = 2, V2 = 200.)
+        self.assertEqual(Nlines, {readfrom: 2 for readfrom in self.readfroms})
+        self.assertEqual(sorted(os.listdir(savein)),
+                         ['01_H2O_extracted', '02_CO2_extracted'])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
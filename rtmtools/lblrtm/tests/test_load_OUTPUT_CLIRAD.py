@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import xarray as xr
+import rtmtools.clirad.sw.wrangle as wrangle
+
+
+
+OUTPUT_CLIRAD = ''' WAVENUMBER BAND: 1
+  k   pressure  flux_up flux_down net hr
+  x  mb ...
+   1     1.0000       1.0000       2.0000      -1.0000      0.10000
+   2   500.0000       2.0000       4.0000      -2.0000      0.20000
+   3  1000.0000       3.0000       6.0000      -3.0000      0.30000
+ WAVENUMBER BAND: 2
+  k   pressure  flux_up flux_down net hr
+  x  mb ...
+   1     1.0000       2.0000       4.0000      -2.0000      0.20000
+   2   500.0000       4.0000       8.0000      -4.0000      0.40000
+   3  1000.0000       6.0000      12.0000      -6.0000      0.60000
+'''
+
+
+
+class load_OUTPUT_CLIRAD(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.readfrom = os.path.join(self.tmpdir.name, 'OUTPUT_CLIRAD.dat')
+        with open(self.readfrom, mode = 'w', encoding = 'utf-8') as file:
+            file.write(OUTPUT_CLIRAD)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_same_as_from_DataFrames(self):
+        for cooling_rate in (False, True):
+            for signed_fluxes in (False, True):
+                kwargs = {'cooling_rate': cooling_rate,
+                          'signed_fluxes': signed_fluxes}
+                ds = wrangle.load_OUTPUT_CLIRAD(readfrom = self.readfrom, **kwargs)
+                ans = wrangle.load_OUTPUT_CLIRAD_from_DataFrames(
+                    readfrom = self.readfrom, **kwargs)
+                xr.testing.assert_identical(ds, ans)
+                self.assertEqual(list(ds.data_vars), list(ans.data_vars))
+
+    def test_values(self):
+        ds = wrangle.load_OUTPUT_CLIRAD(readfrom = self.readfrom)
+        np.testing.assert_array_equal(ds['spectral_band'].values, [1, 2])
+        np.testing.assert_array_equal(ds['layer_pressure'].values, [250.5, 750.])
+        np.testing.assert_array_equal(ds['flux_up'].values[1], [-2., -4., -6.])
+        np.testing.assert_array_equal(ds['net_flux'].values[1], [2., 4., 6.])
+        np.testing.assert_array_equal(ds['heating_rate'].values[0], [.2, .3])
+
+    def test_reparsed_when_changed(self):
+        ds = wrangle.load_OUTPUT_CLIRAD(readfrom = self.readfrom)
+        ds['flux_up'].values[:] = 0
+        with open(self.readfrom, mode = 'w', encoding = 'utf-8') as file:
+            file.write(OUTPUT_CLIRAD.replace('0.30000', '0.90000'))
+        ds = wrangle.load_OUTPUT_CLIRAD(readfrom = self.readfrom)
+        self.assertEqual(ds['heating_rate'].values[0, -1], .9)
+        self.assertEqual(ds['flux_up'].values[0, 0], -1.)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+import xarray as xr
+import aeranalyse
+
+
+
+class regroup_wavenumber_bands(unittest.TestCase):
+
+    def setUp(self):
+        '''
+        Fine intervals of 1 cm-1 from 0 to 100 cm-1, with the flux in
+        each equal to its lower wavenumber at every level
+        '''
+        V1s = np.arange(0., 100.)
+        Nlevel = 4
+        fluxes = np.repeat(V1s[:, None], Nlevel, axis = 1)
+        self.ds = xr.Dataset(
+            {'pressure': (['band', 'level'],
+                          np.broadcast_to([1., 10., 100., 1000.], fluxes.shape)),
+             'flux_up': (['band', 'level'], fluxes),
+             'flux_down': (['band', 'level'], 2 * fluxes)},
+            coords = {'V1': ('band', V1s), 'V2': ('band', V1s + 1),
+                      'level': np.arange(Nlevel)[::-1]})
+
+    def brute_force(self, V1, V2):
+        item1 = np.abs(self.ds['V1'].values - V1).argmin()
+        item2 = np.abs(self.ds['V2'].values - V2).argmin()
+        return self.ds['flux_up'].values[item1: item2 + 1].sum(axis = 0)
+
+    def test_list_of_bands(self):
+        wbands = [(0, 10), (10.4, 49.6), (50, 100), (-5, 200)]
+        ds = aeranalyse.regroup_wavenumber_bands(self.ds, wbands)
+        self.assertEqual(ds['flux_up'].dims, ('band', 'level'))
+        for k, (V1, V2) in enumerate(wbands):
+            np.testing.assert_array_equal(ds['flux_up'].values[k],
+                                          self.brute_force(V1, V2))
+        np.testing.assert_array_equal(ds['flux_down'].values,
+                                      2 * ds['flux_up'].values)
+        np.testing.assert_array_equal(ds['pressure'].values[2], [1., 10., 100., 1000.])
+        np.testing.assert_array_equal(ds['level'].values, [3, 2, 1, 0])
+
+    def test_multirange_bands(self):
+        wbands = {1: [(0, 10)], 2: [(20, 30), (80, 90)]}
+        ds = aeranalyse.regroup_wavenumber_bands(self.ds, wbands)
+        self.assertEqual(list(ds['band'].values), [1, 2])
+        np.testing.assert_array_equal(ds['V1'].values, [0, 20])
+        np.testing.assert_array_equal(ds['V2'].values, [10, 90])
+        np.testing.assert_array_equal(
+            ds['flux_up'].sel(band = 2).values,
+            self.brute_force(20, 30) + self.brute_force(80, 90))
+
+    def test_unsorted_intervals(self):
+        wbands = [(0, 10), (10.4, 49.6), (50, 100)]
+        order = np.random.RandomState(0).permutation(self.ds.sizes['band'])
+        ds = aeranalyse.regroup_wavenumber_bands(self.ds.isel(band = order), wbands)
+        xr.testing.assert_identical(
+            ds, aeranalyse.regroup_wavenumber_bands(self.ds, wbands))
+
+        overlapping = self.ds.assign_coords(V2 = ('band', self.ds['V2'].values[::-1]))
+        with self.assertRaises(ValueError):
+            aeranalyse.regroup_wavenumber_bands(overlapping, wbands)
+
+    def test_nearest_indices(self):
+        values = np.array([0., 1., 2., 5.])
+        targets = [-1., .5, 1.4, 3.5, 4., 9.]
+        np.testing.assert_array_equal(
+            aeranalyse.nearest_indices(values, targets),
+            [np.abs(values - target).argmin() for target in targets])
+        with self.assertRaises(ValueError):
+            aeranalyse.nearest_indices(values[::-1], targets)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
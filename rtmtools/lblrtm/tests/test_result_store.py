@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+import importlib.util
+import numpy as np
+import rtmtools.result_store as result_store
+from test_OUTPUT_RADSUM_to_ndarray import OUTPUT_RADSUM
+
+
+
+@unittest.skipUnless(importlib.util.find_spec('zarr'), 'zarr is not installed')
+class ResultStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.readfrom = os.path.join(self.tmpdir.name, 'OUTPUT_RADSUM')
+        with open(self.readfrom, mode = 'w', encoding = 'utf-8') as file:
+            file.write(OUTPUT_RADSUM)
+        self.store = result_store.ResultStore(
+            os.path.join(self.tmpdir.name, 'results.zarr'),
+            chunks = {'case': 2, 'band': 1})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_append_and_select(self):
+        for case in ('a', 'b', 'c'):
+            self.store.append_output('lblrtm', self.readfrom, case = case)
+        self.assertEqual(self.store.models(), ['lblrtm'])
+        self.assertEqual(list(self.store.cases('lblrtm')), ['a', 'b', 'c'])
+
+        ds = self.store.open('lblrtm', bands = [1], levels = [1, 2])
+        self.assertEqual(ds['flux_up'].dims, ('case', 'band', 'level'))
+        self.assertEqual(ds['flux_up'].shape, (3, 1, 2))
+        np.testing.assert_array_equal(ds['level'].values, [1, 0])
+        np.testing.assert_array_almost_equal(ds['flux_up'].values[2, 0], [.5, .6])
+        self.assertEqual(ds['flux_up'].encoding['chunks'], (2, 1, 3))
+
+    def test_existing_cases(self):
+        self.store.append_output('lblrtm', self.readfrom)
+        with self.assertRaises(ValueError):
+            self.store.append_output('lblrtm', self.readfrom)
+        self.store.append_output('lblrtm', self.readfrom, if_exists = 'skip')
+        self.assertEqual(list(self.store.cases('lblrtm')),
+                         [os.path.realpath(self.readfrom)])
+
+        ds = self.store.open('lblrtm', cases = [0, 0]).load()
+        ds = ds.assign_coords(case = [os.path.realpath(self.readfrom), 'b'])
+        self.store.append('lblrtm', ds, if_exists = 'skip')
+        self.assertEqual(len(self.store.cases('lblrtm')), 2)
+        with self.assertRaises(ValueError):
+            self.store.append('lblrtm', ds.assign_coords(case = ['c', 'c']))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import rtmtools.lblrtm.atmosphere_profile as atmosphere_profile
+import rtmtools.rrtmg.lw.input as lw_input
+
+
+
+# surface first, as AtmosphereProfile.data
+ATMPRO = np.array([[0., 1000., 290., 1e-2, 3.55e-4, 2e-8, 3e-7, 1.5e-7, 1.7e-6, .209],
+                   [5., 500., 260., 1e-3, 3.55e-4, 2e-8, 3e-7, 1.5e-7, 1.7e-6, .209],
+                   [15., 100., 210., 1e-5, 3.55e-4, 2e-6, 3e-7, 1.5e-7, 1.7e-6, .209]])
+
+
+
+def single_record_INPUT_RRTM(atmpro, TBOUND = 290.):
+    '''
+    INPUT_RRTM for ATMPRO written one record at a time, as in
+    rtmtools/rrtmg/scripts/rrtmg_lw.py
+    '''
+    atmpro = atmosphere_profile.AtmosphereProfile(atmpro)
+    Nlevel = atmpro.data.shape[0]
+    return '\n'.join([
+        lw_input.record_1_1(''),
+        lw_input.record_1_2(IAER = 0, IATM = 1, IXSECT = 0, NUMANGS = 0,
+                            IOUT = 0, IDRV = 0, IMCA = 0, ICLD = 0),
+        lw_input.record_1_4(TBOUND = TBOUND, IEMIS = 0, IREFLECT = 0),
+        lw_input.record_3_1(MODEL = 0, IBMAX = - Nlevel, NOPRNT = 0, NMOL = 7,
+                            IPUNCH = 0, MUNITS = 0),
+        lw_input.record_3_2(HBOUND = atmpro.data[0, 1], HTOA = atmpro.data[-1, 1]),
+        lw_input.record_3_3_B(IBMAX = - Nlevel, atmpro = atmpro),
+        lw_input.record_3_4(IMMAX = Nlevel, HMOD = ''),
+        lw_input.record_3_5_to_3_6s(NMOL = 7, IMMAX = Nlevel, atmpro = atmpro)])
+
+
+
+class INPUT_RRTMs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        # the second column has its top level missing
+        self.atmpros = np.stack([ATMPRO, ATMPRO, ATMPRO])
+        self.atmpros[1, 2] = np.nan
+        self.atmpro = atmosphere_profile.AtmosphereProfile(ATMPRO)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_same_as_single_records(self):
+        text, = lw_input.INPUT_RRTMs(ATMPRO, TBOUND = 290.)
+        self.assertEqual(text, single_record_INPUT_RRTM(ATMPRO))
+
+    def test_record_3_2_boundaries(self):
+        # pressures for pressure boundaries in record 3.3B, else altitudes
+        for IBMAX, ans in ((None, '  1000.000   100.000'),
+                           (3, '     0.000    15.000')):
+            text = lw_input.INPUT_RRTM_text(ATMPRO, IBMAX = IBMAX)
+            self.assertEqual(text.split('\n')[4], ans)
+        text = lw_input.INPUT_RRTM_text(ATMPRO, HBOUND = 900., HTOA = 200.)
+        self.assertEqual(text.split('\n')[4], '   900.000   200.000')
+
+    def test_record_3_3_B_padding(self):
+        # the unused fields of the last record are 8 blanks each
+        self.assertEqual(lw_input.record_3_3_B(IBMAX = -3, atmpro = self.atmpro),
+                         '  1000.000   500.000   100.000' + 5 * 8 * ' ')
+        levels = np.repeat(ATMPRO, 3, axis = 0)
+        self.assertEqual(lw_input.record_3_3_B(
+                             IBMAX = 9, atmpro = atmosphere_profile.AtmosphereProfile(levels))
+                         .split('\n'),
+                         [''.join('{:>10.3f}'.format(z) for z in levels[: 8, 0]),
+                          '    15.000' + 7 * 8 * ' '])
+
+    def test_NaN_levels_dropped(self):
+        texts = list(lw_input.INPUT_RRTMs(self.atmpros, TBOUND = [290., 291., 292.]))
+        self.assertEqual(len(texts), 3)
+        self.assertEqual(texts[1], single_record_INPUT_RRTM(ATMPRO[: 2], TBOUND = 291.))
+        self.assertEqual(texts[2], single_record_INPUT_RRTM(ATMPRO, TBOUND = 292.))
+        self.assertIn('2.900e+02', texts[0].split('\n')[2])
+
+    def test_column_without_levels(self):
+        self.atmpros[2, :, 1] = np.nan
+        with self.assertRaisesRegex(ValueError, r'\[2\]'):
+            list(lw_input.INPUT_RRTMs(self.atmpros))
+        with self.assertRaises(ValueError):
+            lw_input.write_INPUT_RRTMs(self.atmpros, savein = self.tmpdir.name)
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_pool_same_as_serial(self):
+        texts = {}
+        for Nworkers in (1, 2):
+            savein = os.path.join(self.tmpdir.name, str(Nworkers))
+            paths = lw_input.write_INPUT_RRTMs(self.atmpros, savein = savein,
+                                               TBOUND = [290., 291., 292.],
+                                               Nworkers = Nworkers,
+                                               Ncolumn_chunk = 1)
+            self.assertEqual([os.path.relpath(path, savein) for path in paths],
+                             [os.path.join(k, 'INPUT_RRTM') for k in '012'])
+            texts[Nworkers] = []
+            for path in paths:
+                with open(path, mode = 'r', encoding = 'utf-8') as file:
+                    texts[Nworkers].append(file.read())
+        self.assertEqual(texts[1], texts[2])
+        self.assertEqual(texts[1], list(lw_input.INPUT_RRTMs(
+            self.atmpros, TBOUND = [290., 291., 292.])))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
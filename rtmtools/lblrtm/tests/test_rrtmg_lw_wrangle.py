@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import rtmtools.rrtmg.common as common
+import rtmtools.rrtmg.lw.wrangle as wrangle
+
+
+
+# the total over all wavenumbers first, then two bands
+OUTPUT_RRTM = '''\x0c Wavenumbers:   10.0 -  500.0 cm-1, ATM     1
+ LEVEL    PRESSURE   UPWARD FLUX   DOWNWARD FLUX    NET FLUX       HEATING RATE
+             mb          W/m2          W/m2           W/m2          degree/day
+    2     1.0000        6.0000       12.0000        -6.0000        0.60000
+    1   500.0000        3.0000        6.0000        -3.0000        0.30000
+    0  1000.0000        0.0000        0.0000        -0.0000        0.00000
+\x0c Wavenumbers:   10.0 -  350.0 cm-1, ATM     1
+ LEVEL    PRESSURE   UPWARD FLUX   DOWNWARD FLUX    NET FLUX       HEATING RATE
+             mb          W/m2          W/m2           W/m2          degree/day
+    2     1.0000        2.0000        4.0000        -2.0000        0.20000
+    1   500.0000        1.0000        2.0000        -1.0000        0.10000
+    0  1000.0000        0.0000        0.0000        -0.0000        0.00000
+\x0c Wavenumbers:  350.0 -  500.0 cm-1, ATM     1
+ LEVEL    PRESSURE   UPWARD FLUX   DOWNWARD FLUX    NET FLUX       HEATING RATE
+             mb          W/m2          W/m2           W/m2          degree/day
+    2     1.0000        4.0000        8.0000        -4.0000        0.40000
+    1   500.0000        2.0000        4.0000        -2.0000        0.20000
+    0  1000.0000        0.0000        0.0000        -0.0000        0.00000
+\x0c
+ timing
+'''
+
+
+
+class load_OUTPUT_RRTM(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.readfrom = os.path.join(self.tmpdir.name, 'OUTPUT_RRTM')
+        with open(self.readfrom, mode = 'w', encoding = 'utf-8') as file:
+            file.write(OUTPUT_RRTM)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_OUTPUT_RRTM_to_ndarray(self):
+        V1s, V2s, levels, data = wrangle.OUTPUT_RRTM_to_ndarray(self.readfrom)
+        np.testing.assert_array_equal(V1s, [10., 10., 350.])
+        np.testing.assert_array_equal(V2s, [500., 350., 500.])
+        np.testing.assert_array_equal(levels, [2, 1, 0])
+        self.assertEqual(data.shape, (3, 3, 5))
+        np.testing.assert_array_equal(data[2, 0], [1., 4., 8., -4., .4])
+        self.assertFalse(data.flags.writeable)
+
+    def test_signs(self):
+        ds = wrangle.load_OUTPUT_RRTM(self.readfrom, cooling_rate = True,
+                                      signed_fluxes = True)
+        self.assertEqual(ds['flux_up'].dims, ('band', 'level'))
+        np.testing.assert_array_equal(ds['flux_up'].values[1], [-2., -1., 0.])
+        np.testing.assert_array_equal(ds['net_flux'].values[1], [2., 1., 0.])
+        np.testing.assert_array_equal(ds['cooling_rate'].values[1], [-.2, -.1, 0.])
+        # the unsigned arrays are not changed
+        ds = wrangle.load_OUTPUT_RRTM(self.readfrom)
+        np.testing.assert_array_equal(ds['flux_up'].values[1], [2., 1., 0.])
+        np.testing.assert_array_equal(ds['heating_rate'].values[1], [.2, .1, 0.])
+
+    def test_writeable(self):
+        ds = wrangle.load_OUTPUT_RRTM(self.readfrom)
+        ds['flux_up'] *= -1
+        np.testing.assert_array_equal(ds['flux_up'].values[1], [-2., -1., 0.])
+        # the cached arrays are not changed
+        ds = wrangle.load_OUTPUT_RRTM(self.readfrom)
+        np.testing.assert_array_equal(ds['flux_up'].values[1], [2., 1., 0.])
+
+    def test_reparsed_when_changed(self):
+        wrangle.OUTPUT_RRTM_to_ndarray(self.readfrom)
+        self.assertIs(wrangle.OUTPUT_RRTM_to_ndarray(self.readfrom)[-1],
+                      wrangle.OUTPUT_RRTM_to_ndarray(self.readfrom)[-1])
+        with open(self.readfrom, mode = 'w', encoding = 'utf-8') as file:
+            file.write(OUTPUT_RRTM.replace('0.40000', '0.90000 '))
+        data = wrangle.OUTPUT_RRTM_to_ndarray(self.readfrom)[-1]
+        self.assertEqual(data[2, 0, -1], .9)
+
+    def test_spectral_bands(self):
+        ds = wrangle.load_OUTPUT_RRTM(self.readfrom)
+        np.testing.assert_array_equal(common.spectral_bands(ds), [False, True, True])
+
+    def test_sum_over_wave_numbers(self):
+        # the band ending at V2 is included, and the total is left out
+        df = wrangle.sum_OUTPUT_RRTM_over_wave_numbers(self.readfrom, V1 = 10, V2 = 500)
+        np.testing.assert_array_equal(df['pressure'], [1., 500., 1000.])
+        np.testing.assert_array_equal(df['flux_up'], [-6., -3., 0.])
+        np.testing.assert_array_equal(df['flux_down'], [12., 6., 0.])
+        np.testing.assert_array_equal(df['net_flux'], [6., 3., 0.])
+        np.testing.assert_array_almost_equal(df['cooling_rate'], [-.6, -.3, 0.])
+
+        # V1 and V2 are rounded to the closest band boundaries
+        df = wrangle.sum_OUTPUT_RRTM_over_wave_numbers(self.readfrom, V1 = 0, V2 = 340)
+        np.testing.assert_array_equal(df['flux_down'], [4., 2., 0.])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
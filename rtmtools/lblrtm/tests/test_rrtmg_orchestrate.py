@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import rtmtools.rrtmg.orchestrate as orchestrate
+from test_aer_execute import write_stub
+
+
+
+OUTPUT_RRTM_LW = '''\x0c Wavenumbers:   10.0 - 3250.0 cm-1, ATM     1
+ LEVEL    PRESSURE   UPWARD FLUX   DOWNWARD FLUX    NET FLUX       HEATING RATE
+             mb          W/m2          W/m2           W/m2          degree/day
+    1   500.0000        3.0000        6.0000        -3.0000        0.30000
+    0  1000.0000        0.0000        0.0000        -0.0000        0.00000
+\x0c Wavenumbers:   10.0 -  350.0 cm-1, ATM     1
+ LEVEL    PRESSURE   UPWARD FLUX   DOWNWARD FLUX    NET FLUX       HEATING RATE
+             mb          W/m2          W/m2           W/m2          degree/day
+    1   500.0000        1.0000        2.0000        -1.0000        0.10000
+    0  1000.0000        0.0000        0.0000        -0.0000        0.00000
+\x0c
+ timing
+'''
+
+OUTPUT_RRTM_SW = '''\x0c Wavenumbers:   820.0 - 50000.0 cm-1, ATM     1
+ LEVEL PRESSURE   UPWARD FLUX  DIFDOWN FLUX  DIRDOWN FLUX  DOWNWARD FLUX   NET FLUX    HEATING RATE
+   mb    W/m2 ...
+    1   500.0000        3.0000        3.0000        3.0000        6.0000        3.0000      0.30000
+    0  1000.0000        0.0000        0.0000        0.0000        0.0000        0.0000      0.00000
+\x0c Wavenumbers:   820.0 -  2600.0 cm-1, ATM     1
+ LEVEL PRESSURE   UPWARD FLUX  DIFDOWN FLUX  DIRDOWN FLUX  DOWNWARD FLUX   NET FLUX    HEATING RATE
+   mb    W/m2 ...
+    1   500.0000        1.0000        1.0000        1.0000        2.0000        1.0000      0.10000
+    0  1000.0000        0.0000        0.0000        0.0000        0.0000        0.0000      0.00000
+\x0c
+ timing
+'''
+
+ATMPRO = np.array([[0., 1000., 290., 1e-2, 3.55e-4, 2e-8, 3e-7, 1.5e-7, 1.7e-6, .209],
+                   [5., 500., 260., 1e-3, 3.55e-4, 2e-8, 3e-7, 1.5e-7, 1.7e-6, .209]])
+
+
+
+class run(unittest.TestCase):
+    '''
+    Runs RRTMG with a stand-in that checks that there is an
+    INPUT_RRTM and writes a fixed OUTPUT_RRTM
+    '''
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        for model, OUTPUT_RRTM in (('lw', OUTPUT_RRTM_LW), ('sw', OUTPUT_RRTM_SW)):
+            saveas = os.path.join(self.tmpdir.name, 'OUTPUT_RRTM.' + model)
+            with open(saveas, mode = 'w', encoding = 'utf-8') as file:
+                file.write(OUTPUT_RRTM)
+        self.rundir = os.path.join(self.tmpdir.name, 'runs')
+        self.atmpros = np.stack(3 * [ATMPRO])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def stub(self, script, model = 'lw'):
+        return write_stub(os.path.join(self.tmpdir.name, 'rrtmg_' + model),
+                          script + 'test -f INPUT_RRTM || exit 1\n'
+                          'cp {} OUTPUT_RRTM\n'.format(
+                              os.path.join(self.tmpdir.name, 'OUTPUT_RRTM.' + model)))
+
+    def test_stacked_by_case(self):
+        ds, results = orchestrate.run('lw', self.atmpros, rundir = self.rundir,
+                                      executable = self.stub(''),
+                                      Nconcurrent = 2, TBOUND = [290., 291., 292.])
+        self.assertEqual(ds['flux_up'].dims, ('case', 'band', 'level'))
+        self.assertEqual(ds['flux_up'].shape, (3, 2, 2))
+        np.testing.assert_array_equal(ds['case'].values, [0, 1, 2])
+        np.testing.assert_array_almost_equal(ds['flux_up'].values[:, 1, 0], 3 * [1.])
+
+        self.assertEqual(sorted(os.listdir(self.rundir)), ['0', '1', '2'])
+        with open(os.path.join(self.rundir, '2', 'INPUT_RRTM'), mode = 'r') as file:
+            self.assertIn('2.920e+02', file.read())
+        timings = orchestrate.case_timings(results)
+        self.assertEqual(list(timings['attempts']), [1, 1, 1])
+        self.assertTrue(timings['succeeded'].all())
+
+    def test_retry(self):
+        # fails on the first attempt in each directory
+        executable = self.stub('test -f tried || { touch tried; exit 1; }\n')
+        ds, results = orchestrate.run('lw', self.atmpros, rundir = self.rundir,
+                                      executable = executable, Nretry = 1)
+        self.assertEqual([len(attempts) for attempts in results], [2, 2, 2])
+        self.assertEqual(ds['flux_up'].shape, (3, 2, 2))
+
+    def test_failure(self):
+        executable = self.stub('exit 2\n')
+        with self.assertRaises(orchestrate.aer_execute.ExecutionError):
+            orchestrate.run('lw', self.atmpros, rundir = self.rundir,
+                            executable = executable, Nretry = 1)
+
+    def test_remove_scratch(self):
+        # only the cases\' directories are removed from a given RUNDIR
+        os.makedirs(self.rundir)
+        with open(os.path.join(self.rundir, 'notes'), mode = 'w') as file:
+            file.write('keep me')
+        ds, _ = orchestrate.run('sw', self.atmpros, rundir = self.rundir,
+                                executable = self.stub('', model = 'sw'),
+                                keep_scratch = False,
+                                SZA = [0., 30., 60.], albedo = .2)
+        self.assertEqual(os.listdir(self.rundir), ['notes'])
+        self.assertEqual(ds['flux_up'].shape, (3, 2, 2))
+
+    def test_remove_own_scratch(self):
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        try:
+            orchestrate.run('lw', self.atmpros, executable = self.stub(''),
+                            keep_scratch = False)
+            self.assertFalse([name for name in os.listdir('.')
+                              if name.startswith('rrtmg_runs')])
+            orchestrate.run('lw', self.atmpros, executable = self.stub(''))
+            self.assertEqual(len([name for name in os.listdir('.')
+                                  if name.startswith('rrtmg_runs')]), 1)
+        finally:
+            os.chdir(cwd)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
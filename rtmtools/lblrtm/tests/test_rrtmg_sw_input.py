@@ -0,0 +1,127 @@
+import os
+import types
+import tempfile
+import unittest
+import numpy as np
+import rtmtools.lblrtm.atmosphere_profile as atmosphere_profile
+import rtmtools.rrtmg.sw.input as sw_input
+from test_rrtmg_lw_input import ATMPRO
+
+
+
+def single_record_INPUT_RRTM(atmpro, JULDAT = 0, SZA = 0., albedo = .2):
+    '''
+    INPUT_RRTM for ATMPRO written one record at a time, as in
+    rtmtools/rrtmg/scripts/rrtmg_sw.py
+    '''
+    atmpro = atmosphere_profile.AtmosphereProfile(atmpro)
+    Nlevel = atmpro.data.shape[0]
+    return '\n'.join([
+        sw_input.record_1_1(''),
+        sw_input.record_1_2(IAER = 0, IATM = 1, ISCAT = 0, ISTRM = 0, IOUT = 0,
+                            IMCA = 0, ICLD = 0, IDELM = 0, ICOS = 0),
+        sw_input.record_1_2_1(JULDAT = JULDAT, SZA = SZA),
+        sw_input.record_1_4(IEMIS = 1, IREFLECT = 0, SEMISS = [1 - albedo]),
+        sw_input.record_3_1(MODEL = 0, IBMAX = - Nlevel, NOPRNT = 0, NMOL = 7,
+                            IPUNCH = 0, MUNITS = 0),
+        sw_input.record_3_2(HBOUND = atmpro.data[0, 1], HTOA = atmpro.data[-1, 1]),
+        sw_input.record_3_3_B(IBMAX = - Nlevel, atmpro = atmpro),
+        sw_input.record_3_4(IMMAX = Nlevel, HMOD = ''),
+        sw_input.record_3_5_to_3_6s(NMOL = 7, IMMAX = Nlevel, atmpro = atmpro)])
+
+
+
+class records(unittest.TestCase):
+    '''
+    Known values, as written before the records were built from notes
+    '''
+
+    def test_record_1_2_1(self):
+        self.assertEqual(sw_input.record_1_2_1(JULDAT = 100, SZA = 30.),
+                         12 * ' ' + '100   30.0000' + 75 * ' ')
+        self.assertEqual(sw_input.record_1_2_1(JULDAT = 1, SZA = .5, SOLVAR = 14 * [1.]),
+                         14 * ' ' + '1    0.5000' + 5 * ' ' + 14 * '1.000')
+
+    def test_record_1_4(self):
+        self.assertEqual(sw_input.record_1_4(IEMIS = 1, IREFLECT = 0, SEMISS = [.8]),
+                         11 * ' ' + '1  00.800')
+        self.assertEqual(sw_input.record_1_4(IEMIS = 2, IREFLECT = 0, SEMISS = 14 * [.8]),
+                         11 * ' ' + '2  0' + 14 * '0.800')
+        self.assertEqual(sw_input.record_1_4(IEMIS = 0, IREFLECT = 0),
+                         11 * ' ' + '0  0' + 70 * ' ')
+
+    def test_record_3_3_B(self):
+        atmpro = atmosphere_profile.AtmosphereProfile(ATMPRO)
+        self.assertEqual(sw_input.record_3_3_B(IBMAX = -3, atmpro = atmpro),
+                         '  1000.000   500.000   100.000' + 5 * 8 * ' ')
+        self.assertEqual(sw_input.record_3_3_B(IBMAX = 2, atmpro = atmpro),
+                         '     0.000     5.000' + 6 * 8 * ' ')
+
+
+
+class INPUT_RRTMs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        # the second column has its top level missing
+        self.atmpros = np.stack([ATMPRO, ATMPRO, ATMPRO])
+        self.atmpros[1, 2] = np.nan
+        self.columns = {'JULDAT': [1, 2, 3], 'SZA': [0., 30., 60.],
+                        'albedo': [.1, .2, .3]}
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_generator(self):
+        texts = sw_input.INPUT_RRTMs(self.atmpros, **self.columns)
+        self.assertIsInstance(texts, types.GeneratorType)
+        texts = list(texts)
+        self.assertEqual(texts[0], single_record_INPUT_RRTM(ATMPRO, 1, 0., .1))
+        self.assertEqual(texts[1], single_record_INPUT_RRTM(ATMPRO[: 2], 2, 30., .2))
+        self.assertEqual(texts[2], single_record_INPUT_RRTM(ATMPRO, 3, 60., .3))
+
+    def test_record_3_2_boundaries(self):
+        # pressures for pressure boundaries in record 3.3B, else altitudes
+        for IBMAX, ans in ((-1, ['  1000.000   100.000', '  1000.000   500.000']),
+                           (1, ['     0.000    15.000', '     0.000     5.000'])):
+            texts = sw_input.INPUT_RRTMs(self.atmpros[: 2], IBMAX = IBMAX)
+            self.assertEqual([text.split('\n')[5] for text in texts], ans)
+        texts = sw_input.INPUT_RRTMs(self.atmpros[: 2], HBOUND = 900.,
+                                     HTOA = [200., 600.])
+        self.assertEqual([text.split('\n')[5] for text in texts],
+                         ['   900.000   200.000', '   900.000   600.000'])
+
+    def test_albedo_per_band(self):
+        albedo = np.linspace(.1, .4, 14)
+        text, = sw_input.INPUT_RRTMs(ATMPRO, albedo = albedo[None, :])
+        self.assertEqual(text.split('\n')[3],
+                         sw_input.record_1_4(IEMIS = 2, IREFLECT = 0,
+                                             SEMISS = list(1 - albedo)))
+
+    def test_column_without_levels(self):
+        self.atmpros[0, :, 1] = np.nan
+        with self.assertRaisesRegex(ValueError, r'\[0\]'):
+            list(sw_input.INPUT_RRTMs(self.atmpros))
+        with self.assertRaises(ValueError):
+            sw_input.write_INPUT_RRTMs(self.atmpros, savein = self.tmpdir.name)
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_pool_same_as_serial(self):
+        self.columns['HTOA'] = [90., 400., 80.]
+        texts = {}
+        for Nworkers in (1, 2):
+            paths = sw_input.write_INPUT_RRTMs(
+                self.atmpros, savein = os.path.join(self.tmpdir.name, str(Nworkers)),
+                Nworkers = Nworkers, Ncolumn_chunk = 2, **self.columns)
+            texts[Nworkers] = []
+            for path in paths:
+                with open(path, mode = 'r', encoding = 'utf-8') as file:
+                    texts[Nworkers].append(file.read())
+        self.assertEqual(texts[1], texts[2])
+        self.assertEqual(texts[1], list(sw_input.INPUT_RRTMs(self.atmpros,
+                                                             **self.columns)))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
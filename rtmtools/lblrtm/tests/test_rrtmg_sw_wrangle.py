@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import rtmtools.rrtmg.sw.analyse as analyse
+import rtmtools.rrtmg.sw.wrangle as wrangle
+
+
+
+# the total over all wavenumbers first, then two bands
+OUTPUT_RRTM = '''\x0c Wavenumbers:   820.0 - 50000.0 cm-1, ATM     1
+ LEVEL PRESSURE   UPWARD FLUX  DIFDOWN FLUX  DIRDOWN FLUX  DOWNWARD FLUX   NET FLUX    HEATING RATE
+   mb    W/m2 ...
+    1   500.0000        3.0000        1.5000        4.5000        6.0000        3.0000      0.30000
+    0  1000.0000        1.5000        1.0000        2.0000        3.0000        1.5000      0.00000
+\x0c Wavenumbers:   820.0 -  2600.0 cm-1, ATM     1
+ LEVEL PRESSURE   UPWARD FLUX  DIFDOWN FLUX  DIRDOWN FLUX  DOWNWARD FLUX   NET FLUX    HEATING RATE
+   mb    W/m2 ...
+    1   500.0000        1.0000        0.5000        1.5000        2.0000        1.0000      0.10000
+    0  1000.0000        0.5000        0.5000        0.5000        1.0000        0.5000      0.00000
+\x0c Wavenumbers:  2600.0 - 50000.0 cm-1, ATM     1
+ LEVEL PRESSURE   UPWARD FLUX  DIFDOWN FLUX  DIRDOWN FLUX  DOWNWARD FLUX   NET FLUX    HEATING RATE
+   mb    W/m2 ...
+    1   500.0000        2.0000        1.0000        3.0000        4.0000        2.0000      0.20000
+    0  1000.0000        1.0000        0.5000        1.5000        2.0000        1.0000      0.00000
+\x0c
+ timing
+'''
+
+
+
+class load_OUTPUT_RRTM(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.readfroms = []
+        for case in ('a', 'b'):
+            os.makedirs(os.path.join(self.tmpdir.name, case))
+            readfrom = os.path.join(self.tmpdir.name, case, 'OUTPUT_RRTM')
+            with open(readfrom, mode = 'w', encoding = 'utf-8') as file:
+                file.write(OUTPUT_RRTM)
+            self.readfroms.append(readfrom)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_values(self):
+        ds = wrangle.load_OUTPUT_RRTM(self.readfroms[0], cooling_rate = True,
+                                      signed_fluxes = True)
+        self.assertEqual(list(ds.data_vars), list(wrangle.variable_names(True)))
+        np.testing.assert_array_equal(ds['V1'].values, [820., 820., 2600.])
+        np.testing.assert_array_equal(ds['V2'].values, [50000., 2600., 50000.])
+        np.testing.assert_array_equal(ds['level'].values, [1, 0])
+        np.testing.assert_array_equal(ds['flux_difdown'].values[1], [.5, .5])
+        np.testing.assert_array_equal(ds['flux_dirdown'].values[1], [1.5, .5])
+        np.testing.assert_array_equal(ds['flux_up'].values[1], [-1., -.5])
+        np.testing.assert_array_equal(ds['net_flux'].values[1], [1., .5])
+        np.testing.assert_array_equal(ds['cooling_rate'].values[1], [-.1, 0.])
+
+    def test_writeable(self):
+        ds = wrangle.load_OUTPUT_RRTM(self.readfroms[0])
+        ds['flux_up'] *= -1
+        np.testing.assert_array_equal(ds['flux_up'].values[1], [-1., -.5])
+        # the cached arrays are not changed
+        ds = wrangle.load_OUTPUT_RRTM(self.readfroms[0])
+        np.testing.assert_array_equal(ds['flux_up'].values[1], [1., .5])
+
+    def test_stacked_by_case(self):
+        ds = wrangle.load_OUTPUT_RRTMs(self.tmpdir.name)
+        self.assertEqual(ds['flux_down'].dims, ('case', 'band', 'level'))
+        self.assertEqual(list(ds['case'].values), self.readfroms)
+        np.testing.assert_array_equal(ds['flux_down'].values[1, 2], [4., 2.])
+        np.testing.assert_array_equal(ds['heating_rate'].values[0, 0], [.3, 0.])
+
+    def test_mismatched_files(self):
+        with open(self.readfroms[1], mode = 'w', encoding = 'utf-8') as file:
+            file.write(OUTPUT_RRTM.replace('2600.0', '2700.0'))
+        with self.assertRaises(ValueError):
+            wrangle.load_OUTPUT_RRTMs(self.readfroms)
+        with self.assertRaises(ValueError):
+            wrangle.load_OUTPUT_RRTMs([])
+
+    def test_sum_over_wbands(self):
+        ds = wrangle.load_OUTPUT_RRTM(self.readfroms[0])
+        df = analyse.sum_OUTPUT_RRTM_over_wbands(ds, V1 = 820., V2 = 50000.)
+        np.testing.assert_array_equal(df['pressure'], [500., 1000.])
+        np.testing.assert_array_equal(df['flux_down'], [6., 3.])
+        df = analyse.sum_OUTPUT_RRTM_over_wbands(ds, V1 = 3000., V2 = 50000.)
+        np.testing.assert_array_equal(df['flux_down'], [4., 2.])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+import runcache
+
+
+
+class RunCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cachedir = os.path.join(self.tmpdir.name, 'cache')
+        self.output = os.path.join(self.tmpdir.name, 'OUTPUT_RADSUM')
+        self.TAPE3 = os.path.join(self.tmpdir.name, 'TAPE3')
+        with open(self.TAPE3, mode = 'w', encoding = 'utf-8') as file:
+            file.write('lines')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_output(self, content):
+        with open(self.output, mode = 'w', encoding = 'utf-8') as file:
+            file.write(content)
+
+    def read_output(self):
+        with open(self.output, mode = 'r', encoding = 'utf-8') as file:
+            return file.read()
+
+    def test_key(self):
+        cache = runcache.RunCache(cachedir = self.cachedir)
+        key = cache.key(TAPE5 = 'a', IN_RADSUM = 'b', TAPE3 = self.TAPE3)
+        self.assertEqual(key,
+                         cache.key(TAPE5 = 'a', IN_RADSUM = 'b', TAPE3 = self.TAPE3))
+        self.assertNotEqual(key,
+                            cache.key(TAPE5 = 'ab', IN_RADSUM = '', TAPE3 = self.TAPE3))
+        self.assertNotEqual(key,
+                            cache.key(TAPE5 = 'a', IN_RADSUM = 'b'))
+
+    def test_hit_and_miss(self):
+        cache = runcache.RunCache(cachedir = self.cachedir)
+        key = cache.key(TAPE5 = 'a', IN_RADSUM = 'b', TAPE3 = self.TAPE3)
+        self.assertFalse(cache.get(key, saveas = self.output))
+
+        self.write_output('fluxes')
+        cache.put(key, readfrom = self.output)
+        self.write_output('')
+        self.assertTrue(cache.get(key, saveas = self.output))
+        self.assertEqual(self.read_output(), 'fluxes')
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']),
+                         (1, 1, 1))
+
+    def test_lru_eviction(self):
+        cache = runcache.RunCache(cachedir = self.cachedir, max_bytes = 20)
+        keys = [cache.key(TAPE5 = str(k)) for k in range(3)]
+
+        for k, key in enumerate(keys[:2]):
+            self.write_output(10 * str(k))
+            cache.put(key, readfrom = self.output)
+            os.utime(cache.path(key), ns = (k, k))
+
+        # using the first entry makes the second the least recently used
+        self.assertTrue(cache.get(keys[0], saveas = self.output))
+
+        self.write_output(10 * '2')
+        cache.put(keys[2], readfrom = self.output)
+
+        self.assertTrue(os.path.isfile(cache.path(keys[0])))
+        self.assertFalse(os.path.isfile(cache.path(keys[1])))
+        self.assertTrue(os.path.isfile(cache.path(keys[2])))
+        self.assertEqual(cache.stats()['bytes'], 20)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+import section_planner
+
+
+
+class plan_sections(unittest.TestCase):
+
+    # 1000 lines per cm-1 between 100 and 200 cm-1, none elsewhere
+    edges = np.arange(0., 3001., 1.)
+    counts = np.where((edges[:-1] >= 100) & (edges[:-1] < 200), 1000, 0)
+    model = section_planner.CostModel(overhead = 1., per_line = 1e-5,
+                                      per_wavenumber = 1e-3)
+
+    def test_balanced(self):
+        sections = section_planner.plan_sections(0., 3000., self.edges, self.counts,
+                                                 Nsection = 4, model = self.model,
+                                                 resolution = None)
+        self.assertEqual(len(sections), 4)
+        self.assertEqual((sections[0][0], sections[-1][1]), (0., 3000.))
+        costs = section_planner.predict_costs(sections, self.edges, self.counts,
+                                              model = self.model, margin = 0.)
+        np.testing.assert_allclose(costs, costs.mean(), rtol = 1e-6)
+        # the section over the dense band is narrower than the rest
+        self.assertLess(sections[0][1] - sections[0][0], 200.)
+
+    def test_width_limit(self):
+        sections = section_planner.plan_sections(0., 3000., self.edges, self.counts,
+                                                 Nsection = 1, DeltaV_max = 1000.,
+                                                 model = self.model)
+        self.assertTrue(all(v2 - v1 <= 1000. for v1, v2 in sections))
+        self.assertTrue(all(a[1] == b[0] for a, b in zip(sections[:-1], sections[1:])))
+
+    def test_snapped_boundaries(self):
+        V1, V2 = 8., 3001.
+        sections = section_planner.plan_sections(V1, V2, self.edges, self.counts,
+                                                 Nsection = 7, model = self.model)
+        self.assertEqual((sections[0][0], sections[-1][1]), (V1, V2))
+        self.assertTrue(all(a[1] == b[0] for a, b in zip(sections[:-1], sections[1:])))
+        for v1, _ in sections:
+            # the same window in TAPE5 and IN_RADSUM, on RADSUM\'s output grid
+            self.assertEqual(float('{:10.4f}'.format(v1)), float('{:10.2f}'.format(v1)))
+            self.assertEqual((v1 - V1) % section_planner.RESOLUTION, 0.)
+
+    def test_report_and_calibrate(self):
+        sections = [(0., 150.), (150., 1000.), (1000., 2000.), (2000., 3000.)]
+        model = section_planner.CostModel(overhead = 2., per_line = 3e-4,
+                                          per_wavenumber = 5e-3)
+        measured = dict(zip(sections,
+                            section_planner.predict_costs(sections, self.edges,
+                                                          self.counts, model = model)))
+        fitted = section_planner.calibrate(sections, self.edges, self.counts, measured)
+        np.testing.assert_allclose(fitted, model, rtol = 1e-6)
+
+        del measured[sections[0]]
+        report = section_planner.cost_report(
+            sections,
+            section_planner.predict_costs(sections, self.edges, self.counts,
+                                          model = fitted),
+            measured)
+        self.assertTrue(np.isnan(report['measured'][0]))
+        np.testing.assert_allclose(report['ratio'][1:], 1.)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
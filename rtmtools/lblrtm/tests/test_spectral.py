@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import spectral
+
+
+
+def write_fortran_records(saveas, records):
+    '''
+    Writes RECORDS (numpy arrays) as an unformatted sequential
+    Fortran file with little-endian 4-byte record markers
+    '''
+    with open(saveas, mode = 'wb') as file:
+        for record in records:
+            marker = np.array([record.nbytes], dtype = '<i4').tobytes()
+            file.write(marker + record.tobytes() + marker)
+
+
+
+class spectral_panels(unittest.TestCase):
+
+    panels = ((10., 10.5, np.arange(6, dtype = '<f8')),
+              (10.6, 11.1, np.arange(6, 12, dtype = '<f8')),
+              (11.2, 11.5, np.arange(12, 16, dtype = '<f8')))
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.readfrom = os.path.join(self.tmpdir.name, 'TAPE13')
+        records = [np.zeros(20, dtype = '<f8')]
+        for V1, V2, values in self.panels:
+            records.append(np.array([V1, V2, .1, 0.], dtype = '<f8'))
+            records.append(values)
+        write_fortran_records(self.readfrom, records)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_index_fortran_records(self):
+        offsets, lengths = spectral.index_fortran_records(self.readfrom)
+        np.testing.assert_array_equal(lengths, [160, 32, 48, 32, 48, 32, 32])
+        self.assertEqual(offsets[1], 4 + 160 + 4 + 4)
+
+    def test_iter_spectral_panels(self):
+        for mmap in (False, True):
+            panels = list(spectral.iter_spectral_panels(self.readfrom, mmap = mmap))
+            self.assertEqual(len(panels), 3)
+            for (wavenumbers, values), (V1, V2, ans) in zip(panels, self.panels):
+                np.testing.assert_array_almost_equal(
+                    wavenumbers, np.linspace(V1, V2, ans.shape[0]))
+                np.testing.assert_array_equal(values, ans)
+
+    def test_single_precision(self):
+        '''
+        Data records in REAL*4, with the panel headers\' V1 and V2
+        still in REAL*8, then DV in REAL*4 and NLIM
+        '''
+        records = [np.zeros(20, dtype = '<f4')]
+        for V1, V2, values in self.panels:
+            header = (np.array([V1, V2], dtype = '<f8').tobytes()
+                      + np.array([.1], dtype = '<f4').tobytes()
+                      + np.array([values.shape[0]], dtype = '<i4').tobytes())
+            records.append(np.frombuffer(header, dtype = np.uint8))
+            records.append(values.astype('<f4'))
+        write_fortran_records(self.readfrom, records)
+
+        index = spectral.index_spectral_panels(self.readfrom, dtype = 'f4')
+        np.testing.assert_array_equal(index['V1'], [10., 10.6, 11.2])
+        np.testing.assert_array_equal(index['V2'], [10.5, 11.1, 11.5])
+        np.testing.assert_array_equal(index['npoints'], [6, 6, 4])
+        for (_, values), (_, _, ans) in zip(
+                spectral.iter_spectral_panels(self.readfrom, dtype = 'f4'), self.panels):
+            np.testing.assert_array_equal(values, ans)
+        wavenumbers, values = spectral.read_spectral_window(
+            self.readfrom, V1 = 10.35, V2 = 10.85, dtype = 'f4')
+        np.testing.assert_array_almost_equal(wavenumbers,
+                                             [10.4, 10.5, 10.6, 10.7, 10.8])
+        np.testing.assert_array_equal(values, [4, 5, 6, 7, 8])
+
+    def test_read_spectral_window(self):
+        index = spectral.index_spectral_panels(self.readfrom)
+        wavenumbers, values = spectral.read_spectral_window(
+            self.readfrom, V1 = 10.35, V2 = 10.85, index = index)
+        np.testing.assert_array_almost_equal(wavenumbers,
+                                             [10.4, 10.5, 10.6, 10.7, 10.8])
+        np.testing.assert_array_equal(values, [4, 5, 6, 7, 8])
+
+        wavenumbers, values = spectral.read_spectral_window(
+            self.readfrom, V1 = 20., V2 = 30., index = index)
+        self.assertEqual(values.shape, (0,))
+
+
+
+
+class integrate_bands(unittest.TestCase):
+
+    def panels(self):
+        '''
+        Values equal to wavenumber, from 0 to 100 cm-1 at 0.5 cm-1
+        spacing, in panels of 11 points
+        '''
+        wavenumbers = np.arange(0, 100.5, .5)
+        return ((wavenumbers[k: k + 11], wavenumbers[k: k + 11])
+                for k in range(0, wavenumbers.shape[0], 11))
+
+    def test_contiguous_bands(self):
+        ids, integrals = spectral.integrate_bands(self.panels(),
+                                                  [(0, 10), (10, 50), (50, 100)])
+        self.assertEqual(ids, [(0, 10), (10, 50), (50, 100)])
+        np.testing.assert_array_almost_equal(integrals, [50., 1200., 3750.])
+
+    def test_multirange_overlapping_bands(self):
+        wbands = {1: [(0, 10), (50, 100)],
+                  2: [(5, 60)],
+                  3: [(200, 300)]}
+        ids, integrals = spectral.integrate_bands(self.panels(), wbands)
+        self.assertEqual(ids, [1, 2, 3])
+        np.testing.assert_array_almost_equal(integrals, [3800., 1787.5, 0.])
+
+    def test_2d_values(self):
+        panels = ((wavenumbers, np.stack([values, 2 * values]))
+                  for wavenumbers, values in self.panels())
+        ids, integrals = spectral.integrate_bands(panels, [(0, 100)])
+        np.testing.assert_array_almost_equal(integrals, [[5000., 10000.]])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
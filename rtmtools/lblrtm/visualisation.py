@@ -9,6 +9,7 @@ import pandas as pd
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
+import rtmtools.lblrtm.comparison as comparison
 
 
 
@@ -80,7 +81,8 @@ def tabulate_difference(dfs, names=None, title=None,
                         return_original=True):
     '''
     For a list of dataframes, calculate the difference
-    between all possible pairs.
+    between all possible pairs.  (see comparison.pairwise_statistics()
+    for summary statistics of the differences without tabulating them)
 
     Parameters
     ----------
@@ -91,22 +93,16 @@ def tabulate_difference(dfs, names=None, title=None,
             and maybe the original dataframes too if `return_original`
             is True
     '''
-    df_pairs = itertools.combinations(zip(names, dfs), 2)
-
-    results = [('{} - {}'.format(name1, name2),
-                df1 - df2)
-               for (name1, df1), (name2, df2) in df_pairs]
-
-    names_diff, dfs_diff = zip(*results)
+    runs = comparison.stack_runs(dfs, names=names)
+    results = (('{} - {}'.format(name1, name2), df_diff)
+               for name1, name2, df_diff
+               in comparison.iter_pairwise_differences(runs))
 
     if return_original:
-        names_all = names + list(names_diff)
-        dfs_all = dfs + list(dfs_diff)
-    else:
-        names_all = names_diff
-        dfs_all = dfs_diff
-        
-    df_all = pd.concat(dfs_all, keys=names_all)
+        results = itertools.chain(zip(runs.names, dfs), results)
+
+    names_all, dfs_all = zip(*results)
+    df_all = pd.concat(dfs_all, keys=list(names_all))
     return df_all
         
 
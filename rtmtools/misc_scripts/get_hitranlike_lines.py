@@ -1,19 +1,21 @@
+import rtmtools.lblrtm.lines as lines
 
 
-path_line = '01_H2O'
-path_hitranlike = '01_H2O_hitranlike'
-
-with open(path_line, mode = 'r', encoding = 'utf-8') as file:
-    c = file.read()
+'''
+The lines kept are those for which lines.is_line_record() is True.
+This differs from the test this script used before,
+line[2] not in [' ', '-'], in that records with a blank molecule
+number (e.g. \'  1- ...\') are now left out, as are any records
+shorter than 25 characters.
+'''
 
 
-lines = [line for line in c.split('%%%%%%%%')[-1].split('\n') \
-         if line and line[2] not in [' ', '-']]
+path_line = '01_H2O'
+path_hitranlike = '01_H2O_hitranlike'
 
-print('number of hitran-like lines:', len(lines))
+Nline = lines.extract_lines(path_line, saveas = path_hitranlike)
 
-with open(path_hitranlike, mode = 'w', encoding = 'utf-8') as file:
-    file.write('\n'.join(lines))
+print('number of hitran-like lines:', Nline)
 
 
 
@@ -0,0 +1,164 @@
+'''
+On-disk store of the results of LBLRTM, RRTMG and CLIRAD, so that they
+do not have to be parsed from their ASCII output again.
+
+The store is a Zarr directory with one group for each model
+(see LOADERS).  In a group, every variable has dimensions
+(case, band, ...), with one case for each output file appended to it,
+and is compressed and chunked along all of them (see CHUNKS), so that
+reading a few bands or levels only reads the chunks that contain them.
+Reading is lazy: nothing is read until the values are needed.
+
+Typical use:
+
+    store = ResultStore('results.zarr')
+    for path in paths_OUTPUT_RRTM:
+        store.append_output('rrtmg_lw', path)
+    ds = store.open('rrtmg_lw', bands = [1, 2], levels = [0])
+'''
+import os
+import xarray as xr
+import rtmtools.lblrtm.aerutils as aerutils
+import rtmtools.rrtmg.lw.wrangle as rrtmg_lw_wrangle
+import rtmtools.rrtmg.sw.wrangle as rrtmg_sw_wrangle
+import rtmtools.clirad.sw.wrangle as clirad_sw_wrangle
+
+
+
+# chunk size along each dimension; dimensions not listed are not split
+CHUNKS = {'case': 32, 'band': 1}
+
+
+
+def clirad_sw_Dataset(readfrom = 'OUTPUT_CLIRAD.dat', **kwargs):
+    '''
+    Reads CLIRAD-SW\'s output (see clirad.sw.wrangle.load_OUTPUT_CLIRAD())
+    into a Dataset of dimensions (band, level) and (band, layer), with
+    the pressures as variables, since they are not the same for every
+    case.
+    '''
+    ds = clirad_sw_wrangle.load_OUTPUT_CLIRAD(readfrom = readfrom, **kwargs)
+    ds = ds.reset_index(['level_pressure', 'layer_pressure'])
+    ds = ds.rename({'spectral_band': 'band'})
+    ds = ds.rename_dims({'level_pressure': 'level', 'layer_pressure': 'layer'})
+    return ds.reset_coords(['level_pressure', 'layer_pressure'])
+
+
+
+# functions reading the output of each model into a Dataset with a
+# band dimension
+LOADERS = {'lblrtm': aerutils.load_OUTPUT_RADSUM,
+           'rrtmg_lw': rrtmg_lw_wrangle.load_OUTPUT_RRTM,
+           'rrtmg_sw': rrtmg_sw_wrangle.load_OUTPUT_RRTM,
+           'clirad_sw': clirad_sw_Dataset}
+
+
+
+class ResultStore(object):
+    '''
+    Zarr store of model results, with one group for each model.
+    INPUT:
+    path --- path of the Zarr directory
+    chunks --- dictionary of {dimension: chunk size}, used when
+               a group is created (default = CHUNKS)
+    '''
+    def __init__(self, path = 'results.zarr', chunks = None):
+        self.path = path
+        self.chunks = CHUNKS if chunks is None else chunks
+
+    def models(self):
+        '''
+        Returns the names of the groups in the store
+        '''
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name for name in os.listdir(self.path)
+                      if os.path.isdir(os.path.join(self.path, name)))
+
+    def encoding(self, ds):
+        '''
+        Returns the encoding that chunks the variables of DS
+        '''
+        return {name: {'chunks': tuple(self.chunks.get(dim, size)
+                                       for dim, size in zip(da.dims, da.shape))}
+                for name, da in ds.data_vars.items()}
+
+    def append(self, model, ds, case = None, if_exists = 'raise'):
+        '''
+        Appends the results in DS to MODEL\'s group, creating the
+        group if it is not there yet.
+        INPUT:
+        model --- name of the group, e.g. \'rrtmg_lw\'
+        ds --- Dataset of one case, or of several along a case
+               dimension.  The other dimensions must be the same as
+               those of the cases already in the group.
+        case --- label of the case if DS is of one case
+        if_exists --- what to do with cases whose label is already in
+                      the group: \'raise\' a ValueError, or \'skip\'
+                      them and append only the others
+        '''
+        if if_exists not in ('raise', 'skip'):
+            raise ValueError('if_exists must be \'raise\' or \'skip\', '
+                             'not {!r}'.format(if_exists))
+        if 'case' not in ds.dims:
+            ds = ds.expand_dims(case = [case])
+        ds = ds.transpose('case', ...)
+
+        labels = list(ds['case'].values)
+        if len(set(labels)) != len(labels):
+            raise ValueError('The cases to append have repeated labels')
+        if model in self.models():
+            existing = set(self.cases(model))
+            repeated = [label for label in labels if label in existing]
+            if repeated and if_exists == 'raise':
+                raise ValueError('{} already has cases {}'.format(model, repeated))
+            if repeated:
+                ds = ds.isel(case = [k for k, label in enumerate(labels)
+                                     if label not in existing])
+                if not ds.sizes['case']:
+                    return
+        if ds['case'].dtype.kind == 'U':
+            # as variable-length strings, whatever their length
+            ds = ds.assign_coords(case = ds['case'].values.astype(object))
+
+        if model in self.models():
+            ds.to_zarr(self.path, group = model, mode = 'a', append_dim = 'case',
+                       consolidated = False)
+        else:
+            ds.to_zarr(self.path, group = model, mode = 'w',
+                       encoding = self.encoding(ds), consolidated = False)
+
+    def append_output(self, model, readfrom, case = None, if_exists = 'raise',
+                      **kwargs):
+        '''
+        Reads the output file READFROM of MODEL with MODEL\'s loader in
+        LOADERS, and appends it to MODEL\'s group as CASE, by default
+        the real path of READFROM.  KWARGS are passed to the loader.
+        (see append() for IF_EXISTS)
+        '''
+        ds = LOADERS[model](readfrom = readfrom, **kwargs)
+        self.append(model, ds,
+                    case = os.path.realpath(readfrom) if case is None else case,
+                    if_exists = if_exists)
+
+    def open(self, model, cases = None, bands = None, levels = None):
+        '''
+        Returns MODEL\'s results as a lazily loaded Dataset.
+        INPUT:
+        cases, bands, levels --- positions along the case, band and
+                                 level dimensions to select,
+                                 None for all of them
+        '''
+        ds = xr.open_zarr(self.path, group = model, chunks = None,
+                          consolidated = False)
+        selection = {dim: indices
+                     for dim, indices in (('case', cases), ('band', bands),
+                                          ('level', levels))
+                     if indices is not None and dim in ds.dims}
+        return ds.isel(selection)
+
+    def cases(self, model):
+        '''
+        Returns the labels of the cases in MODEL\'s group
+        '''
+        return self.open(model)['case'].values
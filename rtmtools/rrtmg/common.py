@@ -0,0 +1,371 @@
+'''
+Pieces shared by RRTMG-LW and RRTMG-SW (rrtmg.lw and rrtmg.sw).
+'''
+import os
+import collections
+import functools
+import itertools
+import concurrent.futures
+import numpy as np
+import pandas as pd
+import xarray as xr
+import rtmtools.fortran_records as fortran_records
+import rtmtools.lblrtm.atmosphere_profile as atmosphere_profile
+import rtmtools.lblrtm.create_LBLRTM_input as lblrtmin
+
+
+
+def spectral_bands(ds):
+    '''
+    Returns a boolean array along ds\'s band dimension that is False for
+    bands, such as the total over all wave numbers, that span other
+    bands in DS.
+    '''
+    V1s, V2s = ds['V1'].values, ds['V2'].values
+    spans = ((V1s[:, None] <= V1s[None, :]) & (V2s[:, None] >= V2s[None, :])
+             & ((V1s[:, None] != V1s[None, :]) | (V2s[:, None] != V2s[None, :])))
+    return ~ spans.any(axis = 1)
+
+
+
+def variable_names(names, cooling_rate = False):
+    '''
+    Returns the names NAMES of the quantities in an OUTPUT_RRTM, the
+    last one being the rate, named as a cooling or heating rate
+    '''
+    return (tuple(names[: -1])
+            + ('cooling_rate' if cooling_rate else 'heating_rate',))
+
+
+
+def OUTPUT_RRTM_paths(rundir = '.', name = 'OUTPUT_RRTM'):
+    '''
+    Returns the sorted paths of all the files called NAME in RUNDIR
+    and its sub-directories
+    '''
+    return sorted(os.path.join(dirpath, name)
+                  for dirpath, _, filenames in os.walk(rundir)
+                  if name in filenames)
+
+
+
+@functools.lru_cache(maxsize = 32)
+def _OUTPUT_RRTM_to_ndarray(band_limits, names, realpath, mtime_ns, size,
+                            cooling_rate = False, signed_fluxes = False):
+    '''
+    Parses OUTPUT_RRTM at REALPATH, as it was when last modified
+    at MTIME_NS with SIZE bytes, into read-only arrays.  MTIME_NS and
+    SIZE are only there to key the cache.
+    (see OUTPUT_RRTM_to_ndarray())
+    '''
+    with open(realpath, mode = 'r', encoding = 'utf-8') as file:
+        c = file.read()
+
+    V1V2s = collections.deque([])
+    datatexts = collections.deque([])
+    for bandstr in c.split('\x0c')[1: -1]:
+        if not bandstr or bandstr.isspace():
+            continue
+        line_band, _, _, datatext = bandstr.strip().split('\n', maxsplit = 3)
+        V1V2s.append(band_limits(line_band))
+        datatexts.append(datatext)
+    V1s, V2s = np.array(V1V2s, dtype = np.float64).reshape(-1, 2).T
+
+    data = np.fromstring('\n'.join(datatexts), dtype = np.float64, sep = ' ')
+
+    Nband, Ncolumn = len(V1s), 1 + len(names)
+    if data.size % (Nband * Ncolumn):
+        raise ValueError('{} does not contain the same number of levels '
+                         'in every wavenumber band'.format(realpath))
+    data = data.reshape(Nband, -1, Ncolumn)
+    levels, data = data[0, :, 0].astype(int), np.ascontiguousarray(data[:, :, 1:])
+
+    if cooling_rate:
+        data[:, :, -1] *= -1
+
+    if signed_fluxes:
+        up, down, net = (names.index(name)
+                         for name in ('flux_up', 'flux_down', 'net_flux'))
+        data[:, :, up] *= -1
+        data[:, :, net] = data[:, :, up] + data[:, :, down]
+
+    for array in (V1s, V2s, levels, data):
+        array.flags.writeable = False
+    return V1s, V2s, levels, data
+
+
+
+def OUTPUT_RRTM_to_ndarray(band_limits, names, readfrom = '',
+                           cooling_rate = False, signed_fluxes = False):
+    '''
+    Reads an OUTPUT_RRTM in a single pass.  The file is parsed again
+    only if it has changed since it was last read; otherwise the arrays
+    from the last read are returned.
+    INPUT:
+    band_limits --- the model\'s parser of the first line of a band,
+                    returning its lower and upper wavenumbers
+                    (e.g. rrtmg.lw.wrangle.band_limits())
+    names --- tuple of the names of the quantities in each band,
+              the last one being the rate, with at least flux_up,
+              flux_down and net_flux
+    readfrom --- path to OUTPUT_RRTM
+    cooling_rate --- if True, the rates are cooling rates
+    signed_fluxes --- if True, upward fluxes are negative, and net
+                      flux is the sum of upward and downward fluxes
+    OUTPUT:
+    V1s, V2s --- lower and upper wavenumbers of the bands [cm-1]
+    levels --- level indices, in the order in the file
+    data --- read-only array of shape (band, level, len(names)), with
+             the quantities in NAMES along the last axis
+    '''
+    realpath = os.path.realpath(readfrom)
+    stat = os.stat(realpath)
+    return _OUTPUT_RRTM_to_ndarray(band_limits, tuple(names), realpath,
+                                   stat.st_mtime_ns, stat.st_size,
+                                   cooling_rate = cooling_rate,
+                                   signed_fluxes = signed_fluxes)
+
+
+
+def stack_OUTPUT_RRTMs(OUTPUT_RRTM_to_ndarray, names, readfroms = '.',
+                       cooling_rate = False, signed_fluxes = False):
+    '''
+    Reads many OUTPUT_RRTM files into one xarray Dataset of dimensions
+    (case, band, level), backed by a single array.
+    INPUT:
+    OUTPUT_RRTM_to_ndarray --- the model\'s reader of one OUTPUT_RRTM
+                               (e.g. rrtmg.lw.wrangle.OUTPUT_RRTM_to_ndarray())
+    names --- names of the quantities along the last axis of the data
+              it returns, the last one being the rate
+    readfroms --- list of paths to OUTPUT_RRTM files, or a run
+                  directory, in which case all the OUTPUT_RRTM files
+                  in it and its sub-directories are read
+                  (see OUTPUT_RRTM_paths())
+    OUTPUT:
+    ds --- Dataset with the path of each file as coordinate
+           along case.
+    Raises ValueError if there are no files, or if the files do not
+    all have the same bands and levels.
+    '''
+    if isinstance(readfroms, str):
+        readfroms = OUTPUT_RRTM_paths(readfroms)
+    if not len(readfroms):
+        raise ValueError('No OUTPUT_RRTM files to read')
+
+    V1s, V2s, levels, _ = OUTPUT_RRTM_to_ndarray(readfroms[0])
+    data = np.empty((len(readfroms), len(V1s), len(levels), len(names)),
+                    dtype = np.float64)
+    for k, readfrom in enumerate(readfroms):
+        V1s_k, V2s_k, levels_k, data_k = OUTPUT_RRTM_to_ndarray(
+            readfrom = readfrom,
+            cooling_rate = cooling_rate,
+            signed_fluxes = signed_fluxes)
+        if not (np.array_equal(V1s_k, V1s) and np.array_equal(V2s_k, V2s)
+                and np.array_equal(levels_k, levels)):
+            raise ValueError('{} does not have the same bands and levels '
+                             'as {}'.format(readfrom, readfroms[0]))
+        data[k] = data_k
+
+    return xr.Dataset(
+        {name: (['case', 'band', 'level'], data[:, :, :, k])
+         for k, name in enumerate(variable_names(names, cooling_rate))},
+        coords = {'case': list(readfroms),
+                  'V1': ('band', V1s), 'V2': ('band', V2s),
+                  'level': levels})
+
+
+
+'''
+INPUT_RRTM records and atmosphere profiles
+'''
+
+
+def read_atmpro_store(PATH_atmpro = None):
+    '''
+    Returns the atmosphere profile stored under \'atmpro\' in the HDF5
+    store PATH_atmpro, as an AtmosphereProfile
+    '''
+    with pd.HDFStore(PATH_atmpro, mode = 'r') as store:
+        return atmosphere_profile.as_AtmosphereProfile(store['atmpro'])
+
+
+
+def split_record_3_3_B(text):
+    '''
+    Splits TEXT, layer boundaries of 10 characters each, into records
+    3.3B of 8 boundaries, the unused fields of the last record being
+    8 blanks each
+    '''
+    Nrow = 8
+    text += (- (len(text) // 10) % Nrow) * 8 * ' '
+    return '\n'.join(text[k: k + 10 * Nrow]
+                     for k in range(0, len(text), 10 * Nrow))
+
+
+
+def record_3_3_B_block(IBMAX = None,
+                       levels = None):
+    '''
+    Records 3.3B for the first abs(IBMAX) levels of LEVELS, an array
+    of (level, variable) as AtmosphereProfile.data, surface first.
+    Their pressures are written if IBMAX < 0, their altitudes if
+    IBMAX > 0 (see split_record_3_3_B()).
+    '''
+    if IBMAX < 0:
+        totdata = levels[: abs(IBMAX), 1]
+    elif IBMAX > 0:
+        totdata = levels[: abs(IBMAX), 0]
+    else:
+        raise ValueError('record_3_3_B is not applicable for IMBAX = 0')
+    return split_record_3_3_B(
+        (len(totdata) * '{:>10.3f}').format(*totdata.tolist()))
+
+
+
+def record_3_5_notes(NMOL = None,
+                     ZM = None,
+                     PM = None,
+                     TM = None,
+                     JCHARP = None,
+                     JCHART = None,
+                     JCHAR = None):
+    return tuple([
+        (10, '{:>10.3e}', ZM),
+        (10, '{:>10.3e}', PM),
+        (10, '{:>10.3e}', TM),
+        (5, None, None),
+        (1, '{:s}', JCHARP),
+        (1, '{:s}', JCHART),
+        (3, None, None)] + \
+                 [(1, '{:s}', jch) for jch in JCHAR or NMOL * [None]])
+
+
+
+def record_3_6_notes(NMOL = None,
+                     VMOL = None):
+    '''
+    VMOL --- (NMOL,) values for one record, or (nlevel, NMOL)
+             values for one record per level
+    '''
+    VMOL = np.asarray(VMOL)
+    if VMOL.shape and VMOL.shape[-1] != NMOL:
+        raise ValueError('NMOL = {}. \
+        VMOL must have {} values'.format(NMOL, NMOL))
+    return tuple((10, '{:>10.3e}', value) for value in np.moveaxis(VMOL, -1, 0))
+
+
+
+def record_3_5_to_3_6_block(NMOL = None,
+                            levels = None):
+    '''
+    Records 3.5 and 3.6 for every level of LEVELS, an array of
+    (level, variable) as AtmosphereProfile.data, written with one
+    call to fortran_records.format_records()
+    '''
+    return fortran_records.format_records(
+        record_3_5_notes(ZM = levels[:, 0],
+                         PM = levels[:, 1],
+                         TM = levels[:, 2],
+                         JCHARP = 'A',
+                         JCHART = 'A',
+                         JCHAR = NMOL * ['A']),
+        record_3_6_notes(NMOL = NMOL,
+                         VMOL = levels[:, 3:]))
+
+
+
+'''
+INPUT_RRTM for many atmosphere columns at once
+'''
+
+
+def profiles_to_ndarray(atmpros):
+    '''
+    Returns atmosphere profiles as a (column, level, variable) array,
+    with the surface first.
+    INPUT:
+    atmpros --- AtmosphereProfile, path to an HDF5 store with the
+                profile under \'atmpro\' (see read_atmpro_store()),
+                or anything accepted by
+                create_LBLRTM_input.profiles_to_ndarray()
+    '''
+    if isinstance(atmpros, (str, bytes, os.PathLike)):
+        atmpros = read_atmpro_store(atmpros)
+    if isinstance(atmpros, atmosphere_profile.AtmosphereProfile):
+        atmpros = atmpros.data
+    return lblrtmin.profiles_to_ndarray(atmpros)
+
+
+
+def check_columns(atmpros):
+    '''
+    Raises ValueError if any column of ATMPROS, a (column, level, variable)
+    array, has no level with a pressure, as there would be nothing to
+    write for it
+    '''
+    empty = np.flatnonzero(np.isnan(atmpros[:, :, 1]).all(axis = 1))
+    if len(empty):
+        raise ValueError('Columns {} have no levels with a pressure'
+                         .format(empty.tolist()))
+
+
+
+def _write_INPUT_RRTMs(INPUT_RRTMs, paths, atmpros, columns, records):
+    '''
+    Writes INPUT_RRTM for each of ATMPROS to PATHS, in a worker
+    of write_INPUT_RRTMs()
+    '''
+    for path, text in zip(paths, INPUT_RRTMs(atmpros, **columns, **records)):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok = True)
+        with open(path, mode = 'w', encoding = 'utf-8') as file:
+            file.write(text)
+    return len(paths)
+
+
+
+def write_INPUT_RRTMs(INPUT_RRTMs, atmpros, savein = 'INPUT_RRTMs',
+                      name = 'INPUT_RRTM', Nworkers = 1, Ncolumn_chunk = 256,
+                      columns = None, **records):
+    '''
+    Writes INPUT_RRTM for each column of a batch of atmosphere profiles,
+    each in its own directory under SAVEIN named after the column\'s
+    index, and returns their paths.
+    INPUT:
+    INPUT_RRTMs --- the model\'s generator of INPUT_RRTM for many
+                    columns (e.g. rrtmg.lw.input.INPUT_RRTMs())
+    atmpros --- atmosphere profiles (see profiles_to_ndarray())
+    name --- name of each INPUT_RRTM file
+    Nworkers --- number of processes writing at the same time
+    Ncolumn_chunk --- number of columns given to a process at a time
+    columns --- dictionary of the arguments of INPUT_RRTMs that can
+                have a value per column, along their first axis.
+                Those that are not None are broadcast to one value
+                per column and split with the columns.
+    records --- the other arguments of INPUT_RRTMs, the same for
+                all columns
+    Raises ValueError before anything is written if a column has no
+    levels (see check_columns()).
+    '''
+    atmpros = profiles_to_ndarray(atmpros)
+    check_columns(atmpros)
+    Ncolumn = atmpros.shape[0]
+    width = len(str(Ncolumn - 1))
+    paths = [os.path.join(savein, '{:0{}d}'.format(k, width), name)
+             for k in range(Ncolumn)]
+    columns = {key: np.broadcast_to(np.asarray(value),
+                                    (Ncolumn,) + np.shape(value)[1:])
+               for key, value in (columns or {}).items() if value is not None}
+
+    chunks = [slice(k, k + Ncolumn_chunk) for k in range(0, Ncolumn, Ncolumn_chunk)]
+    args = (itertools.repeat(INPUT_RRTMs),
+            [paths[chunk] for chunk in chunks],
+            [atmpros[chunk] for chunk in chunks],
+            [{key: value[chunk] for key, value in columns.items()}
+             for chunk in chunks],
+            itertools.repeat(records))
+    if Nworkers == 1:
+        list(map(_write_INPUT_RRTMs, *args))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers = Nworkers) as executor:
+            list(executor.map(_write_INPUT_RRTMs, *args))
+    return paths
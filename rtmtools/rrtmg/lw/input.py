@@ -1,7 +1,8 @@
 import os
-import itertools
-import collections
-import pandas as pd
+import numpy as np
+import rtmtools.fortran_records as fortran_records
+import rtmtools.lblrtm.atmosphere_profile as atmosphere_profile
+import rtmtools.rrtmg.common as common
 
 
 
@@ -251,26 +252,17 @@ def record_3_3_A(AVTRAT = None,
 
 
 def record_3_3_B(IBMAX = None,
-                 PATH_atmpro = None):
-    Nrow, fmtspec = 8, '{:>10.3f}'
-    with pd.get_store(PATH_atmpro) as store:
-        atmpro = store['atmpro']
-    if IBMAX < 0:
-        name = 'pressure'
-    elif IBMAX > 0:
-        name = 'altitude'
-    else:
-        raise ValueError('record_3_3_B is not applicable for IMBAX = 0')
-    totdata = atmpro[name][::-1][: abs(IBMAX)]
-    notes_rows = (
-        ((Nrow, fmtspec, value) for value in row) \
-        for row in itertools.zip_longest(*(Nrow * [iter(totdata)]))
-        )
-    records_rows = (''.join(length * ' ' if value == None\
-                   else fmtspec.format(value)\
-                   for length, fmtspec, value in notes) \
-                   for notes in notes_rows)
-    return '\n'.join(records_rows)
+                 PATH_atmpro = None,
+                 atmpro = None):
+    '''
+    Records 3.3B for the atmosphere profile ATMPRO
+    (see atmosphere_profile.as_AtmosphereProfile()), or, if ATMPRO is not
+    given, for the one stored in PATH_atmpro.
+    '''
+    if atmpro is None:
+        atmpro = common.read_atmpro_store(PATH_atmpro)
+    atmpro = atmosphere_profile.as_AtmosphereProfile(atmpro)
+    return common.record_3_3_B_block(IBMAX = IBMAX, levels = atmpro.data)
 
 
 def record_3_4(IMMAX = None,
@@ -291,52 +283,31 @@ def record_3_5(NMOL = None,
                JCHARP = None,
                JCHART = None,
                JCHAR = None):
-    notes = tuple([
-        (10, '{:>10.3e}', ZM),
-        (10, '{:>10.3e}', PM),
-        (10, '{:>10.3e}', TM),
-        (5, None, None),
-        (1, '{:s}', JCHARP),
-        (1, '{:s}', JCHART),
-        (3, None, None)] + \
-                  [(1, '{:s}', jch) for jch in JCHAR or NMOL * [None]])
-    return ''.join(length * ' ' if value == None\
-                   else fmtspec.format(value)\
-                   for length, fmtspec, value in notes)
+    return fortran_records.format_records(
+        common.record_3_5_notes(NMOL = NMOL, ZM = ZM, PM = PM, TM = TM,
+                         JCHARP = JCHARP, JCHART = JCHART, JCHAR = JCHAR))
 
 
 def record_3_6(NMOL = None,
                VMOL = None):
-    if VMOL.shape and len(VMOL) != NMOL:
-        raise InputError('NMOL = {}. \
-        VMOL must have {} values'.format(NMOL, NMOL))
-    notes = tuple((10, '{:>10.3e}', value) for value in VMOL)
-    return ''.join(length * ' ' if value == None\
-                   else fmtspec.format(value)\
-                   for length, fmtspec, value in notes)
+    return fortran_records.format_records(
+        common.record_3_6_notes(NMOL = NMOL, VMOL = VMOL))
+
 
-        
 def record_3_5_to_3_6s(NMOL = None,
                        IMMAX = None,
-                       PATH_atmpro = None):
-    with pd.get_store(PATH_atmpro) as store:
-        atmpro = store['atmpro'].sort_index(ascending = True)
-
-    lines = collections.deque([])
-    for indx in atmpro.index[: abs(IMMAX)]:
-        lines.append(
-            record_3_5(ZM = atmpro.loc[indx, 'altitude'],
-                       PM = atmpro.loc[indx, 'pressure'],
-                       TM = atmpro.loc[indx, 'temperature'],
-                       JCHARP = 'A',
-                       JCHART = 'A',
-                       JCHAR = NMOL * ['A'])
-            )
-        lines.append(
-            record_3_6(NMOL = NMOL,
-                       VMOL = atmpro.ix[indx, 3:])
-            )
-    return '\n'.join(lines)
+                       PATH_atmpro = None,
+                       atmpro = None):
+    '''
+    Records 3.5 and 3.6 for the first abs(IMMAX) levels of the atmosphere
+    profile ATMPRO (see atmosphere_profile.as_AtmosphereProfile()), or,
+    if ATMPRO is not given, of the one stored in PATH_atmpro.
+    '''
+    if atmpro is None:
+        atmpro = common.read_atmpro_store(PATH_atmpro)
+    atmpro = atmosphere_profile.as_AtmosphereProfile(atmpro)
+    return common.record_3_5_to_3_6_block(NMOL = NMOL,
+                                   levels = atmpro.data[: abs(IMMAX)])
 
 
 def record_3_7(IXMOLS = None,
@@ -357,3 +328,120 @@ def record_3_8_1_to_3_8_Ns(IXMOL = None,
     pass
 
 
+
+'''
+INPUT_RRTM for many atmosphere columns at once
+'''
+
+
+def INPUT_RRTM_text(levels,
+                    CXID = '',
+                    IAER = 0, IXSECT = 0, NUMANGS = 0, IOUT = 0,
+                    IDRV = 0, IMCA = 0, ICLD = 0,
+                    TBOUND = -1., IEMIS = 0, IREFLECT = 0, SEMISS = None,
+                    IBMAX = None, NOPRNT = 0, NMOL = 7, IPUNCH = 0,
+                    MUNITS = 0, RE = None, CO2MX = None,
+                    HBOUND = None, HTOA = None, HMOD = '',
+                    header = None):
+    '''
+    Returns INPUT_RRTM for RRTMG-LW, with RRTATM (IATM = 1) and a
+    user-supplied profile (MODEL = 0), for one atmosphere column.
+    INPUT:
+    levels --- (level, variable) array as AtmosphereProfile.data,
+               surface first
+    IBMAX --- number of layer boundaries in record 3.3B, negative for
+              pressure boundaries (default = - number of levels)
+    header --- records 1.1 and 1.2, if already written, e.g. when
+               writing many columns
+    (see rtmtools/rrtmg/scripts/rrtmg_lw.py for the other arguments.
+     HBOUND and HTOA default to the first and last level's pressure
+     if IBMAX < 0, or altitude if IBMAX > 0, like the boundaries in
+     record 3.3B.)
+    '''
+    Nlevel = levels.shape[0]
+    IBMAX = - Nlevel if IBMAX is None else IBMAX
+    boundaries = levels[:, 1 if IBMAX < 0 else 0]
+    if header is None:
+        header = '\n'.join([record_1_1(CXID),
+                            record_1_2(IAER = IAER, IATM = 1, IXSECT = IXSECT,
+                                       NUMANGS = NUMANGS, IOUT = IOUT, IDRV = IDRV,
+                                       IMCA = IMCA, ICLD = ICLD)])
+    content = [header,
+               record_1_4(TBOUND = TBOUND, IEMIS = IEMIS,
+                          IREFLECT = IREFLECT, SEMISS = SEMISS),
+               record_3_1(MODEL = 0, IBMAX = IBMAX, NOPRNT = NOPRNT, NMOL = NMOL,
+                          IPUNCH = IPUNCH, MUNITS = MUNITS, RE = RE, CO2MX = CO2MX),
+               record_3_2(HBOUND = boundaries[0] if HBOUND is None else HBOUND,
+                          HTOA = boundaries[-1] if HTOA is None else HTOA),
+               common.record_3_3_B_block(IBMAX = IBMAX, levels = levels),
+               record_3_4(IMMAX = Nlevel, HMOD = HMOD),
+               common.record_3_5_to_3_6_block(NMOL = NMOL, levels = levels)]
+    return '\n'.join(content)
+
+
+def INPUT_RRTMs(atmpros, TBOUND = -1., **records):
+    '''
+    Yields INPUT_RRTM for each column of a batch of atmosphere profiles.
+    Levels whose pressure is NaN are left out, so columns can have
+    different numbers of levels.  Raises ValueError if a column has
+    no levels left (see common.check_columns()).
+    INPUT:
+    atmpros --- atmosphere profiles (see common.profiles_to_ndarray())
+    TBOUND --- surface temperature [K], one value for all columns or
+               one value per column
+    records --- the other arguments of INPUT_RRTM_text(), the same
+                for all columns
+    '''
+    atmpros = common.profiles_to_ndarray(atmpros)
+    common.check_columns(atmpros)
+    TBOUNDs = np.broadcast_to(TBOUND, atmpros.shape[: 1]).tolist()
+    if records.get('header') is None:
+        records['header'] = '\n'.join([
+            record_1_1(records.pop('CXID', '')),
+            record_1_2(IAER = records.pop('IAER', 0), IATM = 1,
+                       IXSECT = records.pop('IXSECT', 0),
+                       NUMANGS = records.pop('NUMANGS', 0),
+                       IOUT = records.pop('IOUT', 0),
+                       IDRV = records.pop('IDRV', 0),
+                       IMCA = records.pop('IMCA', 0),
+                       ICLD = records.pop('ICLD', 0))])
+
+    for atmpro, tbound in zip(atmpros, TBOUNDs):
+        yield INPUT_RRTM_text(atmpro[~ np.isnan(atmpro[:, 1])],
+                              TBOUND = tbound, **records)
+
+
+def write_INPUT_RRTMs(atmpros, savein = 'INPUT_RRTMs', TBOUND = -1.,
+                      name = 'INPUT_RRTM', Nworkers = 1, Ncolumn_chunk = 256,
+                      **records):
+    '''
+    Writes INPUT_RRTM for each column of a batch of atmosphere profiles,
+    each in its own directory under SAVEIN named after the column\'s
+    index, and returns their paths.
+    INPUT:
+    name --- name of each INPUT_RRTM file
+    Nworkers --- number of processes writing at the same time
+    Ncolumn_chunk --- number of columns given to a process at a time
+    (see INPUT_RRTMs() for the other arguments, and
+     common.write_INPUT_RRTMs())
+    '''
+    return common.write_INPUT_RRTMs(INPUT_RRTMs, atmpros, savein = savein,
+                                    name = name, Nworkers = Nworkers,
+                                    Ncolumn_chunk = Ncolumn_chunk,
+                                    columns = {'TBOUND': TBOUND}, **records)
+
+
+def write_INPUT_RRTM_stream(atmpros, saveas = 'INPUT_RRTM', TBOUND = -1.,
+                            **records):
+    '''
+    Writes INPUT_RRTM for every column of a batch of atmosphere profiles
+    one after another to the single file SAVEAS, each column
+    starting with its \'$\' record 1.1.  Returns the number of columns.
+    (see INPUT_RRTMs() for the arguments)
+    '''
+    Ncolumn = 0
+    with open(saveas, mode = 'w', encoding = 'utf-8') as file:
+        for text in INPUT_RRTMs(atmpros, TBOUND = TBOUND, **records):
+            file.write('\n' + text if Ncolumn else text)
+            Ncolumn += 1
+    return Ncolumn
@@ -4,64 +4,104 @@ import itertools
 import io
 import numpy as np
 import pandas as pd
+import xarray as xr
+import rtmtools.rrtmg.common as common
 
 
 
-def OUTPUT_RRTM_to_pandasPanel(readfrom = '', cooling_rate = False,
-                                 signed_fluxes = False):
+def band_limits(line_band):
     '''
-    Convert OUTPUT_RADSUM to Pandas Panel Object
+    Returns the lower and upper wavenumbers in the first line of a band
+    in OUTPUT_RRTM, e.g. \' Wavenumbers:   10.0 -  350.0 cm-1, ATM     1\'
     '''
-    with open(readfrom, mode = 'r', encoding = 'utf-8') as file:
-        c = file.read()
-
-    outrad_dict = collections.OrderedDict({})
-    for bandstr in c.split('\x0c')[1: -1]:
-        bandstr = bandstr.strip()
-        line_band = bandstr.split('\n')[0]
-        V1, V2 = (float(V) for V in line_band.split(':')[-1]\
-                  .split('cm-1')[0].split('-'))
-        item = pd.MultiIndex.from_tuples([(V1, V2),])
-        df = pd.read_csv(io.StringIO(bandstr),
-                         skiprows = 3,
-                         sep = r'\s+', index_col = [0],
-                         header = None)
-        df.index.name = None
-        outrad_dict.update({(V1, V2): df})
-        
-    dpanel = pd.Panel.from_dict(outrad_dict)
-
-    if cooling_rate:
-        dpanel.values[:, :, -1] *= -1
-        rate_label = 'cooling_rate'
-    else:
-        rate_label = 'heating_rate'
-
-    if signed_fluxes:
-        dpanel.values[:, : , 1] *= -1
-        dpanel.values[:, :, 3] = dpanel.values[:, :, 1] + dpanel.values[:, :, 2]
-
-    dpanel.minor_axis = ['pressure', 'flux_up', 'flux_down', 'net_flux', rate_label]
-    return dpanel
-
-
-        
+    return line_band.split(':')[-1].split('cm-1')[0].split('-')
+
+
+
+# quantities along the last axis of OUTPUT_RRTM_to_ndarray()'s data
+OUTPUT_RRTM_NAMES = ('pressure', 'flux_up', 'flux_down', 'net_flux',
+                     'heating_rate')
+
+
+
+def OUTPUT_RRTM_to_ndarray(readfrom = '', cooling_rate = False,
+                           signed_fluxes = False):
+    '''
+    Reads OUTPUT_RRTM from RRTMG-LW in a single pass.  The file is
+    parsed again only if it has changed since it was last read;
+    otherwise the arrays from the last read are returned.
+    INPUT:
+    readfrom --- path to OUTPUT_RRTM
+    cooling_rate --- if True, the rates are cooling rates
+    signed_fluxes --- if True, upward fluxes are negative, and net
+                      flux is the sum of upward and downward fluxes
+    OUTPUT:
+    V1s, V2s --- lower and upper wavenumbers of the bands [cm-1]
+    levels --- level indices, in the order in the file
+    data --- read-only array of shape (band, level, 5), with
+             the quantities in OUTPUT_RRTM_NAMES along the last axis
+    '''
+    return common.OUTPUT_RRTM_to_ndarray(band_limits, OUTPUT_RRTM_NAMES,
+                                         readfrom = readfrom,
+                                         cooling_rate = cooling_rate,
+                                         signed_fluxes = signed_fluxes)
+
+
+
+def load_OUTPUT_RRTM(readfrom = '', cooling_rate = False,
+                     signed_fluxes = False):
+    '''
+    Reads OUTPUT_RRTM from RRTMG-LW into an xarray Dataset of dimensions
+    (band, level), with V1 and V2 as coordinates along band.
+    The variables are views into one copy of the array returned by
+    OUTPUT_RRTM_to_ndarray(), so they can be changed in place without
+    changing the cached arrays.
+    '''
+    V1s, V2s, levels, data = (array.copy() for array in OUTPUT_RRTM_to_ndarray(
+        readfrom = readfrom,
+        cooling_rate = cooling_rate,
+        signed_fluxes = signed_fluxes))
+
+    return xr.Dataset(
+        {name: (['band', 'level'], data[:, :, k])
+         for k, name in enumerate(common.variable_names(OUTPUT_RRTM_NAMES,
+                                                        cooling_rate))},
+        coords = {'V1': ('band', V1s), 'V2': ('band', V2s),
+                  'level': levels})
+
+
+
+def load_OUTPUT_RRTMs(readfroms = '.', cooling_rate = False,
+                      signed_fluxes = False):
+    '''
+    Reads many OUTPUT_RRTM files from RRTMG-LW into one xarray Dataset
+    of dimensions (case, band, level), backed by a single array.
+    (see rrtmg.common.stack_OUTPUT_RRTMs())
+    '''
+    return common.stack_OUTPUT_RRTMs(OUTPUT_RRTM_to_ndarray, OUTPUT_RRTM_NAMES,
+                                     readfroms = readfroms,
+                                     cooling_rate = cooling_rate,
+                                     signed_fluxes = signed_fluxes)
+
+
+
 def sum_OUTPUT_RRTM_over_wave_numbers(readfrom = './OUTPUT_RRTM',
                                       V1 = 0, V2 = 3000):
     '''
     Sum the fluxes and cooling rates over wave number bands
     between V1 and V2.  If V1 and V2 do not match any wave number band\'s
-    boundaries, they will be rounded to the closest boundaries.
+    boundaries, they will be rounded to the closest boundaries.  Only
+    the spectral bands are summed, not the total over all wave numbers.
     '''
-    dpanel = OUTPUT_RRTM_to_pandasPanel(readfrom = readfrom,
-                                        cooling_rate = True,
-                                        signed_fluxes = True)
-    V1s, V2s = (lev.values for lev in dpanel.items.levels)
-    item1, item2 = (np.abs(vs - v).argmin() \
-                    for vs, v in zip([V1s, V2s], [V1, V2]))
-    flux_cor_tot = dpanel.ix[item1: item2, :, \
-                             ['flux_up', 'flux_down', \
-                              'net_flux', 'cooling_rate']].\
-                              sum(axis = 'items')
-    pressure = dpanel.ix[dpanel.items[0], :, 'pressure']
-    return pd.concat([pressure, flux_cor_tot], axis = 1)
+    ds = load_OUTPUT_RRTM(readfrom = readfrom,
+                          cooling_rate = True,
+                          signed_fluxes = True)
+    ds = ds.isel(band = common.spectral_bands(ds))
+
+    V1s, V2s = ds['V1'].values, ds['V2'].values
+    V1 = V1s[np.abs(V1s - V1).argmin()]
+    V2 = V2s[np.abs(V2s - V2).argmin()]
+    flux_cor_tot = ds[['flux_up', 'flux_down', 'net_flux', 'cooling_rate']]\
+                   .isel(band = (V1s >= V1) & (V2s <= V2)).sum('band')
+    return pd.concat([ds['pressure'].isel(band = 0, drop = True).to_series(),
+                      flux_cor_tot.to_dataframe()], axis = 1)
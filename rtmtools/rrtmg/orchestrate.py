@@ -0,0 +1,188 @@
+'''
+Running RRTMG-LW or RRTMG-SW for many atmosphere columns (cases).
+
+Each case gets its own scratch directory under a run directory, in
+which its INPUT_RRTM is written (see rrtmg.lw/sw.input.write_INPUT_RRTMs())
+and the executable is run, since RRTMG reads and writes files with
+fixed names in its working directory.  The executables are run as
+asyncio subprocesses, at most Nconcurrent at a time
+(see lblrtm.aer_execute.run_all()), and cases that fail or time out
+are run again up to Nretry times.  The OUTPUT_RRTM of all cases are
+read with rrtmg.lw/sw.wrangle.load_OUTPUT_RRTMs(), which stacks them
+along a case dimension.
+
+Typical use:
+
+    ds, results = run('sw', atmpros, JULDAT = JULDATs, SZA = SZAs,
+                      albedo = albedos, rundir = 'rrtmg_sw_runs',
+                      Nconcurrent = 8, timeout = 60, Nretry = 1)
+    print(case_timings(results))
+'''
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import rtmtools.lblrtm.aer_execute as aer_execute
+import rtmtools.rrtmg.lw.input as lw_input
+import rtmtools.rrtmg.sw.input as sw_input
+import rtmtools.rrtmg.lw.wrangle as lw_wrangle
+import rtmtools.rrtmg.sw.wrangle as sw_wrangle
+
+
+
+def filepath_rrtmg_lw():
+    '''
+    Returns the absolute path of RRTMG-LW (the executable)
+    '''
+    return '/nuwa_cluster/home/jackyu/radiation/rrtmg/rrtmg_lw_v4.85/column_model/build/rrtmg_lw_v4.85_linux_intel'
+
+def filepath_rrtmg_sw():
+    '''
+    Returns the absolute path of RRTMG-SW (the executable)
+    '''
+    return '/nuwa_cluster/home/jackyu/radiation/rrtmg/rrtmg_sw_v4.0/column_model/build/rrtmg_sw_v4.0_linux_intel'
+
+
+
+# for each model, the function returning the path of its executable,
+# its input module and its output module
+MODELS = {'lw': (filepath_rrtmg_lw, lw_input, lw_wrangle),
+          'sw': (filepath_rrtmg_sw, sw_input, sw_wrangle)}
+
+
+
+def write_cases(model, atmpros, rundir = 'rrtmg_runs', Nworkers = 1, **records):
+    '''
+    Writes INPUT_RRTM for each column of ATMPROS in its own directory
+    under RUNDIR, and returns the directories, in column order.
+    INPUT:
+    model --- \'lw\' or \'sw\'
+    Nworkers --- number of processes writing INPUT_RRTM at the same time
+    records --- arguments of MODEL\'s input.write_INPUT_RRTMs(),
+                e.g. TBOUND for \'lw\', or JULDAT, SZA and albedo
+                for \'sw\'
+    '''
+    _, input_module, _ = MODELS[model]
+    paths = input_module.write_INPUT_RRTMs(atmpros, savein = rundir,
+                                           name = 'INPUT_RRTM',
+                                           Nworkers = Nworkers, **records)
+    return [os.path.dirname(path) for path in paths]
+
+
+
+def run_cases(model, rundirs, executable = None, Nconcurrent = 1,
+              timeout = None, Nretry = 0):
+    '''
+    Runs MODEL\'s executable in each of RUNDIRS, at most NCONCURRENT
+    at the same time, and runs those that fail again, up to NRETRY
+    more times.
+    INPUT:
+    model --- \'lw\' or \'sw\'
+    executable --- path to the executable, by default MODEL\'s in MODELS
+    timeout --- seconds after which a run is killed, None for no limit
+    OUTPUT:
+    results --- list of the aer_execute.RunResults of each case\'s
+                attempts, in the order of RUNDIRS.  A case succeeded
+                if its last attempt did.
+    '''
+    filepath_executable, _, _ = MODELS[model]
+    executable = executable or filepath_executable()
+
+    results = [[] for _ in rundirs]
+    todos = list(range(len(rundirs)))
+    for _ in range(Nretry + 1):
+        if not todos:
+            break
+        for k, result in zip(todos, aer_execute.run_all(
+                [{'executable': executable, 'rundir': rundirs[k]} for k in todos],
+                Nconcurrent = Nconcurrent, timeout = timeout)):
+            results[k].append(result)
+        todos = [k for k in todos if not aer_execute.succeeded(results[k][-1])]
+    return results
+
+
+
+def case_timings(results):
+    '''
+    Returns a table of the number of attempts, the total wall time [s]
+    and the outcome of each case
+    INPUT:
+    results --- list of the aer_execute.RunResults of each case\'s
+                attempts, as returned by run_cases()
+    '''
+    return pd.DataFrame(
+        {'rundir': [attempts[-1].rundir for attempts in results],
+         'attempts': [len(attempts) for attempts in results],
+         'elapsed': [sum(result.elapsed for result in attempts)
+                     for attempts in results],
+         'succeeded': [aer_execute.succeeded(attempts[-1])
+                       for attempts in results]})
+
+
+
+def load_cases(model, rundirs, cases = None, cooling_rate = False,
+               signed_fluxes = False):
+    '''
+    Reads the OUTPUT_RRTM in each of RUNDIRS with MODEL\'s
+    wrangle.load_OUTPUT_RRTMs(), and returns them as one xarray Dataset
+    of dimensions (case, band, level).
+    INPUT:
+    model --- \'lw\' or \'sw\'
+    cases --- labels of the cases, by default RUNDIRS
+    '''
+    _, _, wrangle_module = MODELS[model]
+    if not rundirs:
+        raise ValueError('No cases to read')
+    ds = wrangle_module.load_OUTPUT_RRTMs(
+        readfroms = [os.path.join(rundir, 'OUTPUT_RRTM') for rundir in rundirs],
+        cooling_rate = cooling_rate,
+        signed_fluxes = signed_fluxes)
+    return ds.assign_coords(case = list(rundirs) if cases is None else list(cases))
+
+
+
+def run(model, atmpros, rundir = None, executable = None,
+        Nconcurrent = 1, timeout = None, Nretry = 0, Nworkers = 1,
+        keep_scratch = True, cooling_rate = False, signed_fluxes = False,
+        **records):
+    '''
+    Runs RRTMG-LW or RRTMG-SW for each column of ATMPROS, each in its
+    own directory under RUNDIR.
+    INPUT:
+    model --- \'lw\' or \'sw\'
+    atmpros --- atmosphere profiles (see rrtmg.common.profiles_to_ndarray())
+    rundir --- directory in which the cases\' directories are made,
+               a new one in the current directory if None
+    keep_scratch --- False to remove the cases\' directories after
+                     reading the results, and RUNDIR too if it was
+                     made by run()
+    records --- arguments for INPUT_RRTM (see write_cases())
+    (see run_cases() and load_cases() for the other arguments)
+    OUTPUT:
+    ds --- xarray Dataset of dimensions (case, band, level), with the
+           column index as case
+    results --- list of the aer_execute.RunResults of each case\'s
+                attempts (see case_timings())
+    Raises aer_execute.ExecutionError if a case still fails after NRETRY
+    more attempts; its directory is kept for inspection.
+    '''
+    made_rundir = rundir is None
+    if made_rundir:
+        rundir = tempfile.mkdtemp(prefix = 'rrtmg_runs_', dir = '.')
+    rundirs = write_cases(model, atmpros, rundir = rundir, Nworkers = Nworkers,
+                          **records)
+    results = run_cases(model, rundirs, executable = executable,
+                        Nconcurrent = Nconcurrent, timeout = timeout,
+                        Nretry = Nretry)
+    [aer_execute.check(attempts[-1]) for attempts in results]
+
+    ds = load_cases(model, rundirs, cases = np.arange(len(rundirs)),
+                    cooling_rate = cooling_rate, signed_fluxes = signed_fluxes)
+    if not keep_scratch:
+        ds = ds.load()
+        if made_rundir:
+            shutil.rmtree(rundir)
+        else:
+            [shutil.rmtree(case_rundir) for case_rundir in rundirs]
+    return ds, results
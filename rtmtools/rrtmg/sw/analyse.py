@@ -4,6 +4,7 @@ import itertools
 import io
 import numpy as np
 import pandas as pd
+import rtmtools.rrtmg.common as common
 
 
 
@@ -12,23 +13,27 @@ import pandas as pd
 
 
 
-def sum_OUTPUT_RRTM_over_wbands(pnl,
+def sum_OUTPUT_RRTM_over_wbands(ds,
                                 names = ['flux_up', 'flux_down', 'net_flux',
                                          'heating_rate'],
                                 V1 = 820., V2 = 50000.):
     '''
     Sum fluxes and/or rates (heating or cooling) over wavenumbers
     INPUT:
-    pnl --- Pandas Panel: ((V1, V2), atm level, [pressure, flux up, ..., rate])
+    ds --- xarray Dataset: (band, level), with V1 and V2 along band
+           (see rtmtools.rrtmg.sw.wrangle.load_OUTPUT_RRTM())
     names --- attributes to sum up over wavenumbers
-    V1, V2 --- lower and upper wavenumber limits in the sum
+    V1, V2 --- lower and upper wavenumber limits in the sum.  They are
+               rounded to the closest band boundaries.
     OUTPUT:
     df --- Pandas DataFrame: (atm level, NAMES)
     '''
-    V1s, V2s = (lev.values for lev in pnl.items.levels)
-    item1, item2 = (np.abs(vs - v).argmin() 
-                    for vs, v in zip([V1s, V2s], [V1, V2]))
-    print(item1, item2)
-    return pd.concat([pnl.ix[pnl.items[0], :, 'pressure'],
-                      pnl.ix[item1: item2 + 1, :, names].sum(axis = 'items')],
+    V1s, V2s = ds['V1'].values, ds['V2'].values
+    V1 = V1s[np.abs(V1s - V1).argmin()]
+    V2 = V2s[np.abs(V2s - V2).argmin()]
+
+    # leave out bands, such as the total, that span other bands
+    inside = (V1s >= V1) & (V2s <= V2) & common.spectral_bands(ds)
+    return pd.concat([ds['pressure'].isel(band = 0, drop = True).to_series(),
+                      ds[names].isel(band = inside).sum('band').to_dataframe()],
                      axis = 1)
@@ -1,7 +1,8 @@
 import os
-import itertools
-import collections
-import pandas as pd
+import numpy as np
+import rtmtools.fortran_records as fortran_records
+import rtmtools.lblrtm.atmosphere_profile as atmosphere_profile
+import rtmtools.rrtmg.common as common
 
 
 '''
@@ -48,34 +49,52 @@ def record_1_2(IAER = None,
                    for length, fmtspec, value in notes)
 
 
+def record_1_2_1_notes(JULDAT = None,
+                       SZA = None,
+                       ISOLVAR = None,
+                       SOLVAR = None):
+    '''
+    JULDAT, SZA --- a value for one record, or arrays of values
+                    for one record each
+    '''
+    return tuple([(12, None, None),
+                  (3, '{:>3d}', JULDAT),
+                  (3, None, None),
+                  (7, '{:>7.4f}', SZA),
+                  (4, None, None),
+                  (1, None, None)] + 
+                 [(5, '{:>5.3f}', sv) for sv in SOLVAR or 14 * [None]])
+
+
 def record_1_2_1(JULDAT = None,
                  SZA = None,
                  ISOLVAR = None,
                  SOLVAR = None):
-    notes = tuple([(12, None, None),
-                   (3, '{:>3d}', JULDAT),
-                   (3, None, None),
-                   (7, '{:>7.4f}', SZA),
-                   (4, None, None),
-                   (1, None, None)] + 
-                  [(5, '{:>5.3f}', sv) for sv in SOLVAR or 14 * [None]])
-    return ''.join(length * ' ' if value == None\
-                   else fmtspec.format(value)\
-                   for length, fmtspec, value in notes)
+    return fortran_records.format_records(
+        record_1_2_1_notes(JULDAT = JULDAT, SZA = SZA,
+                           ISOLVAR = ISOLVAR, SOLVAR = SOLVAR))
 
 
 
+def record_1_4_notes(IEMIS = None,
+                     IREFLECT = None,
+                     SEMISS = None):
+    '''
+    SEMISS --- sequence of emissivities, each a value for one record,
+               or an array of values for one record each
+    '''
+    return tuple([(11, None, None),
+                  (1, '{:d}', IEMIS),
+                  (2, None, None),
+                  (1, '{:d}', IREFLECT)] +
+                 [(5, '{:>5.3f}', sm) for sm in SEMISS or 14 * [None]])
+
+
 def record_1_4(IEMIS = None,
                IREFLECT = None,
                SEMISS = None):
-    notes = tuple([(11, None, None),
-                   (1, '{:d}', IEMIS),
-                   (2, None, None),
-                   (1, '{:d}', IREFLECT)] +
-                  [(5, '{:>5.3f}', sm) for sm in SEMISS or 14 * [None]])
-    return ''.join(length * ' ' if value == None\
-                   else fmtspec.format(value)\
-                   for length, fmtspec, value in notes)
+    return fortran_records.format_records(
+        record_1_4_notes(IEMIS = IEMIS, IREFLECT = IREFLECT, SEMISS = SEMISS))
 
 
 
@@ -132,26 +151,17 @@ def record_3_3_A(AVTRAT = None,
 
 
 def record_3_3_B(IBMAX = None,
-                 PATH_atmpro = None):
-    Nrow, fmtspec = 8, '{:>10.3f}'
-    with pd.get_store(PATH_atmpro) as store:
-        atmpro = store['atmpro']
-    if IBMAX < 0:
-        name = 'pressure'
-    elif IBMAX > 0:
-        name = 'altitude'
-    else:
-        raise ValueError('record_3_3_B is not applicable for IMBAX = 0')
-    totdata = atmpro[name][::-1][: abs(IBMAX)]
-    notes_rows = (
-        ((Nrow, fmtspec, value) for value in row) \
-        for row in itertools.zip_longest(*(Nrow * [iter(totdata)]))
-        )
-    records_rows = (''.join(length * ' ' if value == None\
-                            else fmtspec.format(value)\
-                            for length, fmtspec, value in notes) \
-                            for notes in notes_rows)
-    return '\n'.join(records_rows)
+                 PATH_atmpro = None,
+                 atmpro = None):
+    '''
+    Records 3.3B for the atmosphere profile ATMPRO
+    (see atmosphere_profile.as_AtmosphereProfile()), or, if ATMPRO is not
+    given, for the one stored in PATH_atmpro.
+    '''
+    if atmpro is None:
+        atmpro = common.read_atmpro_store(PATH_atmpro)
+    atmpro = atmosphere_profile.as_AtmosphereProfile(atmpro)
+    return common.record_3_3_B_block(IBMAX = IBMAX, levels = atmpro.data)
 
 
 def record_3_4(IMMAX = None,
@@ -172,50 +182,158 @@ def record_3_5(NMOL = None,
                JCHARP = None,
                JCHART = None,
                JCHAR = None):
-    notes = tuple([
-        (10, '{:>10.3e}', ZM),
-        (10, '{:>10.3e}', PM),
-        (10, '{:>10.3e}', TM),
-        (5, None, None),
-        (1, '{:s}', JCHARP),
-        (1, '{:s}', JCHART),
-        (3, None, None)] + \
-                  [(1, '{:s}', jch) for jch in JCHAR or NMOL * [None]])
-    return ''.join(length * ' ' if value == None\
-                   else fmtspec.format(value)\
-                   for length, fmtspec, value in notes)
-
+    return fortran_records.format_records(
+        common.record_3_5_notes(NMOL = NMOL, ZM = ZM, PM = PM, TM = TM,
+                         JCHARP = JCHARP, JCHART = JCHART, JCHAR = JCHAR))
 
 
 def record_3_6(NMOL = None,
                VMOL = None):
-    if VMOL.shape and len(VMOL) != NMOL:
-        raise InputError('NMOL = {}. \
-        VMOL must have {} values'.format(NMOL, NMOL))
-    notes = tuple((10, '{:>10.3e}', value) for value in VMOL)
-    return ''.join(length * ' ' if value == None\
-                   else fmtspec.format(value)\
-                   for length, fmtspec, value in notes)
+    return fortran_records.format_records(
+        common.record_3_6_notes(NMOL = NMOL, VMOL = VMOL))
 
 
 def record_3_5_to_3_6s(NMOL = None,
                        IMMAX = None,
-                       PATH_atmpro = None):
-    with pd.get_store(PATH_atmpro) as store:
-        atmpro = store['atmpro'].sort_index(ascending = True)
-        
-    lines = collections.deque([])
-    for indx in atmpro.index[: abs(IMMAX)]:
-        lines.append(
-            record_3_5(ZM = atmpro.loc[indx, 'altitude'],
-                       PM = atmpro.loc[indx, 'pressure'],
-                       TM = atmpro.loc[indx, 'temperature'],
-                       JCHARP = 'A',
-                       JCHART = 'A',
-                       JCHAR = NMOL * ['A'])
-                                                            )
-        lines.append(
-            record_3_6(NMOL = NMOL,
-                       VMOL = atmpro.ix[indx, 3:])
-            )
-    return '\n'.join(lines)
+                       PATH_atmpro = None,
+                       atmpro = None):
+    '''
+    Records 3.5 and 3.6 for the first abs(IMMAX) levels of the atmosphere
+    profile ATMPRO (see atmosphere_profile.as_AtmosphereProfile()), or,
+    if ATMPRO is not given, of the one stored in PATH_atmpro.
+    '''
+    if atmpro is None:
+        atmpro = common.read_atmpro_store(PATH_atmpro)
+    atmpro = atmosphere_profile.as_AtmosphereProfile(atmpro)
+    return common.record_3_5_to_3_6_block(NMOL = NMOL,
+                                   levels = atmpro.data[: abs(IMMAX)])
+
+
+
+'''
+INPUT_RRTM for many atmosphere columns at once
+'''
+
+
+def split_records(text, counts):
+    '''
+    Splits TEXT, a block of records, into consecutive groups of COUNTS
+    records each, and returns each group as text
+    '''
+    lines = text.split('\n')
+    ends = np.cumsum(counts).tolist()
+    return ['\n'.join(lines[end - count: end]) for end, count in zip(ends, counts)]
+
+
+def INPUT_RRTMs(atmpros, JULDAT = 0, SZA = 0., albedo = None,
+                CXID = '',
+                IAER = 0, ISCAT = 0, ISTRM = 0, IOUT = 0,
+                IMCA = 0, ICLD = 0, IDELM = 0, ICOS = 0,
+                ISOLVAR = None, SOLVAR = None,
+                IEMIS = 0, IREFLECT = 0, SEMISS = None,
+                IBMAX = -1, NOPRNT = 0, NMOL = 7, IPUNCH = 0,
+                MUNITS = 0, RE = None, CO2MX = None,
+                HBOUND = None, HTOA = None, HMOD = ''):
+    '''
+    Yields INPUT_RRTM for RRTMG-SW, with RRTATM (IATM = 1) and
+    user-supplied profiles (MODEL = 0), for each column of a batch of
+    atmosphere profiles.  The records of all the columns are formatted
+    together, before the first is yielded: those of the levels of all
+    the columns in one call, and those of the solar geometry and
+    surface in another.  Levels whose pressure is NaN are left out, so
+    columns can have different numbers of levels.  Raises ValueError if
+    a column has no levels left (see common.check_columns()).
+    INPUT:
+    atmpros --- atmosphere profiles (see common.profiles_to_ndarray())
+    JULDAT --- Julian day, one for all columns or one per column
+    SZA --- solar zenith angle [degrees], one for all columns or
+            one per column
+    albedo --- surface albedo, one for all columns or one per column,
+               or (column, 14) for each of the 14 bands.  If given,
+               the emissivities are 1 - albedo, overriding IEMIS
+               and SEMISS.
+    IBMAX --- sign of IBMAX in record 3.1, negative for pressure
+              boundaries in record 3.3B.  Its magnitude is
+              always the number of levels of the column.
+    HBOUND, HTOA --- boundaries in record 3.2, one for all columns or
+                     one per column.  They default to each column\'s
+                     first and last level\'s pressure if IBMAX < 0, or
+                     altitude if IBMAX > 0, like the boundaries in
+                     record 3.3B.
+    (see rtmtools/rrtmg/scripts/rrtmg_sw.py for the other arguments)
+    '''
+    atmpros = common.profiles_to_ndarray(atmpros)
+    common.check_columns(atmpros)
+    Ncolumn = atmpros.shape[0]
+    valid = ~ np.isnan(atmpros[:, :, 1])
+    Nlevels = valid.sum(axis = 1)
+    levels = atmpros[valid]
+    starts = np.concatenate([[0], np.cumsum(Nlevels)[: -1]])
+
+    if albedo is not None:
+        albedo = np.asarray(albedo, dtype = np.float64)
+        Nband = albedo.shape[-1] if albedo.ndim == 2 else 1
+        semiss = 1 - np.broadcast_to(albedo.reshape(-1, Nband), (Ncolumn, Nband))
+        IEMIS = 1 if Nband == 1 else 2
+        SEMISS = list(semiss.T)
+
+    header = '\n'.join([record_1_1(CXID),
+                        record_1_2(IAER = IAER, IATM = 1, ISCAT = ISCAT,
+                                   ISTRM = ISTRM, IOUT = IOUT, IMCA = IMCA,
+                                   ICLD = ICLD, IDELM = IDELM, ICOS = ICOS)])
+    surfaces = split_records(
+        fortran_records.format_records(
+            record_1_2_1_notes(JULDAT = np.broadcast_to(JULDAT, (Ncolumn,)),
+                               SZA = np.broadcast_to(SZA, (Ncolumn,)),
+                               ISOLVAR = ISOLVAR, SOLVAR = SOLVAR),
+            record_1_4_notes(IEMIS = np.broadcast_to(IEMIS, (Ncolumn,)),
+                             IREFLECT = IREFLECT, SEMISS = SEMISS)),
+        Ncolumn * [2])
+
+    boundaries = levels[:, 1 if IBMAX < 0 else 0]
+    HBOUNDs = np.broadcast_to(boundaries[starts] if HBOUND is None else HBOUND,
+                              (Ncolumn,)).tolist()
+    HTOAs = np.broadcast_to(boundaries[starts + Nlevels - 1] if HTOA is None else HTOA,
+                            (Ncolumn,)).tolist()
+    boundaries = (len(boundaries) * '{:>10.3f}').format(*boundaries.tolist())
+    profiles = split_records(common.record_3_5_to_3_6_block(NMOL = NMOL, levels = levels),
+                             2 * Nlevels)
+
+    for surface, profile, hbound, htoa, start, Nlevel in zip(
+            surfaces, profiles, HBOUNDs, HTOAs, starts.tolist(), Nlevels.tolist()):
+        yield '\n'.join([
+            header,
+            surface,
+            record_3_1(MODEL = 0, IBMAX = int(np.sign(IBMAX)) * Nlevel,
+                       NOPRNT = NOPRNT, NMOL = NMOL, IPUNCH = IPUNCH,
+                       MUNITS = MUNITS, RE = RE, CO2MX = CO2MX),
+            record_3_2(HBOUND = hbound, HTOA = htoa),
+            common.split_record_3_3_B(
+                boundaries[10 * start: 10 * (start + Nlevel)]),
+            record_3_4(IMMAX = Nlevel, HMOD = HMOD),
+            profile])
+
+
+def write_INPUT_RRTMs(atmpros, savein = 'INPUT_RRTMs',
+                      JULDAT = 0, SZA = 0., albedo = None,
+                      HBOUND = None, HTOA = None,
+                      name = 'INPUT_RRTM', Nworkers = 1, Ncolumn_chunk = 256,
+                      **records):
+    '''
+    Writes INPUT_RRTM for each column of a batch of atmosphere profiles,
+    each in its own directory under SAVEIN named after the column\'s
+    index, and returns their paths.
+    INPUT:
+    name --- name of each INPUT_RRTM file
+    Nworkers --- number of processes writing at the same time
+    Ncolumn_chunk --- number of columns given to a process at a time
+    (see INPUT_RRTMs() for the other arguments, and
+     common.write_INPUT_RRTMs())
+    '''
+    return common.write_INPUT_RRTMs(INPUT_RRTMs, atmpros, savein = savein,
+                                    name = name, Nworkers = Nworkers,
+                                    Ncolumn_chunk = Ncolumn_chunk,
+                                    columns = {'JULDAT': JULDAT, 'SZA': SZA,
+                                               'albedo': albedo,
+                                               'HBOUND': HBOUND, 'HTOA': HTOA},
+                                    **records)
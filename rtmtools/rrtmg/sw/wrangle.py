@@ -6,6 +6,8 @@ import io
 
 import numpy as np
 import pandas as pd
+import xarray as xr
+import rtmtools.rrtmg.common as common
 
 
 def output_txtfile_to_DataFrame(readfrom = './zz-output-onlysw-now.txt'):
@@ -30,45 +32,85 @@ def output_txtfile_to_DataFrame(readfrom = './zz-output-onlysw-now.txt'):
                       sort_index(ascending = False)
 
 
-def OUTPUT_RRTM_to_pandasPanel(readfrom = '', cooling_rate = False,
-                               signed_fluxes = False):
+def band_limits(line_band):
+    '''
+    Returns the lower and upper wavenumbers in the first line of a band
+    in OUTPUT_RRTM, e.g. \' Wavenumbers:   820.0 -  2600.0 cm-1, ATM     1\'
+    '''
+    return line_band.split()[1: 4: 2]
+
+
+
+# quantities along the last axis of OUTPUT_RRTM_to_ndarray()'s data
+OUTPUT_RRTM_NAMES = ('pressure', 'flux_up',
+                     'flux_difdown', 'flux_dirdown',
+                     'flux_down', 'net_flux', 'heating_rate')
+
+
 
+def OUTPUT_RRTM_to_ndarray(readfrom = '', cooling_rate = False,
+                           signed_fluxes = False):
     '''
-    Read and convert OUTPUT_RRTM file from RRTMG-SW to Pandas
-    Panel object
+    Reads OUTPUT_RRTM from RRTMG-SW in a single pass.  The file is
+    parsed again only if it has changed since it was last read;
+    otherwise the arrays from the last read are returned.
+    INPUT:
+    readfrom --- path to OUTPUT_RRTM
+    cooling_rate --- if True, the rates are cooling rates
+    signed_fluxes --- if True, upward fluxes are negative, and net
+                      flux is the sum of upward and downward fluxes
+    OUTPUT:
+    V1s, V2s --- lower and upper wavenumbers of the bands [cm-1]
+    levels --- level indices, in the order in the file
+    data --- read-only array of shape (band, level, 7), with
+             the quantities in OUTPUT_RRTM_NAMES along the last axis
     '''
-    with open(readfrom, mode = 'r', encoding = 'utf-8') as file:
-        c = file.read()
+    return common.OUTPUT_RRTM_to_ndarray(band_limits, OUTPUT_RRTM_NAMES,
+                                         readfrom = readfrom,
+                                         cooling_rate = cooling_rate,
+                                         signed_fluxes = signed_fluxes)
 
-    content_wbs = [s.strip()
-                   for s in c.split('\x0c')[1: -1] if s and not s.isspace()]
-
-    data = {}
-    for content_wb in content_wbs:
-        l1 = content_wb.split('\n', maxsplit = 1)[0].split()
-        V1, V2 = float(l1[1]), float(l1[3])
-        df = pd.read_csv(io.StringIO(content_wb),
-                         header = None, skiprows = 3, index_col = [0],
-                         sep = r'\s+')
-        df.index.name = None
-        data[(V1, V2)] = df
-
-    pnl = pd.Panel(data)
-
-    if cooling_rate:
-        pnl.values[:, :, -1] *= -1
-        rate_label = 'cooling_rate'
-    else:
-        rate_label = 'heating_rate'
-
-    if signed_fluxes:
-        pnl.values[:, :, 1] *= -1
-        pnl.values[:, :, 5] = pnl.values[:, :, 1] + pnl.values[:, :, 4]
-
-    pnl.minor_axis = ['pressure', 'flux_up',
-                      'flux_difdown', 'flux_dirdown',
-                      'flux_down', 'net_flux', rate_label]
-    return pnl
-        
-    
-        
+
+
+def variable_names(cooling_rate = False):
+    '''
+    Returns the names of the quantities in OUTPUT_RRTM,
+    with the rate named as a cooling or heating rate
+    '''
+    return common.variable_names(OUTPUT_RRTM_NAMES, cooling_rate = cooling_rate)
+
+
+
+def load_OUTPUT_RRTM(readfrom = '', cooling_rate = False,
+                     signed_fluxes = False):
+    '''
+    Reads OUTPUT_RRTM from RRTMG-SW into an xarray Dataset of dimensions
+    (band, level), with V1 and V2 as coordinates along band.
+    The variables are views into one copy of the array returned by
+    OUTPUT_RRTM_to_ndarray(), so they can be changed in place without
+    changing the cached arrays.
+    '''
+    V1s, V2s, levels, data = (array.copy() for array in OUTPUT_RRTM_to_ndarray(
+        readfrom = readfrom,
+        cooling_rate = cooling_rate,
+        signed_fluxes = signed_fluxes))
+
+    return xr.Dataset(
+        {name: (['band', 'level'], data[:, :, k])
+         for k, name in enumerate(variable_names(cooling_rate))},
+        coords = {'V1': ('band', V1s), 'V2': ('band', V2s),
+                  'level': levels})
+
+
+
+def load_OUTPUT_RRTMs(readfroms = '.', cooling_rate = False,
+                      signed_fluxes = False):
+    '''
+    Reads many OUTPUT_RRTM files from RRTMG-SW into one xarray Dataset
+    of dimensions (case, band, level), backed by a single array.
+    (see rrtmg.common.stack_OUTPUT_RRTMs())
+    '''
+    return common.stack_OUTPUT_RRTMs(OUTPUT_RRTM_to_ndarray, OUTPUT_RRTM_NAMES,
+                                     readfroms = readfroms,
+                                     cooling_rate = cooling_rate,
+                                     signed_fluxes = signed_fluxes)